@@ -0,0 +1,579 @@
+#!/usr/bin/env python
+
+"""bench_endpoints.py -- offline latency & RPC benchmark of the API
+
+Seeds a synthetic dataset into the App Engine testbed stubs (datastore,
+memcache, task queue, users, mail, blobstore, search), then times every
+ConferenceApi endpoint and main.py handler against it. Each scale runs
+in a fresh testbed; --scales multiplies the base dataset of 10k
+conferences, 200k sessions and 50k profiles with wishlists.
+
+For every case it reports p50/p95 latency and the mean number of API
+RPCs per call, and saves everything to benchmarks/results/<commit>.json
+so two commits can be compared with --compare.
+
+usage: python benchmarks/bench_endpoints.py [--sdk PATH] [--scales 0.01,0.1]
+           [--iterations N] [--only NAME ...] [--compare RESULTS.json]
+
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import subprocess
+import timeit
+from datetime import date
+from datetime import time
+
+from bench_serializers import ROOT
+from bench_serializers import setupPaths
+
+BASE_CONFERENCES = 10000
+BASE_SESSIONS = 200000
+BASE_PROFILES = 50000
+WISHLIST_SIZE = 5
+REGISTRATIONS = 3
+PUT_BATCH = 500
+
+BENCH_USER = 'bench@example.com'
+CITIES = ['London', 'Chicago', 'Paris', 'Tokyo', 'Berlin', 'Austin']
+TOPICS = ['Web', 'Cloud', 'Mobile', 'Data', 'Security', 'Programming']
+SESSION_TYPES = ['talk', 'workshop', 'keynote', 'lecture']
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+class RpcCounter(object):
+    """RpcCounter -- counts API calls made through the apiproxy"""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    def record(self, service, call, request, response):
+        self.counts['%s.%s' % (service, call)] += 1
+
+    def install(self):
+        from google.appengine.api import apiproxy_stub_map
+        apiproxy_stub_map.apiproxy.GetPreCallHooks().Append(
+            'bench_rpc_counter', self.record)
+
+    def reset(self):
+        self.counts.clear()
+
+
+class Case(object):
+    """Case -- one benchmarked call
+
+    request(i) returns whatever call(i, request) needs for iteration i;
+    it runs outside the timer.
+    """
+
+    def __init__(self, name, call, request=lambda i: None):
+        self.name = name
+        self.call = call
+        self.request = request
+
+
+def percentile(values, pct):
+    """Return the pct percentile of values (nearest rank)."""
+    values = sorted(values)
+    index = max(int(round(pct / 100.0 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def activateTestbed():
+    """Activate and return a testbed with every stub the app uses."""
+    from google.appengine.datastore import datastore_stub_util
+    from google.appengine.ext import testbed
+
+    tb = testbed.Testbed()
+    tb.activate()
+    tb.init_datastore_v3_stub(root_path=ROOT,
+        consistency_policy=datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+            probability=1))
+    tb.init_memcache_stub()
+    tb.init_taskqueue_stub(root_path=ROOT)
+    tb.init_user_stub()
+    tb.init_mail_stub()
+    tb.init_app_identity_stub()
+    tb.init_blobstore_stub()
+    tb.init_urlfetch_stub()
+    tb.init_search_stub()
+    # endpoints.get_current_user() trusts these when they are set
+    os.environ['ENDPOINTS_AUTH_EMAIL'] = BENCH_USER
+    os.environ['ENDPOINTS_AUTH_DOMAIN'] = 'example.com'
+    tb.setup_env(USER_EMAIL=BENCH_USER, USER_ID='1', USER_IS_ADMIN='1',
+                 overwrite=True)
+    return tb
+
+
+def _putAll(entities):
+    from google.appengine.ext import ndb
+    for i in range(0, len(entities), PUT_BATCH):
+        ndb.put_multi(entities[i:i + PUT_BATCH], use_cache=False,
+                      use_memcache=False)
+
+
+def seed(scale, rnd):
+    """Seed the datastore and return a dict describing what was created."""
+    from google.appengine.ext import ndb
+    from models import Conference
+    from models import ConferenceSpeaker
+    from models import Profile
+    from models import Registration
+    from models import Session
+    from models import Speaker
+    from models import UserWishList
+    from textsearch import indexConferences
+    from textsearch import indexSessions
+
+    numConfs = max(int(BASE_CONFERENCES * scale), 10)
+    numSessions = max(int(BASE_SESSIONS * scale), 100)
+    numProfiles = max(int(BASE_PROFILES * scale), 10)
+
+    userIds = [BENCH_USER] + ['user%d@example.com' % i
+                              for i in range(numProfiles - 1)]
+    # one organizer per 50 profiles, the bench user always among them
+    organizers = userIds[:max(numProfiles // 50, 1)]
+
+    confs = []
+    for i in range(numConfs):
+        month = rnd.randint(1, 12)
+        maxAttendees = rnd.choice([50, 100, 500, 1000])
+        confs.append(Conference(
+            key=ndb.Key(Conference, i + 1,
+                        parent=ndb.Key(Profile, organizers[i % len(organizers)])),
+            name='Conference %d' % i, description='x' * 200,
+            organizerUserId=organizers[i % len(organizers)],
+            organizerDisplayName=organizers[i % len(organizers)].split('@')[0],
+            topics=rnd.sample(TOPICS, 2), city=rnd.choice(CITIES),
+            startDate=date(2016, month, 1), month=month,
+            endDate=date(2016, month, 3), maxAttendees=maxAttendees,
+            # a few nearly sold out conferences for the announcement
+            seatsAvailable=rnd.randint(1, 5) if i % 20 == 0 else maxAttendees))
+    _putAll(confs)
+    confWscks = [conf.key.urlsafe() for conf in confs]
+
+    numSpeakers = max(numSessions // 10, 1)
+    sessions, speakers = [], {}
+    for i in range(numSessions):
+        conf = confs[i % numConfs]
+        speaker = 'Speaker %d' % rnd.randrange(numSpeakers)
+        session = Session(key=ndb.Key(Session, i + 1, parent=conf.key),
+            name='Session %d' % i, highlights='y' * 200, speaker=speaker,
+            duration=rnd.choice([30, 60, 90, 120]),
+            typeOfSession=rnd.choice(SESSION_TYPES),
+            date=conf.startDate, startTime=time(rnd.randint(8, 20), 0),
+            websafeConferenceKey=confWscks[i % numConfs])
+        sessions.append(session)
+        aggregate = speakers.get((conf.key, speaker))
+        if aggregate is None:
+            aggregate = speakers[(conf.key, speaker)] = ConferenceSpeaker(
+                key=ConferenceSpeaker.keyForName(conf.key, speaker),
+                speaker=speaker)
+        aggregate.sessionCount += 1
+        aggregate.sessionNames.append(session.name)
+        aggregate.totalMinutes += session.duration
+    directory = {}
+    for (c_key, name), aggregate in speakers.items():
+        speaker = directory.setdefault(name, Speaker(
+            key=Speaker.keyForName(name), name=name))
+        speaker.sessionCount += aggregate.sessionCount
+        speaker.totalMinutes += aggregate.totalMinutes
+        speaker.websafeConferenceKeys.append(c_key.urlsafe())
+        speaker.conferences = dict(speaker.conferences, **{c_key.urlsafe():
+            [aggregate.sessionCount, aggregate.totalMinutes]})
+    _putAll(sessions)
+    _putAll(speakers.values())
+    _putAll(directory.values())
+    indexConferences(confs)
+    indexSessions(sessions)
+
+    profiles, registrations, wishlists = [], [], []
+    for userId in userIds:
+        p_key = ndb.Key(Profile, userId)
+        profiles.append(Profile(key=p_key, displayName=userId.split('@')[0],
+            mainEmail=userId))
+        for conf in rnd.sample(confs, REGISTRATIONS):
+            registrations.append(Registration(conferenceKey=conf.key,
+                key=ndb.Key(Registration, conf.key.urlsafe(), parent=p_key)))
+        for session in rnd.sample(sessions, WISHLIST_SIZE):
+            wishlists.append(UserWishList(parent=p_key, userID=userId,
+                conferenceWsk=session.websafeConferenceKey,
+                sessionKey=session.key.urlsafe()))
+    _putAll(profiles)
+    _putAll(registrations)
+    _putAll(wishlists)
+
+    ownConfs = [conf for conf in confs if conf.organizerUserId == BENCH_USER]
+    featured = max(speakers.values(), key=lambda s: s.sessionCount)
+    return {
+        'conferences': numConfs,
+        'sessions': numSessions,
+        'profiles': numProfiles,
+        'registrations': len(registrations),
+        'wishlists': len(wishlists),
+        'confWscks': confWscks,
+        'ownConfWsck': ownConfs[0].key.urlsafe(),
+        'attendingWscks': set(r.key.id() for r in registrations
+                              if r.key.parent().id() == BENCH_USER),
+        'sessionKeys': [session.key.urlsafe() for session in sessions],
+        'speakers': ['Speaker %d' % i for i in range(numSpeakers)],
+        'featuredConfWsck': featured.key.parent().urlsafe(),
+        'featuredSpeaker': featured.speaker,
+    }
+
+
+def endpointCases(api, data, rnd):
+    """Return a Case for every ConferenceApi endpoint."""
+    from protorpc import message_types
+    import conference
+    from models import ConferenceForm
+    from models import ConferenceQueryForm
+    from models import ConferenceQueryForms
+    from models import ProfileMiniForm
+    from models import SessionForm
+    from models import SessionForms
+    from models import SessionQueryForm
+    from models import SessionQueryForms
+
+    def container(rc, **kwargs):
+        return rc.combined_message_class(**kwargs)
+
+    def endpoint(name):
+        method = getattr(api, name)
+        return lambda i, request: method(request)
+
+    void = lambda i: message_types.VoidMessage()
+    own = data['ownConfWsck']
+    anyConf = lambda i: rnd.choice(data['confWscks'])
+    anySpeaker = lambda i: rnd.choice(data['speakers'])
+    # conferences the bench user can register for, then unregister from
+    openConfs = [wsck for wsck in data['confWscks']
+                 if wsck not in data['attendingWscks']]
+    wishSessions = rnd.sample(data['sessionKeys'], 100)
+
+    def newSession(i, prefix='Bench Session'):
+        return SessionForm(name='%s %d' % (prefix, i), highlights='bench',
+            speaker=anySpeaker(i), duration=60, typeOfSession='talk',
+            date='2016-05-01', startTime='10:00')
+
+    return [
+        Case('createConference', endpoint('createConference'),
+             lambda i: ConferenceForm(name='Bench Conference %d' % i,
+                 city='London', topics=['Web'], startDate='2016-05-01',
+                 endDate='2016-05-03', maxAttendees=100)),
+        Case('updateConference', endpoint('updateConference'),
+             lambda i: container(conference.CONF_POST_REQUEST,
+                 websafeConferenceKey=own, name='Updated %d' % i)),
+        Case('getConference', endpoint('getConference'),
+             lambda i: container(conference.CONF_GET_REQUEST,
+                 websafeConferenceKey=anyConf(i))),
+        Case('getConferencesCreated', endpoint('getConferencesCreated'),
+             lambda i: container(conference.CONF_LIST_REQUEST)),
+        Case('queryConferences', endpoint('queryConferences'),
+             lambda i: ConferenceQueryForms(filters=[
+                 ConferenceQueryForm(field='CITY', operator='EQ',
+                                     value=rnd.choice(CITIES))],
+                 pageSize=20)),
+        Case('queryConferences(all)', endpoint('queryConferences'),
+             lambda i: ConferenceQueryForms()),
+        Case('searchConferences', endpoint('searchConferences'),
+             lambda i: container(conference.CONF_SEARCH_REQUEST,
+                 query=rnd.choice(TOPICS), pageSize=20)),
+        Case('getProfile', endpoint('getProfile'), void),
+        Case('saveProfile', endpoint('saveProfile'),
+             lambda i: ProfileMiniForm(displayName='Bench %d' % i)),
+        Case('getConferencesToAttend', endpoint('getConferencesToAttend'),
+             lambda i: container(conference.CONF_LIST_REQUEST)),
+        Case('getConferenceAttendees', endpoint('getConferenceAttendees'),
+             lambda i: container(conference.CONF_ATTENDEES_REQUEST,
+                 websafeConferenceKey=own, pageSize=20)),
+        Case('registerForConference', endpoint('registerForConference'),
+             lambda i: container(conference.CONF_GET_REQUEST,
+                 websafeConferenceKey=openConfs[i % len(openConfs)])),
+        Case('unregisterFromConference', endpoint('unregisterFromConference'),
+             lambda i: container(conference.CONF_GET_REQUEST,
+                 websafeConferenceKey=openConfs[i % len(openConfs)])),
+        Case('getAnnouncement', endpoint('getAnnouncement'), void),
+        Case('createSession', endpoint('createSession'),
+             lambda i: container(conference.SESSION_POST_REQUEST,
+                 websafeConferenceKey=own, **dict(
+                     (f.name, getattr(newSession(i), f.name))
+                     for f in SessionForm.all_fields()
+                     if f.name != 'websafeConferenceKey'))),
+        Case('createSessions(20)', endpoint('createSessions'),
+             lambda i: container(conference.SESSIONS_POST_REQUEST,
+                 websafeConferenceKey=own,
+                 items=[newSession(n, 'Batch %d Session' % i)
+                        for n in range(20)])),
+        Case('getConferenceSessions', endpoint('getConferenceSessions'),
+             lambda i: container(conference.SESSION_GET_REQUEST,
+                 websafeConferenceKey=anyConf(i))),
+        Case('getConferenceSessionsByType', endpoint('getConferenceSessionsByType'),
+             lambda i: container(conference.SESSION_GET_REQUEST,
+                 websafeConferenceKey=anyConf(i),
+                 typeOfSession=rnd.choice(SESSION_TYPES))),
+        Case('getSessionsBySpeaker', endpoint('getSessionsBySpeaker'),
+             lambda i: container(conference.SESSION_GET_REQUEST,
+                 speaker=anySpeaker(i))),
+        Case('getSpeakers', endpoint('getSpeakers'),
+             lambda i: container(conference.SPEAKER_LIST_REQUEST, pageSize=20)),
+        Case('getSpeaker', endpoint('getSpeaker'),
+             lambda i: container(conference.SPEAKER_GET_REQUEST,
+                 speaker=anySpeaker(i).upper())),
+        Case('addSessionToWishList', endpoint('addSessionToWishList'),
+             lambda i: container(conference.USERWISHLIST_POST_REQUEST,
+                 sessionKey=wishSessions[i % len(wishSessions)])),
+        Case('getSessionsInWishList', endpoint('getSessionsInWishList'),
+             lambda i: container(conference.USERWISHLIST_LIST_REQUEST)),
+        Case('getSessionsInWishList(expand)', endpoint('getSessionsInWishList'),
+             lambda i: container(conference.USERWISHLIST_LIST_REQUEST,
+                 expand=True)),
+        Case('deleteSessionInWishlist', endpoint('deleteSessionInWishlist'),
+             lambda i: container(conference.USERWISHLIST_POST_REQUEST,
+                 sessionKey=wishSessions[i % len(wishSessions)])),
+        Case('deleteSessionsInWishlist', endpoint('deleteSessionsInWishlist'),
+             lambda i: container(conference.USERWISHLIST_BULK_REQUEST,
+                 sessionKeys=rnd.sample(data['sessionKeys'], 5))),
+        Case('getSessionsBySpeakerlessthanequaltoduration',
+             endpoint('getSessionsBySpeakerlessthanequaltoduration'),
+             lambda i: container(conference.SESSIONS_QUERY_ONE_GET_REQUEST,
+                 speaker=anySpeaker(i), duration=90)),
+        Case('getSessionsOfATypeOnAParticularDate',
+             endpoint('getSessionsOfATypeOnAParticularDate'),
+             lambda i: container(conference.SESSIONS_QUERY_TWO_GET_REQUEST,
+                 typeOfSession=rnd.choice(SESSION_TYPES),
+                 date='2016-%02d-01' % rnd.randint(1, 12), pageSize=20)),
+        Case('getSessionsNotWorkshopsNotAfter7pm',
+             endpoint('getSessionsNotWorkshopsNotAfter7pm'),
+             lambda i: container(conference.SESSION_PAGE_REQUEST, pageSize=20)),
+        Case('querySessions', endpoint('querySessions'),
+             lambda i: SessionQueryForms(filters=[
+                 SessionQueryForm(field='TYPE', operator='EQ',
+                                  value=rnd.choice(SESSION_TYPES)),
+                 SessionQueryForm(field='START_TIME', operator='LT',
+                                  value='12:00')],
+                 pageSize=20)),
+        Case('searchSessions', endpoint('searchSessions'),
+             lambda i: container(conference.SESSION_SEARCH_REQUEST,
+                 query='"%s"' % anySpeaker(i), pageSize=20)),
+        Case('getFeaturedSpeaker', endpoint('getFeaturedSpeaker'), void),
+        Case('getStatistics', endpoint('getStatistics'), void),
+        Case('getRecommendedSessions', endpoint('getRecommendedSessions'),
+             lambda i: container(conference.SESSION_RECOMMENDATIONS_REQUEST,
+                 sessionKey=rnd.choice(wishSessions), expand=True)),
+        Case('getConferenceStatistics', endpoint('getConferenceStatistics'),
+             lambda i: container(conference.CONF_GET_REQUEST,
+                 websafeConferenceKey=anyConf(i))),
+    ]
+
+
+def handlerCases(tb, data, rnd):
+    """Return a Case for every main.py cron, task and admin handler."""
+    import webapp2
+    import main
+    from google.appengine.ext import ndb
+    from models import ImportJob
+    from models import RecommendationJob
+    from recommendations import startRecommendations
+    from models import Speaker
+
+    def handler(url, method='POST'):
+        def call(i, params):
+            request = webapp2.Request.blank(url, POST=params if method == 'POST' else None)
+            response = request.get_response(main.app)
+            if response.status_int >= 400:
+                raise RuntimeError('%s returned %s' % (url, response.status))
+        return call
+
+    blobstore = tb.get_stub('blobstore')
+    lines = ['{"name": "Imported %d", "city": "London", "maxAttendees": 100}' % n
+             for n in range(200)]
+
+    def importJob(i):
+        blobKey = 'bench-import-%d' % i
+        blobstore.CreateBlob(blobKey, '\n'.join(lines) + '\n')
+        job = ImportJob(kind='Conference', fileFormat='jsonl',
+                        blobKey=ndb.BlobKey(blobKey), fileName='bench.jsonl',
+                        userId=BENCH_USER, email=BENCH_USER)
+        job.put()
+        return {'job': str(job.key.id()), 'chunk': '0'}
+
+    def recommendationJob(i):
+        wsck = data['featuredConfWsck']
+        startRecommendations(ndb.Key(urlsafe=wsck))
+        return {'websafeConferenceKey': wsck,
+                'chunk': str(RecommendationJob.get_by_id(wsck).chunk)}
+
+    return [
+        Case('/crons/set_announcement',
+             handler('/crons/set_announcement', method='GET')),
+        Case('/crons/rebuild_statistics',
+             handler('/crons/rebuild_statistics', method='GET')),
+        Case('/tasks/send_confirmation_email',
+             handler('/tasks/send_confirmation_email'),
+             lambda i: {'email': BENCH_USER, 'conferenceInfo': 'Bench'}),
+        Case('/tasks/set_memcache_notif_and_send_featured_speaker_email',
+             handler('/tasks/set_memcache_notif_and_send_featured_speaker_email'),
+             lambda i: {'websafeConferenceKey': data['featuredConfWsck'],
+                        'featured_speaker': data['featuredSpeaker'],
+                        'email': BENCH_USER}),
+        Case('/tasks/update_speakers', handler('/tasks/update_speakers'),
+             lambda i: {'websafeConferenceKey': data['featuredConfWsck'],
+                        'speaker': Speaker.keyForName(data['featuredSpeaker']).id()}),
+        Case('/tasks/update_organizer_name',
+             handler('/tasks/update_organizer_name'),
+             lambda i: {'profile': ndb.Key('Profile', BENCH_USER).urlsafe()}),
+        Case('/tasks/sync_seats_available',
+             handler('/tasks/sync_seats_available'),
+             lambda i: {'websafeConferenceKey': rnd.choice(data['confWscks'])}),
+        Case('/tasks/import_chunk', handler('/tasks/import_chunk'), importJob),
+        Case('/tasks/compute_recommendations',
+             handler('/tasks/compute_recommendations'), recommendationJob),
+        Case('/tasks/send_import_summary',
+             handler('/tasks/send_import_summary'),
+             lambda i: {'job': importJob(i)['job']}),
+    ]
+
+
+def runCase(case, iterations, counter, flushTasks):
+    """Time case and return its summary dict."""
+    import endpoints
+    from google.appengine.ext import ndb
+
+    latencies, rpcs, errors = [], collections.Counter(), 0
+    for i in range(iterations):
+        request = case.request(i)
+        # each call starts like a new request: no in-context cache
+        ndb.get_context().clear_cache()
+        counter.reset()
+        start = timeit.default_timer()
+        try:
+            case.call(i, request)
+        except endpoints.ServiceException:
+            errors += 1
+        latencies.append((timeit.default_timer() - start) * 1000)
+        rpcs.update(counter.counts)
+        flushTasks()
+
+    return {
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'rpcs': round(sum(rpcs.values()) / float(iterations), 2),
+        'rpcsByCall': dict((call, round(n / float(iterations), 2))
+                           for call, n in sorted(rpcs.items())),
+        'errors': errors,
+    }
+
+
+def runScale(scale, args):
+    """Seed a fresh testbed at scale and run every case against it."""
+    from conference import ConferenceApi
+
+    rnd = random.Random(args.seed)
+    tb = activateTestbed()
+    try:
+        counter = RpcCounter()
+        counter.install()
+        taskqueue = tb.get_stub('taskqueue')
+
+        def flushTasks():
+            for queue in taskqueue.GetQueues():
+                taskqueue.FlushQueue(queue['name'])
+
+        started = timeit.default_timer()
+        data = seed(scale, rnd)
+        print('scale %s: %d conferences, %d sessions, %d profiles, '
+              '%d wishlist entries (seeded in %.1fs)' % (
+                  scale, data['conferences'], data['sessions'],
+                  data['profiles'], data['wishlists'],
+                  timeit.default_timer() - started))
+
+        results = collections.OrderedDict()
+        for case in (endpointCases(ConferenceApi(), data, rnd) +
+                     handlerCases(tb, data, rnd)):
+            if args.only and case.name not in args.only:
+                continue
+            results[case.name] = result = runCase(case, args.iterations,
+                                                  counter, flushTasks)
+            print('  %-50s p50 %8.2fms  p95 %8.2fms  %6.1f rpcs%s' % (
+                case.name, result['p50_ms'], result['p95_ms'], result['rpcs'],
+                '  (%d errors)' % result['errors'] if result['errors'] else ''))
+        return {
+            'conferences': data['conferences'],
+            'sessions': data['sessions'],
+            'profiles': data['profiles'],
+            'cases': results,
+        }
+    finally:
+        tb.deactivate()
+
+
+def gitRevision():
+    """Return the short commit id of ROOT, marked -dirty if modified."""
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                      cwd=ROOT).strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain',
+                                         '--untracked-files=no'], cwd=ROOT)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return rev + ('-dirty' if dirty.strip() else '')
+
+
+def compare(results, baseline):
+    """Print p50/p95/RPC changes of results relative to baseline."""
+    print('\ncompared to %s:' % baseline['revision'])
+    for scale, run in sorted(results['scales'].items()):
+        before = baseline['scales'].get(scale)
+        if not before:
+            continue
+        print('scale %s' % scale)
+        for name, now in run['cases'].items():
+            then = before['cases'].get(name)
+            if not then:
+                continue
+            print('  %-50s p50 %6.2fx  p95 %6.2fx  rpcs %+6.1f' % (
+                name, now['p50_ms'] / max(then['p50_ms'], 1e-6),
+                now['p95_ms'] / max(then['p95_ms'], 1e-6),
+                now['rpcs'] - then['rpcs']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sdk', default=os.environ.get('APPENGINE_SDK',
+                        '/usr/local/google_appengine'))
+    parser.add_argument('--scales', default='0.01,0.1',
+                        help='comma separated multiples of the base dataset')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', nargs='*', help='case names to run')
+    parser.add_argument('--output', help='results file (default: '
+                        'benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='results file to compare against')
+    args = parser.parse_args()
+
+    setupPaths(args.sdk)
+    revision = gitRevision()
+    results = {'revision': revision, 'iterations': args.iterations,
+               'scales': {}}
+    for scale in args.scales.split(','):
+        results['scales'][scale] = runScale(float(scale), args)
+
+    output = args.output or os.path.join(RESULTS_DIR, '%s.json' % revision)
+    if not os.path.isdir(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print('\nresults saved to %s' % output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
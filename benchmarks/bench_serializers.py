@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+"""bench_serializers.py -- per-item cost of copying entities to forms
+
+Compares the reflective all_fields()/hasattr/getattr copy the API used
+to do against the precompiled serializers in serializers.py. Entities
+are built in memory, so no datastore stub is needed.
+
+usage: python benchmarks/bench_serializers.py [--sdk PATH] [--items N] [--repeat R]
+
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import date
+from datetime import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setupPaths(sdk):
+    """Put the App Engine SDK and the app on sys.path."""
+    sys.path.insert(0, sdk)
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('APPLICATION_ID', 'dev~confcenter-1156')
+
+
+def legacyConferenceCopy(conf, displayName):
+    from models import ConferenceForm
+    cf = ConferenceForm()
+    for field in cf.all_fields():
+        if hasattr(conf, field.name):
+            if field.name.endswith('Date'):
+                setattr(cf, field.name, str(getattr(conf, field.name)))
+            else:
+                setattr(cf, field.name, getattr(conf, field.name))
+        elif field.name == "websafeKey":
+            setattr(cf, field.name, conf.key.urlsafe())
+    if displayName:
+        setattr(cf, 'organizerDisplayName', displayName)
+    cf.check_initialized()
+    return cf
+
+
+def legacySessionCopy(session):
+    from models import SessionForm
+    sf = SessionForm()
+    for field in sf.all_fields():
+        if hasattr(session, field.name):
+            if field.name == 'date' or field.name == 'startTime':
+                setattr(sf, field.name, str(getattr(session, field.name)))
+            else:
+                setattr(sf, field.name, getattr(session, field.name))
+        elif field.name == "sessionUrlSafeKey":
+            setattr(sf, field.name, session.key.urlsafe())
+    sf.check_initialized()
+    return sf
+
+
+def compiledConferenceCopy(conf, displayName):
+    from serializers import CONFERENCE_SERIALIZER
+    cf = CONFERENCE_SERIALIZER.serialize(conf)
+    if displayName:
+        cf.organizerDisplayName = displayName
+    cf.check_initialized()
+    return cf
+
+
+def compiledSessionCopy(session):
+    from serializers import SESSION_SERIALIZER
+    sf = SESSION_SERIALIZER.serialize(session)
+    sf.check_initialized()
+    return sf
+
+
+def makeEntities(items):
+    """Return (conferences, sessions) lists of unsaved entities."""
+    from google.appengine.ext import ndb
+    from models import Conference
+    from models import Profile
+    from models import Session
+
+    p_key = ndb.Key(Profile, 'organizer@example.com')
+    confs, sessions = [], []
+    for i in range(items):
+        c_key = ndb.Key(Conference, i + 1, parent=p_key)
+        confs.append(Conference(key=c_key,
+            name='Conference %d' % i, description='x' * 200,
+            organizerUserId='organizer@example.com',
+            topics=['Web', 'Cloud'], city='London',
+            startDate=date(2016, 5, 1), month=5, endDate=date(2016, 5, 3),
+            maxAttendees=500, seatsAvailable=250))
+        sessions.append(Session(key=ndb.Key(Session, i + 1, parent=c_key),
+            name='Session %d' % i, highlights='y' * 200,
+            speaker='Speaker %d' % (i % 50), duration=60,
+            typeOfSession='talk', date=date(2016, 5, 1),
+            startTime=time(10, 0), websafeConferenceKey=c_key.urlsafe()))
+    return confs, sessions
+
+
+def bench(label, fn, entities, repeat):
+    """Print the best per-item time of fn over entities in microseconds."""
+    best = min(timeit.repeat(lambda: [fn(e) for e in entities],
+                             number=1, repeat=repeat))
+    perItem = best / len(entities) * 1e6
+    print('%-28s %8.2f us/item' % (label, perItem))
+    return perItem
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sdk', default=os.environ.get('APPENGINE_SDK',
+                        '/usr/local/google_appengine'))
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setupPaths(args.sdk)
+    confs, sessions = makeEntities(args.items)
+
+    for kind, entities, legacy, compiled in (
+            ('Conference', confs,
+             lambda c: legacyConferenceCopy(c, 'Organizer'),
+             lambda c: compiledConferenceCopy(c, 'Organizer')),
+            ('Session', sessions, legacySessionCopy, compiledSessionCopy)):
+        before = bench('%s reflective' % kind, legacy, entities, args.repeat)
+        after = bench('%s precompiled' % kind, compiled, entities, args.repeat)
+        print('%-28s %8.2fx' % ('%s speedup' % kind, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+"""derive_indexes.py -- derive the minimal index.yaml from the app's queries
+
+Runs every endpoint and handler case of bench_endpoints.py once, plus
+queryConferences and querySessions with every combination of up to
+--max-filters filters, against a small seeded testbed datastore. The
+composite indexes those queries needed are then generated from the
+datastore stub's query history, the same way dev_appserver updates the
+AUTOGENERATED part of index.yaml. Indexes above the AUTOGENERATED marker
+of the output file are kept as they are and not generated again.
+
+usage: python benchmarks/derive_indexes.py [--sdk PATH] [--max-filters N]
+           [--output index.yaml]
+
+"""
+
+import argparse
+import itertools
+import os
+import random
+
+from bench_endpoints import activateTestbed
+from bench_endpoints import endpointCases
+from bench_endpoints import handlerCases
+from bench_endpoints import seed
+from bench_serializers import ROOT
+from bench_serializers import setupPaths
+
+MARKER = '# AUTOGENERATED'
+
+HEADER = """indexes:
+
+"""
+
+AUTOGENERATED = """# AUTOGENERATED
+
+# This index.yaml is automatically updated whenever the dev_appserver
+# detects that a new type of query is run.  If you want to manage the
+# index.yaml file manually, remove the above marker line (the line
+# saying "# AUTOGENERATED").  If you want to manage some indexes
+# manually, move them above the marker line.  The index.yaml file is
+# automatically uploaded to the admin console when you next deploy
+# your application using appcfg.py.
+
+"""
+
+# a sample value per filter field
+CONFERENCE_VALUES = {
+    'CITY': 'London',
+    'TOPIC': 'Web',
+    'MONTH': '5',
+    'MAX_ATTENDEES': '100',
+    'START_DATE': '2016-05-01',
+    'END_DATE': '2016-05-03',
+}
+SESSION_VALUES = {
+    'TYPE': ['talk'],
+    'SPEAKER': ['Speaker 1'],
+    'DURATION': ['60'],
+    'DATE': ['2016-05-01'],
+    # on the hour (bucketed) and not
+    'START_TIME': ['10:00', '10:30'],
+}
+OPERATORS = ['EQ', 'LT', 'GTEQ', 'NE']
+
+
+def filterCombinations(values, maxFilters):
+    """Yield lists of (field, operator, value) for up to maxFilters fields."""
+    for n in range(1, maxFilters + 1):
+        for fields in itertools.combinations(sorted(values), n):
+            for ops in itertools.product(OPERATORS, repeat=n):
+                for vals in itertools.product(*[
+                        values[f] if isinstance(values[f], list) else [values[f]]
+                        for f in fields]):
+                    yield zip(fields, ops, vals)
+
+
+def runQuietly(call):
+    """Run call, ignoring the errors of filter combinations the API rejects."""
+    import endpoints
+    try:
+        call()
+        return True
+    except endpoints.ServiceException:
+        return False
+
+
+def exerciseQueries(tb, maxFilters):
+    """Run every query shape the API can issue once."""
+    from conference import ConferenceApi
+    from models import ConferenceQueryForm
+    from models import ConferenceQueryForms
+    from models import SessionQueryForm
+    from models import SessionQueryForms
+
+    rnd = random.Random(1)
+    data = seed(0, rnd)
+    api = ConferenceApi()
+
+    cases = endpointCases(api, data, rnd) + handlerCases(tb, data, rnd)
+    for case in cases:
+        request = case.request(0)
+        try:
+            case.call(0, request)
+        except Exception as e:
+            print('warning: %s failed: %s' % (case.name, e))
+
+    for paged in (None, 20):
+        for combo in filterCombinations(CONFERENCE_VALUES, maxFilters):
+            runQuietly(lambda: api.queryConferences(ConferenceQueryForms(
+                filters=[ConferenceQueryForm(field=f, operator=op, value=v)
+                         for f, op, v in combo], pageSize=paged)))
+        for combo in filterCombinations(SESSION_VALUES, maxFilters):
+            runQuietly(lambda: api.querySessions(SessionQueryForms(
+                filters=[SessionQueryForm(field=f, operator=op, value=v)
+                         for f, op, v in combo], pageSize=paged)))
+
+
+def readManualIndexes(path):
+    """Return the part of the index.yaml at path above the AUTOGENERATED
+    marker, or HEADER if there is no such file or marker."""
+    if not os.path.exists(path):
+        return HEADER
+    with open(path) as f:
+        text = f.read()
+    if MARKER not in text:
+        return HEADER
+    return text[:text.index(MARKER)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sdk', default=os.environ.get('APPENGINE_SDK',
+                        '/usr/local/google_appengine'))
+    parser.add_argument('--max-filters', type=int, default=3)
+    parser.add_argument('--output', default=os.path.join(ROOT, 'index.yaml'))
+    args = parser.parse_args()
+
+    setupPaths(args.sdk)
+    from google.appengine.datastore import datastore_index
+    from google.appengine.datastore import datastore_stub_index
+
+    manual = readManualIndexes(args.output)
+    manual_defs = datastore_index.ParseIndexDefinitions(manual)
+
+    tb = activateTestbed()
+    try:
+        exerciseQueries(tb, args.max_filters)
+        history = tb.get_stub('datastore_v3').QueryHistory()
+        indexes = datastore_stub_index.GenerateIndexFromHistory(
+            history, manual_indexes=manual_defs)
+    finally:
+        tb.deactivate()
+
+    with open(args.output, 'w') as f:
+        f.write(manual + AUTOGENERATED + indexes)
+    print('%d composite indexes written to %s' % (
+        indexes.count('- kind:'), args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""cache.py
+
+Udacity conference server-side Python App Engine read-through cache;
+a small per-instance LRU in front of memcache.
+
+Entries in the instance LRU expire after LOCAL_CACHE_TTL seconds, which
+bounds how long another instance can serve a form after it has been
+invalidated here (memcache deletes are not seen by other instances).
+
+Invalidation leaves an INVALIDATED marker in memcache rather than
+deleting the entry, and a miss fills the entry by compare-and-set
+against the marker it read. A reader that loaded a conference before an
+update committed therefore cannot store its stale form afterwards: the
+update's invalidation has replaced the marker, so the fill's CAS fails.
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from google.appengine.api import memcache
+from protorpc import protojson
+
+from models import ConferenceForm
+
+MEMCACHE_CONFERENCE_PREFIX = "CONFERENCE_FORM:"
+MEMCACHE_CONFERENCE_TTL = 600
+LOCAL_CACHE_SIZE = 500
+LOCAL_CACHE_TTL = 10
+INVALIDATED = 'INVALIDATED'
+
+
+class LRUCache(object):
+    """LRUCache -- thread-safe, size-bounded cache with per-entry expiry"""
+
+    def __init__(self, capacity, ttl):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the live value stored under key, or None."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                return None
+            # re-insert to mark as most recently used
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + self.ttl, value)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def delete_multi(self, keys):
+        """Drop every key in keys."""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+_conference_forms = LRUCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+
+
+def getCachedConferenceForm(wsck):
+    """Return (cf, lease): the cached ConferenceForm for wsck, or on a
+    miss None and the lease to pass to cacheConferenceForm.
+
+    Each call decodes a fresh message, so callers may modify it.
+    """
+    encoded = _conference_forms.get(wsck)
+    if encoded is None:
+        key = MEMCACHE_CONFERENCE_PREFIX + wsck
+        client = memcache.Client()
+        encoded = client.gets(key)
+        if encoded is None:
+            # a marker to compare-and-set against; an invalidation between
+            # now and the fill replaces it
+            client.add(key, INVALIDATED, time=MEMCACHE_CONFERENCE_TTL)
+            encoded = client.gets(key)
+        if encoded is None:
+            return None, None
+        if encoded == INVALIDATED:
+            return None, client
+        _conference_forms.set(wsck, encoded)
+    return protojson.decode_message(ConferenceForm, encoded), None
+
+
+def cacheConferenceForm(wsck, cf, lease):
+    """Store ConferenceForm cf for wsck in both cache tiers, unless it was
+    invalidated since lease was taken by getCachedConferenceForm."""
+    if lease is None:
+        return
+    encoded = protojson.encode_message(cf)
+    if lease.cas(MEMCACHE_CONFERENCE_PREFIX + wsck, encoded,
+                 time=MEMCACHE_CONFERENCE_TTL):
+        _conference_forms.set(wsck, encoded)
+
+
+def invalidateConferenceForms(wscks):
+    """Evict the cached ConferenceForms for every websafe key in wscks."""
+    wscks = list(wscks)
+    if not wscks:
+        return
+    _conference_forms.delete_multi(wscks)
+    memcache.set_multi(dict((wsck, INVALIDATED) for wsck in wscks),
+                       key_prefix=MEMCACHE_CONFERENCE_PREFIX,
+                       time=MEMCACHE_CONFERENCE_TTL)
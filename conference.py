@@ -20,14 +20,18 @@ from protorpc import messages
 from protorpc import message_types
 from protorpc import remote
 
+from google.appengine.api import datastore_errors
 from google.appengine.api import memcache
 from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
 from google.appengine.ext import ndb
 
 from models import ConflictException
 from models import Profile
 from models import ProfileMiniForm
 from models import ProfileForm
+from models import ProfileForms
+from models import Registration
 from models import BooleanMessage
 from models import Conference
 from models import ConferenceForm
@@ -36,13 +40,24 @@ from models import ConferenceQueryForm
 from models import ConferenceQueryForms
 from models import TeeShirtSize
 
+from models import ConferenceSpeaker
 from models import Session
 from models import SessionForm
 from models import SessionForms
+from models import SessionQueryForm
+from models import SessionQueryForms
+from models import Speaker
+from models import SpeakerForm
+from models import SpeakerForms
 
 from models import UserWishList
 from models import UserWishListForm
 from models import UserWishListForms
+from models import RecommendedSessionForm
+from models import RecommendedSessionForms
+from models import StatCountForm
+from models import StatisticsForm
+from models import ConferenceStatisticsForm
 
 from google.appengine.api import memcache
 from google.appengine.api import taskqueue
@@ -53,15 +68,66 @@ from models import StringMessage
 
 from utils import getUserId
 
+from cache import cacheConferenceForm
+from cache import getCachedConferenceForm
+from cache import invalidateConferenceForms
+
+from serializers import CONFERENCE_SERIALIZER
+from serializers import PROFILE_SERIALIZER
+from serializers import SESSION_SERIALIZER
+from serializers import SPEAKER_SERIALIZER
+from serializers import USERWISHLIST_SERIALIZER
+
+from seats import adjustCachedSeats
+from seats import ensureSeatShards
+from seats import getSeatsAvailable
+from seats import getSeatsAvailableAsync
+from seats import invalidateCachedSeats
+from seats import openSeatShardKeys
+from seats import randomSeatShardKey
+from seats import scheduleSeatsChange
+from seats import shardedSeats
+from seats import scheduleSeatsSync
+
+from instrumentation import instrument
+
+from speakers import scheduleSpeakerUpdate
+
+from organizers import scheduleOrganizerNameUpdate
+from recommendations import recommendationsKey
+from recommendations import recommendedSessions
+from registrations import migrateProfile
+from registrations import registrationKey
+
+from stats import addCounts
+from stats import addSessionStats
+from stats import adjustStats
+from stats import adjustStatsAsync
+from stats import conferenceCounts
+from stats import conferenceStatsKey
+from stats import getStatistics
+from stats import sessionCounts
+
+from textsearch import indexConferences
+from textsearch import indexSessions
+from textsearch import searchConferenceKeys
+from textsearch import searchSessionKeys
+
 from settings import WEB_CLIENT_ID
 
+import collections
 import logging
+import operator
 import string
 
 EMAIL_SCOPE = endpoints.EMAIL_SCOPE
 API_EXPLORER_CLIENT_ID = endpoints.API_EXPLORER_CLIENT_ID
-MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT_ANNOUNCEMENTS"
+MEMCACHE_NEARLY_SOLD_OUT_KEY = "NEARLY_SOLD_OUT_CONFERENCES"
+NEARLY_SOLD_OUT_SEATS = 5
+MEMCACHE_CAS_RETRIES = 10
 MEMCACHE_FEATURED_SPEAKER_KEY = "FEATURED_SPEAKER"
+MAX_PAGE_SIZE = 100
+MAX_SESSION_BATCH = 200
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
@@ -91,6 +157,44 @@ FIELDS =    {
             'TOPIC': 'topics',
             'MONTH': 'month',
             'MAX_ATTENDEES': 'maxAttendees',
+            'START_DATE': 'startDate',
+            'END_DATE': 'endDate',
+            }
+
+# residual (in-memory) conference filters
+RESIDUAL_OPERATORS = {
+            '=': operator.eq,
+            '!=': operator.ne,
+            '<': operator.lt,
+            '<=': operator.le,
+            '>': operator.gt,
+            '>=': operator.ge,
+            }
+RANGE_OPERATORS = frozenset(['<', '<=', '>', '>='])
+# most entities one paged, residually filtered query may read
+MAX_SCAN = 1000
+
+SESSION_FIELDS = {
+            'TYPE': 'typeOfSession',
+            'SPEAKER': 'speakerKey',
+            'DURATION': 'duration',
+            'DATE': 'date',
+            'START_TIME': 'startTime',
+            }
+
+# (equality, inequality) Session properties with a composite index in
+# index.yaml; querySessions rejects other mixes of the two
+SESSION_INDEXED_MIXES = frozenset([
+            ('speakerKey', 'duration'),
+            ('typeOfSession', 'date'),
+            ('startsBeforeHour', 'typeOfSession'),
+            ('startsFromHour', 'typeOfSession'),
+            ])
+
+# startTime filters that can be answered from the Session hour buckets
+START_TIME_BUCKETS = {
+            '<': 'startsBeforeHour',
+            '>=': 'startsFromHour',
             }
 
 CONF_GET_REQUEST = endpoints.ResourceContainer(
@@ -98,6 +202,20 @@ CONF_GET_REQUEST = endpoints.ResourceContainer(
     websafeConferenceKey=messages.StringField(1),
 )
 
+CONF_LIST_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    fields=messages.StringField(1, repeated=True),
+    pageSize=messages.IntegerField(2, variant=messages.Variant.INT32),
+    cursor=messages.StringField(3),
+)
+
+CONF_ATTENDEES_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey=messages.StringField(1),
+    pageSize=messages.IntegerField(2, variant=messages.Variant.INT32),
+    cursor=messages.StringField(3),
+)
+
 CONF_POST_REQUEST = endpoints.ResourceContainer(
     ConferenceForm,
     websafeConferenceKey=messages.StringField(1),
@@ -108,6 +226,44 @@ SESSION_GET_REQUEST = endpoints.ResourceContainer(
     websafeConferenceKey=messages.StringField(1),
     typeOfSession=messages.StringField(2),
     speaker=messages.StringField(3),
+    pageSize=messages.IntegerField(4, variant=messages.Variant.INT32),
+    cursor=messages.StringField(5),
+    fields=messages.StringField(6, repeated=True),
+)
+
+CONF_SEARCH_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    query=messages.StringField(1),
+    pageSize=messages.IntegerField(2, variant=messages.Variant.INT32),
+    cursor=messages.StringField(3),
+    fields=messages.StringField(4, repeated=True),
+)
+
+SESSION_SEARCH_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    query=messages.StringField(1),
+    pageSize=messages.IntegerField(2, variant=messages.Variant.INT32),
+    cursor=messages.StringField(3),
+    fields=messages.StringField(4, repeated=True),
+    websafeConferenceKey=messages.StringField(5),
+)
+
+SPEAKER_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    speaker=messages.StringField(1),
+)
+
+SPEAKER_LIST_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    pageSize=messages.IntegerField(1, variant=messages.Variant.INT32),
+    cursor=messages.StringField(2),
+)
+
+SESSION_PAGE_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    pageSize=messages.IntegerField(1, variant=messages.Variant.INT32),
+    cursor=messages.StringField(2),
+    fields=messages.StringField(3, repeated=True),
 )
 
 SESSION_POST_REQUEST = endpoints.ResourceContainer(
@@ -115,26 +271,53 @@ SESSION_POST_REQUEST = endpoints.ResourceContainer(
     websafeConferenceKey=messages.StringField(1),
 )
 
+SESSIONS_POST_REQUEST = endpoints.ResourceContainer(
+    SessionForms,
+    websafeConferenceKey=messages.StringField(1),
+)
+
 USERWISHLIST_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     sessionKey=messages.StringField(1),
 )
 
+USERWISHLIST_LIST_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    expand=messages.BooleanField(1),
+)
+
 USERWISHLIST_POST_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     sessionKey=messages.StringField(1),
 )
 
+SESSION_RECOMMENDATIONS_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    sessionKey=messages.StringField(1),
+    expand=messages.BooleanField(2),
+)
+
+USERWISHLIST_BULK_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    sessionKeys=messages.StringField(1, repeated=True),
+)
+
 SESSIONS_QUERY_ONE_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     speaker=messages.StringField(1),
     duration=messages.IntegerField(2),
+    pageSize=messages.IntegerField(3, variant=messages.Variant.INT32),
+    cursor=messages.StringField(4),
+    fields=messages.StringField(5, repeated=True),
 )
 
 SESSIONS_QUERY_TWO_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     typeOfSession=messages.StringField(1),
     date=messages.StringField(2),
+    pageSize=messages.IntegerField(3, variant=messages.Variant.INT32),
+    cursor=messages.StringField(4),
+    fields=messages.StringField(5, repeated=True),
 )
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -146,34 +329,111 @@ SESSIONS_QUERY_TWO_GET_REQUEST = endpoints.ResourceContainer(
 class ConferenceApi(remote.Service):
     """Conference API v0.1"""
 
+# - - - Pagination - - - - - - - - - - - - - - - - - - - - -
+
+    def _checkPaging(self, pageSize, cursor):
+        """Check pageSize and return cursor as a datastore Cursor (or None)."""
+        if pageSize and pageSize < 0:
+            raise endpoints.BadRequestException("'pageSize' must be positive.")
+        try:
+            return Cursor(urlsafe=cursor) if cursor else None
+        except datastore_errors.BadValueError:
+            raise endpoints.BadRequestException("Invalid 'cursor' provided.")
+
+
+    def _fetchPage(self, query, pageSize, cursor, keys_only=False):
+        """Run query once, returning (entities, nextCursor) for one page.
+
+        Without a pageSize a page holds MAX_PAGE_SIZE entities.
+        """
+        start_cursor = self._checkPaging(pageSize, cursor)
+        results, next_cursor, more = query.fetch_page(
+            min(pageSize or MAX_PAGE_SIZE, MAX_PAGE_SIZE),
+            start_cursor=start_cursor, keys_only=keys_only)
+        if more and next_cursor:
+            return results, next_cursor.urlsafe()
+        return results, None
+
+
+    def _checkFields(self, fields, form_cls):
+        """Return the set of requested form fields, or None for all fields."""
+        if not fields:
+            return None
+        fields = set(fields)
+        unknown = fields - set(field.name for field in form_cls.all_fields())
+        if unknown:
+            raise endpoints.BadRequestException(
+                "Unknown field(s) requested: %s" % ', '.join(sorted(unknown)))
+        return fields
+
+
+    def _searchKeys(self, search_fn, request, **kwargs):
+        """Run a keyword search for request, returning (keys, nextCursor)."""
+        if not request.query:
+            raise endpoints.BadRequestException("'query' field required")
+        if request.pageSize and request.pageSize < 0:
+            raise endpoints.BadRequestException("'pageSize' must be positive.")
+        try:
+            return search_fn(request.query,
+                min(request.pageSize or MAX_PAGE_SIZE, MAX_PAGE_SIZE),
+                request.cursor, **kwargs)
+        except ValueError as e:
+            raise endpoints.BadRequestException("Invalid search: %s" % e)
+
+
 # - - - Conference objects - - - - - - - - - - - - - - - - -
 
-    def _copyConferenceToForm(self, conf, displayName):
-        """Copy relevant fields from Conference to ConferenceForm."""
-        cf = ConferenceForm()
-        for field in cf.all_fields():
-            if hasattr(conf, field.name):
-                # convert Date to date string; just copy others
-                if field.name.endswith('Date'):
-                    setattr(cf, field.name, str(getattr(conf, field.name)))
-                else:
-                    setattr(cf, field.name, getattr(conf, field.name))
-            elif field.name == "websafeKey":
-                setattr(cf, field.name, conf.key.urlsafe())
-        if displayName:
+    def _copyConferenceToForm(self, conf, displayName, seatsAvailable=None, fields=None):
+        """Copy relevant fields (all, or only those in fields) from Conference to ConferenceForm."""
+        cf = CONFERENCE_SERIALIZER.serialize(conf, fields)
+        if displayName and (fields is None or 'organizerDisplayName' in fields):
             setattr(cf, 'organizerDisplayName', displayName)
+        # sharded seat totals supersede the stored seatsAvailable
+        if seatsAvailable is not None and (fields is None or 'seatsAvailable' in fields):
+            cf.seatsAvailable = seatsAvailable
         cf.check_initialized()
         return cf
 
 
-    def _createConferenceObject(self, request):
-        """Create or update Conference object, returning ConferenceForm/request."""
-        # preload necessary data items
-        user = endpoints.get_current_user()
-        if not user:
-            raise endpoints.UnauthorizedException('Authorization required')
-        user_id = getUserId(user)
+    @ndb.tasklet
+    def _getSeatsAvailableAsync(self, confs, fields=None):
+        """Return a Future for the current seats available of each of confs."""
+        if fields is not None and 'seatsAvailable' not in fields:
+            raise ndb.Return([None] * len(confs))
+        seats = yield getSeatsAvailableAsync([conf.key for conf in confs],
+                                             [conf.seatsAvailable for conf in confs])
+        raise ndb.Return(seats)
+
+
+    @ndb.tasklet
+    def _getOrganizerNamesAsync(self, confs, fields=None):
+        """Return a Future for the organizer display name of each of confs.
+
+        The name is stored on the Conference; only conferences saved before
+        it was are looked up on their organizer's Profile (their parent).
+        """
+        if fields is not None and 'organizerDisplayName' not in fields:
+            raise ndb.Return([None] * len(confs))
+
+        names = [conf.organizerDisplayName for conf in confs]
+        missing = [i for i, name in enumerate(names) if name is None]
+        if missing:
+            profiles = yield ndb.get_multi_async([confs[i].key.parent() for i in missing])
+            for i, profile in zip(missing, profiles):
+                names[i] = getattr(profile, 'displayName', None)
+        raise ndb.Return(names)
+
+
+    def _getOrganizerNamesAndSeats(self, confs, fields=None):
+        """Return (names, seats) for confs, fetching both concurrently."""
+        names = self._getOrganizerNamesAsync(confs, fields)
+        seats = self._getSeatsAvailableAsync(confs, fields)
+        return names.get_result(), seats.get_result()
+
 
+    @staticmethod
+    def _copyConferenceFormToData(request):
+        """Check a ConferenceForm, filling in DEFAULTS; return its Conference data dict."""
         if not request.name:
             raise endpoints.BadRequestException("Conference 'name' field required")
 
@@ -200,33 +460,71 @@ class ConferenceApi(remote.Service):
         # set seatsAvailable to be same as maxAttendees on creation
         if data["maxAttendees"] > 0:
             data["seatsAvailable"] = data["maxAttendees"]
-        # generate Profile Key based on user ID and Conference
-        # ID based on Profile key get Conference key from ID
+        return data
+
+
+    def _createConferenceObject(self, request):
+        """Create or update Conference object, returning ConferenceForm/request."""
+        # preload necessary data items
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+        # generate Profile Key based on user ID; the datastore assigns
+        # the Conference ID under it on put. The organizer's display name
+        # is read while the request is checked
         p_key = ndb.Key(Profile, user_id)
-        c_id = Conference.allocate_ids(size=1, parent=p_key)[0]
-        c_key = ndb.Key(Conference, c_id, parent=p_key)
-        data['key'] = c_key
+        prof_future = p_key.get_async()
+
+        data = self._copyConferenceFormToData(request)
+        data['parent'] = p_key
         data['organizerUserId'] = request.organizerUserId = user_id
+        data['organizerDisplayName'] = getattr(prof_future.get_result(), 'displayName', None)
 
         # create Conference, send email to organizer confirming
-        # creation of Conference & return (modified) ConferenceForm
-        Conference(**data).put()
+        # creation of Conference & return (modified) ConferenceForm;
+        # the email is only queued once the put has succeeded, and runs
+        # alongside the statistics update and the indexing
+        conf = Conference(**data)
+        conf.put()
         # TODO 2: add confirmation email sending task to queue
-        taskqueue.add(params={'email': user.email(),
+        task_rpc = taskqueue.Queue().add_async(taskqueue.Task(
+            params={'email': user.email(),
             'conferenceInfo': repr(request)},
             url='/tasks/send_confirmation_email'
-        )
+        ))
+        stats_future = adjustStatsAsync(conferenceCounts(conf))
+        indexConferences([conf])
+        task_rpc.get_result()
+        stats_future.get_result()
 
         return request
 
 
-    @ndb.transactional()
     def _updateConferenceObject(self, request):
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization required')
-        user_id = getUserId(user)
+        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+        # the seats left before the update, read outside its transaction
+        # so that it stays within the conference's entity group
+        oldSeats = None
+        if request.seatsAvailable is not None:
+            oldSeats = shardedSeats(c_key)
+        conf = self._updateConference(request, getUserId(user), oldSeats)
+        # a new seatsAvailable is what the shards change to; otherwise
+        # the shards hold the current total, not the synced copy on conf
+        if request.seatsAvailable is not None:
+            seats = conf.seatsAvailable
+        else:
+            seats = getSeatsAvailable([conf.key], [conf.seatsAvailable])[0]
+        return self._copyConferenceToForm(conf, conf.organizerDisplayName, seats)
+
 
+    @ndb.transactional
+    def _updateConference(self, request, user_id, oldSeats):
+        """Update the Conference from request in a transaction and return it;
+        oldSeats are the seats left in its shards (None if not sharded)."""
         # copy ConferenceForm/ProtoRPC Message into dict
         data = {field.name: getattr(request, field.name) for field in request.all_fields()}
 
@@ -241,13 +539,17 @@ class ConferenceApi(remote.Service):
         if user_id != conf.organizerUserId:
             raise endpoints.ForbiddenException(
                 'Only the owner can update the conference.')
+        removed = conferenceCounts(conf, sign=-1)
+        if oldSeats is None:
+            oldSeats = conf.seatsAvailable
 
         # Not getting all the fields, so don't create a new object; just
         # copy relevant fields from ConferenceForm to Conference object
         for field in request.all_fields():
             data = getattr(request, field.name)
-            # only copy fields where we get data
-            if data not in (None, []):
+            # only copy fields where we get data; the organizer's display
+            # name comes from their Profile, never from the request
+            if data not in (None, []) and field.name != 'organizerDisplayName':
                 # special handling for dates (convert string to Date)
                 if field.name in ('startDate', 'endDate'):
                     data = datetime.strptime(data, "%Y-%m-%d").date()
@@ -255,9 +557,27 @@ class ConferenceApi(remote.Service):
                         conf.month = data.month
                 # write to Conference object
                 setattr(conf, field.name, data)
+        # once seats are sharded, a new seatsAvailable is added to the
+        # shards as a change by a task, so registrations made before it
+        # runs are kept
+        if conf.seatShards and request.seatsAvailable is not None:
+            scheduleSeatsChange(conf, request.seatsAvailable - oldSeats)
+        # conferences saved before display names were stored pick theirs up
+        if conf.organizerDisplayName is None:
+            conf.organizerDisplayName = getattr(conf.key.parent().get(), 'displayName', None)
         conf.put()
-        prof = ndb.Key(Profile, user_id).get()
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        # drop the cached form and seat total, reindex the conference and
+        # move its statistics counts once the new values are committed
+        def onCommit():
+            invalidateConferenceForms([conf.key.urlsafe()])
+            invalidateCachedSeats([conf.key])
+            indexConferences([conf])
+            adjustStats(addCounts(removed, conferenceCounts(conf)))
+            if request.seatsAvailable is not None:
+                self._updateNearlySoldOut(conf, conf.seatsAvailable,
+                                          conf.seatsAvailable - oldSeats)
+        ndb.get_context().call_on_commit(onCommit)
+        return conf
 
 
     @endpoints.method(ConferenceForm, ConferenceForm, path='conference',
@@ -280,17 +600,27 @@ class ConferenceApi(remote.Service):
             http_method='GET', name='getConference')
     def getConference(self, request):
         """Return requested conference (by websafeConferenceKey)."""
-        # get Conference object from request; bail if not found
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
+        # serve the cached form if we have one
+        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+        wsck = c_key.urlsafe()
+        cf, lease = getCachedConferenceForm(wsck)
+        if cf is not None:
+            cf.seatsAvailable = getSeatsAvailable([c_key], [cf.seatsAvailable])[0]
+            return cf
+
+        # get Conference object; bail if not found
+        conf = c_key.get()
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % request.websafeConferenceKey)
-        prof = conf.key.parent().get()
-        # return ConferenceForm
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        # cache and return ConferenceForm
+        names, seats = self._getOrganizerNamesAndSeats([conf])
+        cf = self._copyConferenceToForm(conf, names[0], seats[0])
+        cacheConferenceForm(wsck, cf, lease)
+        return cf
 
 
-    @endpoints.method(message_types.VoidMessage, ConferenceForms,
+    @endpoints.method(CONF_LIST_REQUEST, ConferenceForms,
             path='getConferencesCreated',
             http_method='POST', name='getConferencesCreated')
     def getConferencesCreated(self, request):
@@ -300,39 +630,55 @@ class ConferenceApi(remote.Service):
         if not user:
             raise endpoints.UnauthorizedException('Authorization required')
         user_id =  getUserId(user)
+        fields = self._checkFields(request.fields, ConferenceForm)
         # create ancestor query for all key matches for this user
-        confs = Conference.query(ancestor=ndb.Key(Profile, user_id))
-        prof = ndb.Key(Profile, user_id).get()
+        p_key = ndb.Key(Profile, user_id)
+        prof_future = p_key.get_async()
+        confs, next_cursor = self._fetchPage(Conference.query(ancestor=p_key),
+            request.pageSize, request.cursor)
+        seats = self._getSeatsAvailableAsync(confs, fields).get_result()
+        prof = prof_future.get_result()
         # return set of ConferenceForm objects per Conference
         return ConferenceForms(
-            items=[self._copyConferenceToForm(conf, getattr(prof, 'displayName')) for conf in confs]
+            items=[self._copyConferenceToForm(conf, getattr(prof, 'displayName'), seatsLeft, fields)
+                   for conf, seatsLeft in zip(confs, seats)],
+            nextCursor=next_cursor
         )
 
 
     def _getQuery(self, request):
-        """Return formatted query from the submitted filters."""
-        q = Conference.query()
-        inequality_filter, filters = self._formatFilters(request.filters)
+        """Plan a query for the submitted filters; return (query, residual).
 
-        # If exists, sort on inequality filter first
-        if not inequality_filter:
-            q = q.order(Conference.name)
+        Only built-in single-property indexes are used. All equality
+        filters go to the datastore, which merge-joins their indexes
+        (ordered by key). Without equalities, the first range filter's
+        property is scanned in order. Every other filter, including "!=",
+        is left in residual to be checked in memory.
+        """
+        q = Conference.query()
+        filters = self._formatFilters(request.filters)
+        equalities = [f for f in filters if f["operator"] == "="]
+        ranges = [f for f in filters if f["operator"] in RANGE_OPERATORS]
+
+        if equalities:
+            driving = equalities
+        elif ranges:
+            driving = [f for f in ranges if f["field"] == ranges[0]["field"]]
+            q = q.order(ndb.GenericProperty(ranges[0]["field"]))
         else:
-            q = q.order(ndb.GenericProperty(inequality_filter))
+            driving = []
             q = q.order(Conference.name)
 
-        for filtr in filters:
-            if filtr["field"] in ["month", "maxAttendees"]:
-                filtr["value"] = int(filtr["value"])
-            formatted_query = ndb.query.FilterNode(filtr["field"], filtr["operator"], filtr["value"])
-            q = q.filter(formatted_query)
-        return q
+        for filtr in driving:
+            q = q.filter(ndb.query.FilterNode(filtr["field"], filtr["operator"], filtr["value"]))
+        residual = [f for f in filters if f not in driving]
+        # order by key last so that every plan has a stable cursor order
+        return q.order(Conference.key), residual
 
 
     def _formatFilters(self, filters):
         """Parse, check validity and format user supplied filters."""
         formatted_filters = []
-        inequality_field = None
 
         for f in filters:
             filtr = {field.name: getattr(f, field.name) for field in f.all_fields()}
@@ -343,18 +689,57 @@ class ConferenceApi(remote.Service):
             except KeyError:
                 raise endpoints.BadRequestException("Filter contains invalid field or operator.")
 
-            # Every operation except "=" is an inequality
-            if filtr["operator"] != "=":
-                # check if inequality operation has been used in previous filters
-                # disallow the filter if inequality was performed on a different field before
-                # track the field on which the inequality operation is performed
-                if inequality_field and inequality_field != filtr["field"]:
-                    raise endpoints.BadRequestException("Inequality filter is allowed on only one field.")
-                else:
-                    inequality_field = filtr["field"]
+            try:
+                if filtr["field"] in ["month", "maxAttendees"]:
+                    filtr["value"] = int(filtr["value"])
+                elif filtr["field"] in ["startDate", "endDate"]:
+                    filtr["value"] = datetime.strptime(filtr["value"], "%Y-%m-%d").date()
+            except (TypeError, ValueError):
+                raise endpoints.BadRequestException(
+                    "Invalid value for filter on %s." % filtr["field"])
 
             formatted_filters.append(filtr)
-        return (inequality_field, formatted_filters)
+        return formatted_filters
+
+
+    @staticmethod
+    def _matchesFilters(conf, filters):
+        """Return True if conf passes every filter, with datastore semantics:
+        a repeated property matches if any value does, a missing one never.
+        """
+        for filtr in filters:
+            op = RESIDUAL_OPERATORS[filtr["operator"]]
+            values = getattr(conf, filtr["field"])
+            if not isinstance(values, list):
+                values = [values]
+            if not any(value is not None and op(value, filtr["value"])
+                       for value in values):
+                return False
+        return True
+
+
+    def _fetchFilteredPage(self, query, residual, pageSize, cursor):
+        """Like _fetchPage, but keep only entities passing the residual filters.
+
+        A page stops after MAX_SCAN reads even if short, so a selective
+        residual filter costs bounded work per call; nextCursor resumes.
+        """
+        if not residual:
+            return self._fetchPage(query, pageSize, cursor)
+        start_cursor = self._checkPaging(pageSize, cursor)
+        pageSize = min(pageSize or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        results, scanned = [], 0
+        it = query.iter(start_cursor=start_cursor, produce_cursors=True,
+                        batch_size=MAX_PAGE_SIZE)
+        for entity in it:
+            scanned += 1
+            if self._matchesFilters(entity, residual):
+                results.append(entity)
+            if len(results) == pageSize or scanned == MAX_SCAN:
+                break
+        if it.has_next():
+            return results, it.cursor_after().urlsafe()
+        return results, None
 
 
     @endpoints.method(ConferenceQueryForms, ConferenceForms,
@@ -363,38 +748,50 @@ class ConferenceApi(remote.Service):
             name='queryConferences')
     def queryConferences(self, request):
         """Query for conferences."""
-        conferences = self._getQuery(request)
+        fields = self._checkFields(request.fields, ConferenceForm)
 
-        # need to fetch organiser displayName from profiles
-        # get all keys and use get_multi for speed
-        organisers = [(ndb.Key(Profile, conf.organizerUserId)) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
+        # run the planned query once; the same page feeds profiles and forms
+        query, residual = self._getQuery(request)
+        conferences, next_cursor = self._fetchFilteredPage(
+            query, residual, request.pageSize, request.cursor)
 
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
+        names, seats = self._getOrganizerNamesAndSeats(conferences, fields)
 
         # return individual ConferenceForm object per Conference
         return ConferenceForms(
-                items=[self._copyConferenceToForm(conf, names[conf.organizerUserId]) for conf in \
-                conferences]
+                items=[self._copyConferenceToForm(conf, name, seatsLeft, fields) \
+                for conf, name, seatsLeft in zip(conferences, names, seats)],
+                nextCursor=next_cursor
+        )
+
+
+    @endpoints.method(CONF_SEARCH_REQUEST, ConferenceForms,
+            path='searchConferences',
+            http_method='GET',
+            name='searchConferences')
+    def searchConferences(self, request):
+        """Keyword search over conference names, descriptions & topics, best match first."""
+        fields = self._checkFields(request.fields, ConferenceForm)
+        keys, next_cursor = self._searchKeys(searchConferenceKeys, request)
+        # skip documents whose conference is gone
+        conferences = [conf for conf in ndb.get_multi(keys) if conf]
+
+        names, seats = self._getOrganizerNamesAndSeats(conferences, fields)
+        return ConferenceForms(
+                items=[self._copyConferenceToForm(conf, name, seatsLeft, fields)
+                for conf, name, seatsLeft in zip(conferences, names, seats)],
+                nextCursor=next_cursor
         )
 
 
 # - - - Profile objects - - - - - - - - - - - - - - - - - - -
 
-    def _copyProfileToForm(self, prof):
+    def _copyProfileToForm(self, prof, conferenceKeysToAttend=None):
         """Copy relevant fields from Profile to ProfileForm."""
         # copy relevant fields from Profile to ProfileForm
-        pf = ProfileForm()
-        for field in pf.all_fields():
-            if hasattr(prof, field.name):
-                # convert t-shirt string to Enum; just copy others
-                if field.name == 'teeShirtSize':
-                    setattr(pf, field.name, getattr(TeeShirtSize, getattr(prof, field.name)))
-                else:
-                    setattr(pf, field.name, getattr(prof, field.name))
+        pf = PROFILE_SERIALIZER.serialize(prof)
+        # registrations are Registration entities, not a Profile list
+        pf.conferenceKeysToAttend = conferenceKeysToAttend or []
         pf.check_initialized()
         return pf
 
@@ -419,10 +816,23 @@ class ConferenceApi(remote.Service):
                 teeShirtSize = str(TeeShirtSize.NOT_SPECIFIED),
             )
             profile.put()
+        # move registrations still listed on the Profile into Registrations
+        elif profile.conferenceKeysToAttend:
+            profile = migrateProfile(p_key)
 
         return profile      # return Profile
 
 
+    @ndb.transactional
+    def _saveProfile(self, prof, renamed):
+        """Put prof; if renamed, schedule the copy of its new name."""
+        prof.put()
+        # the user's conferences store the display name; copy the new
+        # one onto them (and drop their cached forms) in the background
+        if renamed:
+            scheduleOrganizerNameUpdate(prof.key, transactional=True)
+
+
     def _doProfile(self, save_request=None):
         """Get user Profile and return to user, possibly updating it first."""
         # get user Profile
@@ -430,6 +840,7 @@ class ConferenceApi(remote.Service):
 
         # if saveProfile(), process user-modifyable fields
         if save_request:
+            oldDisplayName = prof.displayName
             for field in ('displayName', 'teeShirtSize'):
                 if hasattr(save_request, field):
                     val = getattr(save_request, field)
@@ -439,10 +850,12 @@ class ConferenceApi(remote.Service):
                         #    setattr(prof, field, str(val).upper())
                         #else:
                         #    setattr(prof, field, val)
-            prof.put()
+            self._saveProfile(prof, prof.displayName != oldDisplayName)
 
         # return ProfileForm
-        return self._copyProfileToForm(prof)
+        # the user's own registrations, for the form's conferenceKeysToAttend
+        r_keys = Registration.query(ancestor=prof.key).fetch(keys_only=True)
+        return self._copyProfileToForm(prof, [r_key.id() for r_key in r_keys])
 
 
     @endpoints.method(message_types.VoidMessage, ProfileForm,
@@ -462,6 +875,34 @@ class ConferenceApi(remote.Service):
 # - - - Registration - - - - - - - - - - - - - - - - - - - -
 
     @ndb.transactional(xg=True)
+    def _takeSeat(self, p_key, shard_key, conf_key):
+        """Move one seat from a SeatShard to a new Registration; None if it ran out."""
+        r_key = registrationKey(p_key, conf_key)
+        registration, shard = ndb.get_multi([r_key, shard_key])
+        if registration:
+            raise ConflictException(
+                "You have already registered for this conference")
+        if shard.seatsAvailable <= 0:
+            return None
+
+        shard.seatsAvailable -= 1
+        ndb.put_multi([Registration(key=r_key, conferenceKey=conf_key), shard])
+        return True
+
+
+    @ndb.transactional(xg=True)
+    def _returnSeat(self, p_key, shard_key, conf_key):
+        """Move the Profile's seat back to a SeatShard; False if not registered."""
+        registration, shard = ndb.get_multi([registrationKey(p_key, conf_key), shard_key])
+        if not registration:
+            return False
+
+        shard.seatsAvailable += 1
+        registration.key.delete()
+        shard.put()
+        return True
+
+
     def _conferenceRegistration(self, request, reg=True):
         """Register or unregister user for selected conference."""
         retval = None
@@ -474,66 +915,106 @@ class ConferenceApi(remote.Service):
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % wsck)
+        conf = ensureSeatShards(conf)
 
         # register
         if reg:
             # check if user already registered otherwise add
-            if wsck in prof.conferenceKeysToAttend:
+            if registrationKey(prof.key, conf.key).get():
                 raise ConflictException(
                     "You have already registered for this conference")
 
-            # check if seats avail
-            if conf.seatsAvailable <= 0:
+            # register user, taking a seat from any shard that has one;
+            # a shard emptied by a concurrent registration is skipped
+            for shard_key in openSeatShardKeys(conf):
+                retval = self._takeSeat(prof.key, shard_key, conf.key)
+                if retval:
+                    break
+            else:
                 raise ConflictException(
                     "There are no seats available.")
+            delta = -1
 
-            # register user, take away one seat
-            prof.conferenceKeysToAttend.append(wsck)
-            conf.seatsAvailable -= 1
-            retval = True
-
-        # unregister
+        # unregister, adding back one seat
         else:
-            # check if user already registered
-            if wsck in prof.conferenceKeysToAttend:
-
-                # unregister user, add back one seat
-                prof.conferenceKeysToAttend.remove(wsck)
-                conf.seatsAvailable += 1
-                retval = True
-            else:
-                retval = False
-
-        # write things back to the datastore & return
-        prof.put()
-        conf.put()
+            retval = self._returnSeat(prof.key, randomSeatShardKey(conf), conf.key)
+            delta = 1
+
+        if retval:
+            stats_future = adjustStatsAsync({'registrations': -delta})
+            seats = adjustCachedSeats(conf.key, delta)
+            if seats is None:
+                seats = getSeatsAvailable([conf.key], [conf.seatsAvailable])[0]
+            self._updateNearlySoldOut(conf, seats, delta)
+            scheduleSeatsSync(conf.key)
+            stats_future.get_result()
         return BooleanMessage(data=retval)
 
 
-    @endpoints.method(message_types.VoidMessage, ConferenceForms,
+    @endpoints.method(CONF_LIST_REQUEST, ConferenceForms,
             path='conferences/attending',
             http_method='GET', name='getConferencesToAttend')
     def getConferencesToAttend(self, request):
         """Get list of conferences that user has registered for."""
+        fields = self._checkFields(request.fields, ConferenceForm)
         prof = self._getProfileFromUser() # get user Profile
-        conf_keys = [ndb.Key(urlsafe=wsck) for wsck in prof.conferenceKeysToAttend]
-        conferences = ndb.get_multi(conf_keys)
-
-        # get organizers
-        organisers = [ndb.Key(Profile, conf.organizerUserId) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
-
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
+        # one page of the user's Registrations, keyed by conference
+        r_keys, next_cursor = self._fetchPage(Registration.query(ancestor=prof.key),
+            request.pageSize, request.cursor, keys_only=True)
+        c_keys = [ndb.Key(urlsafe=r_key.id()) for r_key in r_keys]
+
+        # the conference keys are known, so read the seat totals alongside
+        # the conferences; conferences without shards report no total here
+        # and fall back to their stored seatsAvailable
+        conf_futures = ndb.get_multi_async(c_keys)
+        if fields is None or 'seatsAvailable' in fields:
+            seats_future = getSeatsAvailableAsync(c_keys, [None] * len(c_keys))
+        else:
+            seats_future = None
+        found = [(conf, seatsLeft) for conf, seatsLeft in
+                 zip([f.get_result() for f in conf_futures],
+                     seats_future.get_result() if seats_future else [None] * len(c_keys))
+                 if conf]
+        conferences = [conf for conf, seatsLeft in found]
+        seats = [conf.seatsAvailable if seatsLeft is None else seatsLeft
+                 for conf, seatsLeft in found]
+        names = self._getOrganizerNamesAsync(conferences, fields).get_result()
 
         # return set of ConferenceForm objects per Conference
-        return ConferenceForms(items=[self._copyConferenceToForm(conf, names[conf.organizerUserId])\
-         for conf in conferences]
+        return ConferenceForms(items=[self._copyConferenceToForm(conf, name, seatsLeft, fields)\
+         for conf, name, seatsLeft in zip(conferences, names, seats)],
+         nextCursor=next_cursor
         )
 
 
+    @endpoints.method(CONF_ATTENDEES_REQUEST, ProfileForms,
+            path='conference/{websafeConferenceKey}/attendees',
+            http_method='GET', name='getConferenceAttendees')
+    def getConferenceAttendees(self, request):
+        """Return the profiles registered for a conference (organizer only)."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        try:
+            conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
+        except ProtocolBufferDecodeError:
+            raise endpoints.BadRequestException("Invalid websafeConferenceKey provided")
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % request.websafeConferenceKey)
+        if conf.organizerUserId != getUserId(user):
+            raise endpoints.ForbiddenException(
+                'Only the owner can list the attendees.')
+
+        r_keys, next_cursor = self._fetchPage(
+            Registration.query(Registration.conferenceKey == conf.key),
+            request.pageSize, request.cursor, keys_only=True)
+        profiles = ndb.get_multi([r_key.parent() for r_key in r_keys])
+        return ProfileForms(
+            items=[self._copyProfileToForm(prof) for prof in profiles if prof],
+            nextCursor=next_cursor)
+
+
     @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
             path='conference/{websafeConferenceKey}',
             http_method='POST', name='registerForConference')
@@ -552,31 +1033,61 @@ class ConferenceApi(remote.Service):
 
 # - - - Announcements - - - - - - - - - - - - - - - - - - - -
 
+    @staticmethod
+    def _formatAnnouncement(names):
+        """Return the announcement for a {websafeKey: name} dict of
+        nearly sold out conferences ("" if there are none).
+        """
+        if not names:
+            return ""
+        return '%s %s' % (
+            'Last chance to attend! The following conferences '
+            'are nearly sold out:',
+            ', '.join(sorted(names.values())))
+
+
     @staticmethod
     def _cacheAnnouncement():
-        """Create Announcement & assign to memcache; used by
-        memcache cron job & putAnnouncement().
+        """Rebuild the nearly sold out conferences in memcache from the
+        datastore & return the Announcement; used by the memcache cron
+        job to repair drift in the incrementally maintained set.
         """
         confs = Conference.query(ndb.AND(
-            Conference.seatsAvailable <= 5,
+            Conference.seatsAvailable <= NEARLY_SOLD_OUT_SEATS,
             Conference.seatsAvailable > 0)
         ).fetch(projection=[Conference.name])
 
-        if confs:
-            # If there are almost sold out conferences,
-            # format announcement and set it in memcache
-            announcement = '%s %s' % (
-                'Last chance to attend! The following conferences '
-                'are nearly sold out:',
-                ', '.join(conf.name for conf in confs))
-            memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
-        else:
-            # If there are no sold out conferences,
-            # delete the memcache announcements entry
-            announcement = ""
-            memcache.delete(MEMCACHE_ANNOUNCEMENTS_KEY)
+        names = dict((conf.key.urlsafe(), conf.name) for conf in confs)
+        memcache.set(MEMCACHE_NEARLY_SOLD_OUT_KEY, names)
+        return ConferenceApi._formatAnnouncement(names)
+
 
-        return announcement
+    @staticmethod
+    def _updateNearlySoldOut(conf, seats, delta):
+        """Add conf to or drop it from the nearly sold out conferences in
+        memcache if a seat change of delta, leaving seats, moved it across
+        the threshold. Concurrent updates are merged with compare-and-set.
+        """
+        def nearlySoldOut(n):
+            return 0 < n <= NEARLY_SOLD_OUT_SEATS
+        if nearlySoldOut(seats) == nearlySoldOut(seats - delta):
+            return
+
+        wsck = conf.key.urlsafe()
+        client = memcache.Client()
+        for _ in range(MEMCACHE_CAS_RETRIES):
+            names = client.gets(MEMCACHE_NEARLY_SOLD_OUT_KEY)
+            if names is None:
+                # evicted; rebuild from the datastore, then apply this change
+                ConferenceApi._cacheAnnouncement()
+                continue
+            if nearlySoldOut(seats):
+                names[wsck] = conf.name
+            else:
+                names.pop(wsck, None)
+            if client.cas(MEMCACHE_NEARLY_SOLD_OUT_KEY, names):
+                return
+        logging.warning('Could not update nearly sold out conferences for %s', wsck)
 
 
     @endpoints.method(message_types.VoidMessage, StringMessage,
@@ -585,43 +1096,44 @@ class ConferenceApi(remote.Service):
     def getAnnouncement(self, request):
         """Return Announcement from memcache."""
         # TODO 1
-        # return an existing announcement from Memcache or an empty string.
-        announcement = memcache.get(MEMCACHE_ANNOUNCEMENTS_KEY)
-        if not announcement:
-            announcement = ""
-        return StringMessage(data=announcement)
+        # return an announcement for the nearly sold out conferences
+        # in Memcache or an empty string.
+        names = memcache.get(MEMCACHE_NEARLY_SOLD_OUT_KEY)
+        if names is None:
+            # evicted; rebuild it rather than announce nothing until the cron
+            return StringMessage(data=self._cacheAnnouncement())
+        return StringMessage(data=self._formatAnnouncement(names))
 
 # - - - C O N F E R E N C E       C E N T R A L    - - - - - - - -
 # - - - Task 1:  Session objects - - - - - - - - - - - - - - - - -
 
-    def _copySessionToForm(self, session):
-        """Copy relevant fields from Session to SessionForm."""
-        sf = SessionForm()
-        for field in sf.all_fields():
-            if hasattr(session, field.name):
-                # convert Date to date string; just copy others
-                if field.name == 'date' or field.name == 'startTime':
-                    setattr(sf, field.name, str(getattr(session, field.name)))
-                else:
-                    setattr(sf, field.name, getattr(session, field.name))
-            elif field.name == "sessionUrlSafeKey":
-                setattr(sf, field.name, session.key.urlsafe())
-        
+    def _copySessionToForm(self, session, fields=None):
+        """Copy relevant fields (all, or only those in fields) from Session to SessionForm."""
+        sf = SESSION_SERIALIZER.serialize(session, fields)
         sf.check_initialized()
         return sf
 
-    def _createSessionObject(self, request):
-        """Create or update Session object, returning SessionForm/request."""
-        # Obtain user details to send an email at the end of creation
-        user = endpoints.get_current_user()
-        if not user:
-            raise endpoints.UnauthorizedException('Authorization required')
+    def _copySessionPageToForms(self, query, request):
+        """Fetch the requested page of query and return it as SessionForms.
 
+        Only the requested fields are returned; the sessions are read whole.
+        """
+        fields = self._checkFields(request.fields, SessionForm)
+        sessions, next_cursor = self._fetchPage(
+            query, request.pageSize, request.cursor)
+        return SessionForms(
+            items=[self._copySessionToForm(session, fields) for session in sessions],
+            nextCursor=next_cursor
+        )
+
+    @staticmethod
+    def _copySessionFormToData(request):
+        """Check a SessionForm's required fields; return its Session data dict."""
         # check all required fields are filled in
         if not request.name:
             raise endpoints.BadRequestException("Session 'name' field required")
 
-        if not request.speaker:
+        if not request.speaker or not request.speaker.strip():
             raise endpoints.BadRequestException("Session 'speaker' field required")
 
         if not request.duration:
@@ -633,62 +1145,157 @@ class ConferenceApi(remote.Service):
         if not request.startTime:
             raise endpoints.BadRequestException("Session 'startTime' field required")
 
-        # Obtain the creator of the conference provided and check against the user
-        # If the creator of the conference is not the user
-        # Return an error
-        try:
-           conference_key = ndb.Key(urlsafe=request.websafeConferenceKey)
-           conf = conference_key.get()
-        except  ProtocolBufferDecodeError:
-            raise endpoints.BadRequestException("Invalid websafeConferenceKey provided")
-
-        if conf is not None:
-           if conf.organizerUserId != getUserId(user): 
-              raise endpoints.BadRequestException("UserId does not match Conference Organizer ID")
-
         # copy SessionForm/ProtoRPC Message into dict
-        data = {field.name: getattr(request, field.name) for field in request.all_fields()}
+        data = {field.name: getattr(request, field.name) for field in SessionForm.all_fields()}
+        del data['sessionUrlSafeKey']
 
-  
         # add default values for those missing (both data model & outbound Message)
         for df in DEFAULTS_SESSION:
             if data[df] in (None, []):
                 data[df] = DEFAULTS_SESSION[df]
 
-
         # convert date and time from strings to Date objects; 
-        if data['date']:
+        try:
             data['date'] = datetime.strptime(data['date'][:10], "%Y-%m-%d").date()
-        if data['startTime']:
             data['startTime'] = datetime.strptime(data['startTime'][:5], "%H:%M").time()
+        except ValueError:
+            raise endpoints.BadRequestException(
+                "Session 'date' must be YYYY-MM-DD and 'startTime' HH:MM")
 
         # Save the typeOfSession in lower case to make comparison easier when querying
         sessionTypeStr = data['typeOfSession']
         data['typeOfSession'] = str(sessionTypeStr).lower()
+        return data
+
+
+    def _allocateSessionKeys(self, parent_key, count):
+        """Allocate count Session keys under parent_key in one call."""
+        first, last = Session.allocate_ids(size=count, parent=parent_key)
+        return [ndb.Key(Session, s_id, parent=parent_key)
+                for s_id in range(first, last + 1)]
+
+
+    def _createSessionObject(self, request):
+        """Create or update Session object, returning SessionForm/request."""
+        # Obtain user details to send an email at the end of creation
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+
+        data = self._copySessionFormToData(request)
+
+        # Obtain the creator of the conference provided and check against the user
+        # If the creator of the conference is not the user
+        # Return an error
+        try:
+           conference_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+           conf = conference_key.get()
+        except  ProtocolBufferDecodeError:
+            raise endpoints.BadRequestException("Invalid websafeConferenceKey provided")
+
+        if conf is not None:
+           if conf.organizerUserId != getUserId(user): 
+              raise endpoints.BadRequestException("UserId does not match Conference Organizer ID")
 
         # generate Parent Key based on Conference WSK
-        parent_key = ndb.Key(urlsafe=request.websafeConferenceKey)
-        s_id = Session.allocate_ids(size=1, parent=parent_key)[0]
-        s_key = ndb.Key(Session, s_id, parent=parent_key)
-        data['key'] = s_key
-        del data['sessionUrlSafeKey']
+        data['key'] = self._allocateSessionKeys(conference_key, 1)[0]
 
         # create Session, send email to user confirming
         # creation of Session & return (modified) SessionForm
-
         session = Session(**data)
-        session.put()
+        self._putSessionsAndSpeakers([session], user.email())
 
-        # Find if more than one session exists for a speaker
-        sessions_count_by_speaker = Session.query(Session.speaker == request.speaker).count() + 1
+        return self._copySessionToForm(session)
 
-        if sessions_count_by_speaker > 1:
-            taskqueue.add(params={'email': user.email(),
-            'featured_speaker': request.speaker},
-            url='/tasks/set_memcache_notif_and_send_featured_speaker_email')
 
+    def _createSessionObjects(self, request):
+        """Create a batch of Sessions in one conference, returning SessionForms."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
 
-        return self._copySessionToForm(session)
+        if not request.items:
+            raise endpoints.BadRequestException("At least one Session is required")
+        if len(request.items) > MAX_SESSION_BATCH:
+            raise endpoints.BadRequestException(
+                "At most %d Sessions can be created at once" % MAX_SESSION_BATCH)
+
+        # validate every session before writing any
+        datas = [self._copySessionFormToData(item) for item in request.items]
+
+        # check the conference exists and belongs to the user, once
+        try:
+            conference_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+            conf = conference_key.get()
+        except ProtocolBufferDecodeError:
+            raise endpoints.BadRequestException("Invalid websafeConferenceKey provided")
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % request.websafeConferenceKey)
+        if conf.organizerUserId != getUserId(user):
+            raise endpoints.BadRequestException("UserId does not match Conference Organizer ID")
+
+        s_keys = self._allocateSessionKeys(conference_key, len(datas))
+        sessions = []
+        for data, s_key in zip(datas, s_keys):
+            data['key'] = s_key
+            data['websafeConferenceKey'] = request.websafeConferenceKey
+            sessions.append(Session(**data))
+        self._putSessionsAndSpeakers(sessions, user.email())
+
+        return SessionForms(items=[self._copySessionToForm(session) for session in sessions])
+
+
+    @staticmethod
+    @ndb.transactional()
+    def _putSessionsAndSpeakers(sessions, email=None, skipExisting=False):
+        """Save sessions of one conference and count them against their speakers.
+
+        Speakers that now have more than one session here are featured by
+        a single task enqueued along with the commit, unless email is None;
+        a second task recomputes the sessions' Speaker aggregates. The
+        conference's ConferenceStats count the sessions in the same commit.
+        With skipExisting, sessions already stored are neither rewritten
+        nor recounted, so replaying a batch is harmless.
+        """
+        if skipExisting:
+            existing = ndb.get_multi([session.key for session in sessions])
+            sessions = [session for session, found in zip(sessions, existing)
+                        if found is None]
+            if not sessions:
+                return
+
+        # spellings of one name ("Ann Lee", "ann  lee") share a ConferenceSpeaker
+        parent_key = sessions[0].key.parent()
+        sessions_by_speaker = collections.OrderedDict()
+        for session in sessions:
+            cs_key = ConferenceSpeaker.keyForName(parent_key, session.speaker)
+            sessions_by_speaker.setdefault(cs_key, []).append(session)
+
+        cs_keys = sessions_by_speaker.keys()
+        existing = ndb.get_multi(cs_keys + [conferenceStatsKey(parent_key)])
+        stats = addSessionStats(existing.pop(), parent_key, sessions)
+        speakers = []
+        for cs_key, speaker in zip(cs_keys, existing):
+            speakerSessions = sessions_by_speaker[cs_key]
+            speaker = speaker or ConferenceSpeaker(key=cs_key,
+                                                   speaker=speakerSessions[0].speaker)
+            speaker.sessionCount += len(speakerSessions)
+            speaker.sessionNames.extend(session.name for session in speakerSessions)
+            speaker.totalMinutes += sum(session.duration for session in speakerSessions)
+            speakers.append(speaker)
+        ndb.put_multi(sessions + speakers + [stats])
+        ndb.get_context().call_on_commit(lambda: indexSessions(sessions))
+        ndb.get_context().call_on_commit(lambda: adjustStats(sessionCounts(sessions)))
+        scheduleSpeakerUpdate(parent_key, set(speaker.speakerKey for speaker in speakers))
+
+        featured = [speaker.speaker for speaker in speakers if speaker.sessionCount > 1]
+        if featured and email:
+            taskqueue.add(params={'email': email,
+                'featured_speaker': featured,
+                'websafeConferenceKey': parent_key.urlsafe()},
+                url='/tasks/set_memcache_notif_and_send_featured_speaker_email',
+                transactional=True)
 
 
     @endpoints.method(SESSION_POST_REQUEST, SessionForm, 
@@ -698,6 +1305,13 @@ class ConferenceApi(remote.Service):
         """Create new session."""
         return self._createSessionObject(request)
 
+    @endpoints.method(SESSIONS_POST_REQUEST, SessionForms,
+            path='conference/{websafeConferenceKey}/createSessions',
+            http_method='POST', name='createSessions')
+    def createSessions(self, request):
+        """Create a batch of new sessions."""
+        return self._createSessionObjects(request)
+
     @endpoints.method(SESSION_GET_REQUEST, SessionForms, 
             path='conference/{websafeConferenceKey}/getConferenceSessions',
             http_method='GET', name='getConferenceSessions')
@@ -708,10 +1322,8 @@ class ConferenceApi(remote.Service):
         sessions = Session.query(ancestor=parent_key)
 
 
-        # return set of SessionForm objects per Session
-        return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
-        )
+        # return one page of SessionForm objects per Session
+        return self._copySessionPageToForms(sessions, request)
 
     @endpoints.method(SESSION_GET_REQUEST, SessionForms, 
             path='conference/{websafeConferenceKey}/getConferenceSessionsByType/{typeOfSession}',
@@ -724,10 +1336,8 @@ class ConferenceApi(remote.Service):
         sessions = Session.query(ancestor=parent_key)
         sessions = sessions.filter(Session.typeOfSession == request.typeOfSession.lower())
         
-        # return set of SessionForm objects per Session
-        return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
-        )
+        # return one page of SessionForm objects per Session
+        return self._copySessionPageToForms(sessions, request)
 
     @endpoints.method(SESSION_GET_REQUEST, SessionForms, 
             path='conference/{speaker}',
@@ -735,26 +1345,98 @@ class ConferenceApi(remote.Service):
     def getSessionsBySpeaker(self, request):
         """Get All Conference Sessions of a particular speaker"""
 
-        # Query for all sessions then filter by speaker
+        # Query for all sessions then filter by (normalized) speaker
+        if not request.speaker or not request.speaker.strip():
+            raise endpoints.BadRequestException("Session 'speaker' field required")
         sessions = Session.query()
-        sessions = sessions.filter(Session.speaker == request.speaker)
+        sessions = sessions.filter(Session.speakerKey == Speaker.keyForName(request.speaker))
+
+        return self._copySessionPageToForms(sessions, request)
+
+# - - - Speakers - - - - - - - - - - - - - - - - - - - - - - -
+
+    @endpoints.method(SPEAKER_LIST_REQUEST, SpeakerForms,
+            path='speakers',
+            http_method='GET', name='getSpeakers')
+    def getSpeakers(self, request):
+        """Speaker directory, by name: session count, total minutes & conferences."""
+        speakers, next_cursor = self._fetchPage(Speaker.query().order(Speaker.key),
+            request.pageSize, request.cursor)
+        return SpeakerForms(
+            items=[SPEAKER_SERIALIZER.serialize(speaker) for speaker in speakers],
+            nextCursor=next_cursor)
+
+    @endpoints.method(SPEAKER_GET_REQUEST, SpeakerForm,
+            path='speaker/{speaker}',
+            http_method='GET', name='getSpeaker')
+    def getSpeaker(self, request):
+        """Return one speaker's aggregates (by name, any spelling or case)."""
+        if not request.speaker or not request.speaker.strip():
+            raise endpoints.BadRequestException("'speaker' field required")
+        speaker = Speaker.keyForName(request.speaker).get()
+        if not speaker:
+            raise endpoints.NotFoundException(
+                'No speaker found with name: %s' % request.speaker)
+        return SPEAKER_SERIALIZER.serialize(speaker)
 
-        return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
-        )
+# - - - Statistics - - - - - - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    def _copyCountsToForms(counts, prefix=''):
+        """Return StatCountForms of the counts named prefix..., largest first."""
+        items = [(name[len(prefix):], n) for name, n in counts.items()
+                 if name.startswith(prefix)]
+        items.sort(key=lambda item: (-item[1], item[0]))
+        return [StatCountForm(name=name, count=n) for name, n in items]
+
+
+    @endpoints.method(message_types.VoidMessage, StatisticsForm,
+            path='statistics',
+            http_method='GET', name='getStatistics')
+    def getStatistics(self, request):
+        """Return site-wide conference, session and registration statistics."""
+        counts = getStatistics()
+        seats = counts.get('seats', 0)
+        return StatisticsForm(
+            conferences=counts.get('conferences', 0),
+            sessions=counts.get('sessions', 0),
+            seats=seats,
+            registrations=counts.get('registrations', 0),
+            fillRate=counts.get('registrations', 0) / float(seats) if seats else 0.0,
+            conferencesByCity=self._copyCountsToForms(counts, 'city:'),
+            conferencesByMonth=self._copyCountsToForms(counts, 'month:'),
+            sessionsByType=self._copyCountsToForms(counts, 'type:'))
+
+
+    @endpoints.method(CONF_GET_REQUEST, ConferenceStatisticsForm,
+            path='conference/{websafeConferenceKey}/statistics',
+            http_method='GET', name='getConferenceStatistics')
+    def getConferenceStatistics(self, request):
+        """Return one conference's session counts and fill rate."""
+        try:
+            c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+        except ProtocolBufferDecodeError:
+            raise endpoints.BadRequestException("Invalid websafeConferenceKey provided")
+        conf, stats = ndb.get_multi([c_key, conferenceStatsKey(c_key)])
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % request.websafeConferenceKey)
+        seats = getSeatsAvailable([c_key], [conf.seatsAvailable])[0]
+        return ConferenceStatisticsForm(
+            websafeConferenceKey=request.websafeConferenceKey,
+            sessions=stats.sessions if stats else 0,
+            sessionMinutes=stats.sessionMinutes if stats else 0,
+            sessionsByType=self._copyCountsToForms(stats.sessionTypes) if stats else [],
+            maxAttendees=conf.maxAttendees,
+            seatsAvailable=seats,
+            fillRate=(conf.maxAttendees - (seats or 0)) / float(conf.maxAttendees)
+                     if conf.maxAttendees else 0.0)
 
 # - - - Task 2:  User Wish List objects - - - - - - - - - - - - - - - - -
 
     def _copyUserWishListToForm(self, userwishlist):
         """Copy relevant fields from UserWishList to UserWishListForm."""
-        uwlf = UserWishListForm()
-        for field in uwlf.all_fields():
-            if hasattr(userwishlist, field.name):
-                # convert Date to date string; just copy others
-                if field.name == "dateAddedToWishList":
-                    setattr(uwlf, field.name, str(getattr(userwishlist, field.name)))
-                else:
-                    setattr(uwlf, field.name, getattr(userwishlist, field.name))
+        uwlf = USERWISHLIST_SERIALIZER.serialize(userwishlist)
         uwlf.check_initialized()
         return uwlf
 
@@ -813,20 +1495,38 @@ class ConferenceApi(remote.Service):
         """Add a session to the User's Wish list."""
         return self._addSessionToUserWishList(request)
 
-    @endpoints.method(message_types.VoidMessage, UserWishListForms, 
+    @endpoints.method(USERWISHLIST_LIST_REQUEST, UserWishListForms, 
             path='profile/getWishList',
             http_method='GET', name='getSessionsInWishList')
     def getSessionsInWishList(self, request):
-        """Get all sessions of a user"""
+        """Get all sessions of a user, with session details if expand is set"""
         # Obtain user information and check user is logged in
         user = endpoints.get_current_user()
         if not user:
             raise endpoints.UnauthorizedException('Authorization required')
         user_id = getUserId(user)
-        # Obtain all user wish list matching the user id 
-        userwishlist_sessions = UserWishList.query(UserWishList.userID == user_id)
-
-        return UserWishListForms(items=[self._copyUserWishListToForm(session) for session in userwishlist_sessions])
+        # Obtain all user wish list entries under the user's Profile
+        userwishlist_sessions = UserWishList.query(ancestor=ndb.Key(Profile, user_id))
+
+        forms = [self._copyUserWishListToForm(session) for session in userwishlist_sessions]
+        if request.expand:
+            self._expandUserWishListForms(forms)
+        return UserWishListForms(items=forms)
+
+    def _expandUserWishListForms(self, forms):
+        """Fill in each form's session and conference name with one get_multi"""
+        s_keys = [ndb.Key(urlsafe=form.sessionKey) for form in forms]
+        # sessions are children of their conference, so both key sets are known
+        keys = list(set(s_keys) | set(s_key.parent() for s_key in s_keys))
+        entities = dict(zip(keys, ndb.get_multi(keys)))
+
+        for form, s_key in zip(forms, s_keys):
+            session = entities[s_key]
+            if session:
+                form.session = self._copySessionToForm(session)
+            conf = entities[s_key.parent()]
+            if conf:
+                form.conferenceName = conf.name
 
     @endpoints.method(USERWISHLIST_POST_REQUEST, BooleanMessage, 
             path='profile/deleteSessionFromWishList',
@@ -838,14 +1538,73 @@ class ConferenceApi(remote.Service):
         if not request.sessionKey:
             raise endpoints.BadRequestException("Session 'session Key' field required")
 
-        # Obtain all user wish list session matching the given sessionKey
-        # and delete all of them
-        userwishlist_session = UserWishList.query(UserWishList.sessionKey == request.sessionKey)
-        for u in userwishlist_session:
-            u.key.delete()
-        retval = True
+        return self._deleteSessionsFromUserWishList([request.sessionKey])
+
+    @endpoints.method(USERWISHLIST_BULK_REQUEST, BooleanMessage,
+            path='profile/deleteSessionsFromWishList',
+            http_method='DELETE', name='deleteSessionsInWishlist')
+    def deleteSessionsInWishlist(self, request):
+        """Delete all user wish list entries matching any of the session keys"""
+
+        # Check the required field is provided
+        if not request.sessionKeys:
+            raise endpoints.BadRequestException("Session 'session Keys' field required")
+
+        return self._deleteSessionsFromUserWishList(request.sessionKeys)
+
+    def _deleteSessionsFromUserWishList(self, sessionKeys):
+        """Delete the current user's wish list entries for sessionKeys"""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        p_key = ndb.Key(Profile, getUserId(user))
+
+        if not all(sessionKeys):
+            raise endpoints.BadRequestException("Session key must not be empty")
+        if len(set(sessionKeys)) != len(sessionKeys):
+            raise endpoints.BadRequestException("Session keys must not repeat")
+
+        # Match the user's wish list entries against the given session keys
+        # here rather than with an IN filter, which allows only 30 values,
+        # and delete all of them in one batch
+        if len(sessionKeys) == 1:
+            w_keys = UserWishList.query(ancestor=p_key).filter(
+                UserWishList.sessionKey == sessionKeys[0]).fetch(keys_only=True)
+        else:
+            wanted = set(sessionKeys)
+            entries = UserWishList.query(ancestor=p_key).fetch(
+                projection=[UserWishList.sessionKey])
+            w_keys = [entry.key for entry in entries if entry.sessionKey in wanted]
+        ndb.delete_multi(w_keys)
+
         # return deletion is sucessful
-        return BooleanMessage(data=retval)
+        return BooleanMessage(data=True)
+
+    @endpoints.method(SESSION_RECOMMENDATIONS_REQUEST, RecommendedSessionForms,
+            path='session/{sessionKey}/recommendations',
+            http_method='GET', name='getRecommendedSessions')
+    def getRecommendedSessions(self, request):
+        """Sessions most often wishlisted together with a session, with
+        session details if expand is set"""
+        if not request.sessionKey:
+            raise endpoints.BadRequestException("Session 'session Key' field required")
+        try:
+            s_key = ndb.Key(urlsafe=request.sessionKey)
+        except ProtocolBufferDecodeError:
+            raise endpoints.BadRequestException("Session key Invalid")
+        if s_key.kind() != 'Session':
+            raise endpoints.BadRequestException("Session key Invalid")
+
+        # recommendations are precomputed per conference, the session's parent
+        recs = recommendationsKey(s_key.parent()).get()
+        forms = [RecommendedSessionForm(sessionKey=r_key.urlsafe(), wishlistedTogether=n)
+                 for r_key, n in recommendedSessions(recs, s_key)]
+        if request.expand:
+            sessions = ndb.get_multi([ndb.Key(urlsafe=form.sessionKey) for form in forms])
+            for form, session in zip(forms, sessions):
+                if session:
+                    form.session = self._copySessionToForm(session)
+        return RecommendedSessionForms(items=forms)
 
 # - - - Task 3:  Indexes and 2 Queries - - - - - - - - - - - - - - - - -  
 
@@ -857,17 +1616,17 @@ class ConferenceApi(remote.Service):
         """Return sessions of a particular Speaker that are less than duration given"""
 
         # check all required fields are provided
-        if not request.speaker:
+        if not request.speaker or not request.speaker.strip():
             raise endpoints.BadRequestException("Session 'speaker' field required")
         if not request.duration:
             raise endpoints.BadRequestException("Session 'duration' field required")
 
         # Query Session Kind to obtain matches for given speaker and duration in the value provided
-        sessions = Session.query(ndb.AND(Session.speaker == request.speaker,
+        sessions = Session.query(ndb.AND(Session.speakerKey == Speaker.keyForName(request.speaker),
         	                             Session.duration > 0,
         	                             Session.duration <= int(request.duration)))
 
-        return SessionForms(items=[self._copySessionToForm(session) for session in sessions])
+        return self._copySessionPageToForms(sessions, request)
 
 
     @endpoints.method(SESSIONS_QUERY_TWO_GET_REQUEST, SessionForms,
@@ -887,24 +1646,134 @@ class ConferenceApi(remote.Service):
         sessions = Session.query(ndb.AND(Session.typeOfSession == request.typeOfSession.lower(),
         	                             Session.date == datetime.strptime(request.date, "%Y-%m-%d").date()))
 
-        return SessionForms(items=[self._copySessionToForm(session) for session in sessions])
+        return self._copySessionPageToForms(sessions, request)
 
-    @endpoints.method(message_types.VoidMessage, SessionForms,
+    @endpoints.method(SESSION_PAGE_REQUEST, SessionForms,
     	              path='sessions/getSessionsNotWorkshopsNotAfter7pm',
                       http_method='GET',
                       name='getSessionsNotWorkshopsNotAfter7pm')
     def getSessionsNotWorkshopsNotAfter7pm(self, request):
         """Returns non-workshop sessions before 7pm"""
 
-        # Query Session entities to obtain matches that are before 7 pm starttime wise
-        # then check if the type of session is not workshop.
-        sessionlist = Session.query(Session.startTime < datetime.strptime("19:00", "%H:%M").time())
-        sessions = []
-        for s in sessionlist:
-            if s.typeOfSession != "workshop":
-            	sessions.append(s)
+        # Both inequalities are answered by the index: startTime < 19:00
+        # becomes an equality on the startsBeforeHour bucket (which sessions
+        # stored before it existed get from the session_hour_buckets mapper)
+        sessions = self._getSessionQuery([
+            SessionQueryForm(field='TYPE', operator='NE', value='workshop'),
+            SessionQueryForm(field='START_TIME', operator='LT', value='19:00'),
+        ])
 
-        return SessionForms(items=[self._copySessionToForm(session) for session in sessions])
+        return self._copySessionPageToForms(sessions, request)
+
+
+    def _getSessionQuery(self, filters):
+        """Return formatted Session query from the submitted filters."""
+        q = Session.query()
+        inequality_field, filters = self._formatSessionFilters(filters)
+
+        for filtr in filters:
+            formatted_query = ndb.query.FilterNode(filtr["field"], filtr["operator"], filtr["value"])
+            q = q.filter(formatted_query)
+
+        # If exists, sort on inequality filter first
+        if inequality_field:
+            q = q.order(ndb.GenericProperty(inequality_field))
+        return q.order(Session.key)
+
+
+    def _formatSessionFilters(self, filters):
+        """Parse, check validity and format user supplied Session filters.
+
+        The datastore allows one inequality field per query, so when a
+        second one is given, startTime inequalities on the hour are
+        rewritten as equalities on the startsBeforeHour/startsFromHour
+        buckets. Equalities mixed with an inequality need a composite
+        index, so only the mixes in SESSION_INDEXED_MIXES are accepted.
+        """
+        formatted_filters = []
+        inequality_fields = set()
+
+        for f in filters:
+            filtr = {field.name: getattr(f, field.name) for field in f.all_fields()}
+
+            try:
+                filtr["field"] = SESSION_FIELDS[filtr["field"]]
+                filtr["operator"] = OPERATORS[filtr["operator"]]
+            except KeyError:
+                raise endpoints.BadRequestException("Filter contains invalid field or operator.")
+
+            try:
+                if filtr["field"] == "typeOfSession":
+                    filtr["value"] = filtr["value"].lower()
+                elif filtr["field"] == "speakerKey":
+                    filtr["value"] = Speaker.keyForName(filtr["value"])
+                elif filtr["field"] == "duration":
+                    filtr["value"] = int(filtr["value"])
+                elif filtr["field"] == "date":
+                    filtr["value"] = datetime.strptime(filtr["value"], "%Y-%m-%d").date()
+                elif filtr["field"] == "startTime":
+                    filtr["value"] = datetime.strptime(filtr["value"], "%H:%M").time()
+            except (AttributeError, TypeError, ValueError,
+                    datastore_errors.BadArgumentError):
+                raise endpoints.BadRequestException(
+                    "Filter contains invalid value for %s." % filtr["field"])
+
+            # Every operation except "=" is an inequality
+            if filtr["operator"] != "=":
+                inequality_fields.add(filtr["field"])
+            formatted_filters.append(filtr)
+
+        if len(inequality_fields) > 1:
+            if len(inequality_fields) > 2 or "startTime" not in inequality_fields:
+                raise endpoints.BadRequestException(
+                    "Inequality filters are allowed on one field plus startTime.")
+            for filtr in formatted_filters:
+                if filtr["field"] != "startTime":
+                    continue
+                if filtr["operator"] not in START_TIME_BUCKETS or filtr["value"].minute:
+                    raise endpoints.BadRequestException(
+                        "startTime combined with another inequality must use "
+                        "LT or GTEQ on the hour.")
+                filtr["field"] = START_TIME_BUCKETS[filtr["operator"]]
+                filtr["operator"] = "="
+                filtr["value"] = filtr["value"].hour
+            inequality_fields.discard("startTime")
+
+        inequality_field = inequality_fields.pop() if inequality_fields else None
+        equality_fields = set(filtr["field"] for filtr in formatted_filters
+                              if filtr["operator"] == "=")
+        if inequality_field and equality_fields:
+            if len(equality_fields) > 1 or \
+                    (equality_fields.pop(), inequality_field) not in SESSION_INDEXED_MIXES:
+                raise endpoints.BadRequestException(
+                    "Equality filters can be combined with an inequality only "
+                    "as SPEAKER with DURATION, TYPE with DATE, or START_TIME "
+                    "(LT or GTEQ on the hour) with TYPE.")
+        return (inequality_field, formatted_filters)
+
+
+    @endpoints.method(SessionQueryForms, SessionForms,
+            path='querySessions',
+            http_method='POST',
+            name='querySessions')
+    def querySessions(self, request):
+        """Query for sessions."""
+        sessions = self._getSessionQuery(request.filters)
+        return self._copySessionPageToForms(sessions, request)
+
+    @endpoints.method(SESSION_SEARCH_REQUEST, SessionForms,
+            path='searchSessions',
+            http_method='GET',
+            name='searchSessions')
+    def searchSessions(self, request):
+        """Keyword search over session names, highlights & speakers, best match first."""
+        fields = self._checkFields(request.fields, SessionForm)
+        keys, next_cursor = self._searchKeys(searchSessionKeys, request,
+            websafeConferenceKey=request.websafeConferenceKey)
+        sessions = [session for session in ndb.get_multi(keys) if session]
+        return SessionForms(
+            items=[self._copySessionToForm(session, fields) for session in sessions],
+            nextCursor=next_cursor)
 
 # - - - Task 4:  Task Queues - - - - - - - - - - - - - - - - -  
 
@@ -918,4 +1787,4 @@ class ConferenceApi(remote.Service):
         return StringMessage(data=memcache.get(MEMCACHE_FEATURED_SPEAKER_KEY) or "")
 
 
-api = endpoints.api_server([ConferenceApi]) # register API
+api = instrument(endpoints.api_server([ConferenceApi])) # register API
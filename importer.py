@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+"""importer.py
+
+Udacity conference server-side Python App Engine bulk import of
+Conferences and Sessions from an uploaded CSV or JSONL file
+
+The uploaded blob is read in chunks of IMPORT_CHUNK_SIZE lines, each by
+its own task. After every chunk the byte offset is checkpointed on the
+ImportJob and the next chunk's task is enqueued in the same transaction.
+Each row gets a key derived from the job and the row's byte offset, so a
+retried chunk rewrites the same entities instead of duplicating them.
+
+CSV files need a header row naming ConferenceForm/SessionForm fields,
+with one record per line; repeated fields (topics) are ';'-separated.
+JSONL files hold one ConferenceForm/SessionForm JSON object per line.
+
+"""
+
+import csv
+
+import endpoints
+from protorpc import messages
+from protorpc import protojson
+
+from google.appengine.api import taskqueue
+from google.appengine.ext import blobstore
+from google.appengine.ext import ndb
+from google.net.proto.ProtocolBuffer import ProtocolBufferDecodeError
+
+from conference import ConferenceApi
+from models import Conference
+from models import ConferenceForm
+from models import ImportJob
+from models import Profile
+from models import Session
+from models import SessionForm
+from stats import addCounts
+from stats import addStats
+from stats import conferenceCounts
+from textsearch import indexConferences
+
+IMPORT_CHUNK_SIZE = 200
+MAX_IMPORT_ERRORS = 50
+
+IMPORT_FORMS = {
+    'Conference': ConferenceForm,
+    'Session': SessionForm,
+}
+
+
+def startImport(blob_info, kind, user_id, email):
+    """Create an ImportJob for an uploaded blob and queue its first chunk."""
+    if kind not in IMPORT_FORMS:
+        raise ValueError("kind must be one of %s" % ', '.join(sorted(IMPORT_FORMS)))
+    name = (blob_info.filename or '').lower()
+    if name.endswith('.csv'):
+        fileFormat = 'csv'
+    elif name.endswith('.jsonl') or name.endswith('.json'):
+        fileFormat = 'jsonl'
+    else:
+        raise ValueError("file must be .csv or .jsonl")
+
+    job = ImportJob(kind=kind, fileFormat=fileFormat, blobKey=blob_info.key(),
+                    fileName=blob_info.filename, userId=user_id, email=email)
+    job.put()
+    _queueChunk(job)
+    return job
+
+
+def _queueChunk(job, transactional=False):
+    taskqueue.add(params={'job': job.key.id(), 'chunk': job.chunk},
+                  url='/tasks/import_chunk', transactional=transactional)
+
+
+def _csvValues(line):
+    return [value.decode('utf-8') for value in next(csv.reader([line]))]
+
+
+def _csvToForm(form_cls, header, line):
+    """Return a form_cls message built from one CSV line."""
+    form = form_cls()
+    for name, value in zip(header, _csvValues(line)):
+        field = form_cls.field_by_name(name)
+        if not value:
+            continue
+        if field.repeated:
+            value = [v.strip() for v in value.split(';') if v.strip()]
+        if isinstance(field, messages.IntegerField):
+            value = [int(v) for v in value] if field.repeated else int(value)
+        setattr(form, name, value)
+    return form
+
+
+def _conferenceFromForm(job, offset, form):
+    data = ConferenceApi._copyConferenceFormToData(form)
+    data['organizerUserId'] = form.organizerUserId or job.userId
+    data['key'] = ndb.Key(Conference, 'import-%d-%d' % (job.key.id(), offset),
+                          parent=ndb.Key(Profile, data['organizerUserId']))
+    return Conference(**data)
+
+
+def _setOrganizerNames(confs):
+    """Copy each organizer's displayName onto confs, with one get_multi."""
+    p_keys = list(set(conf.key.parent() for conf in confs))
+    names = dict((p_key, getattr(prof, 'displayName', None))
+                 for p_key, prof in zip(p_keys, ndb.get_multi(p_keys)))
+    for conf in confs:
+        conf.organizerDisplayName = names[conf.key.parent()]
+
+
+def _sessionFromForm(job, offset, form):
+    data = ConferenceApi._copySessionFormToData(form)
+    try:
+        conf_key = ndb.Key(urlsafe=form.websafeConferenceKey)
+    except (ProtocolBufferDecodeError, TypeError):
+        raise ValueError("invalid websafeConferenceKey")
+    data['websafeConferenceKey'] = conf_key.urlsafe()
+    data['key'] = ndb.Key(Session, 'import-%d-%d' % (job.key.id(), offset),
+                          parent=conf_key)
+    return Session(**data)
+
+
+def _readChunk(job):
+    """Parse the next chunk of job's blob.
+
+    Returns (entities, errors, header, offset, eof).
+    """
+    form_cls = IMPORT_FORMS[job.kind]
+    build = _conferenceFromForm if job.kind == 'Conference' else _sessionFromForm
+    header = list(job.header)
+    entities, errors = [], []
+
+    reader = blobstore.BlobReader(job.blobKey)
+    reader.seek(job.offset)
+    eof = False
+    for _ in range(IMPORT_CHUNK_SIZE):
+        offset = reader.tell()
+        line = reader.readline()
+        if not line:
+            eof = True
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            if job.fileFormat == 'csv':
+                if not header:
+                    header = _csvValues(line)
+                    continue
+                form = _csvToForm(form_cls, header, line)
+            else:
+                form = protojson.decode_message(form_cls, line)
+            entities.append(build(job, offset, form))
+        except (KeyError, ValueError, messages.Error,
+                endpoints.ServiceException) as e:
+            errors.append('byte %d: %s' % (offset, e))
+    return entities, errors, header, reader.tell(), eof
+
+
+def _putSessions(sessions, errors):
+    """Write sessions grouped by conference, keeping speaker counts exact."""
+    by_conf = {}
+    for session in sessions:
+        by_conf.setdefault(session.key.parent(), []).append(session)
+    conf_keys = list(by_conf)
+    imported = 0
+    for c_key, conf in zip(conf_keys, ndb.get_multi(conf_keys)):
+        if conf is None:
+            errors.append('no conference found with key: %s' % c_key.urlsafe())
+            continue
+        # re-running a chunk skips sessions that were already written
+        ConferenceApi._putSessionsAndSpeakers(by_conf[c_key], skipExisting=True)
+        imported += len(by_conf[c_key])
+    return imported
+
+
+@ndb.transactional(xg=True)
+def _checkpoint(job_key, chunk, header, offset, imported, errors, done, counts=None):
+    job = job_key.get()
+    if job.chunk != chunk:
+        return job
+    # counted with the checkpoint, so a retried chunk is counted once
+    addStats(counts)
+    job.header = header
+    job.offset = offset
+    job.chunk += 1
+    job.imported += imported
+    job.failed += len(errors)
+    job.errors = (job.errors + errors)[:MAX_IMPORT_ERRORS]
+    job.done = done
+    job.put()
+    if done:
+        taskqueue.add(params={'job': job_key.id()},
+                      url='/tasks/send_import_summary', transactional=True)
+    else:
+        _queueChunk(job, transactional=True)
+    return job
+
+
+def processImportChunk(job_id, chunk):
+    """Import one chunk of an ImportJob and checkpoint its progress."""
+    job = ImportJob.get_by_id(job_id)
+    # a retried task for a chunk that has already been checkpointed
+    if not job or job.done or job.chunk != chunk:
+        return
+
+    entities, errors, header, offset, eof = _readChunk(job)
+    if job.kind == 'Conference':
+        _setOrganizerNames(entities)
+        ndb.put_multi(entities)
+        indexConferences(entities)
+        counts = {}
+        for conf in entities:
+            counts = addCounts(counts, conferenceCounts(conf))
+        imported = len(entities)
+    else:
+        counts = None
+        imported = _putSessions(entities, errors)
+    _checkpoint(job.key, chunk, header, offset, imported, errors, eof, counts)
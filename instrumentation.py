@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+
+"""instrumentation.py
+
+Udacity conference server-side Python App Engine per-request RPC
+accounting
+
+instrument() wraps a WSGI app (the Endpoints API server or main.app) so
+that every API RPC a request makes -- datastore gets, puts & queries,
+memcache calls, task enqueues, mail -- is counted and timed by apiproxy
+hooks. Requests slower than SLOW_REQUEST_MS log one JSON line with their
+RPC breakdown. Per-endpoint totals are kept in memory and merged into
+one memcache entry per STATS_WINDOW seconds at most every STATS_FLUSH
+seconds, so the admin stats handler sees every instance's traffic for
+the last STATS_WINDOWS windows.
+
+Time is summed per RPC, so RPCs overlapped by tasklets count in full.
+
+A request can also be run under cProfile: by an admin sending an
+X-Profile header or ?profile=1, for the next calls of an endpoint armed
+through the admin profile handler (Endpoints requests carry neither
+cookies nor custom headers), or for a PROFILE_SAMPLE_RATE fraction of
+all requests. The top PROFILE_TOP_N cumulative entries are logged and
+the last MAX_STORED_PROFILES profiles kept in memcache.
+
+"""
+
+import cProfile
+import collections
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import urlparse
+from cStringIO import StringIO
+
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import memcache
+from google.appengine.api import users
+
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+MEMCACHE_STATS_PREFIX = "RPC_STATS:"
+MEMCACHE_CAS_RETRIES = 10
+STATS_WINDOW = 60
+STATS_WINDOWS = 60
+STATS_FLUSH = 10
+ENDPOINTS_PATH = '/_ah/spi/'
+
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_TOP_N = 30
+PROFILE_POLL = 10
+MAX_STORED_PROFILES = 20
+MEMCACHE_PROFILES_KEY = "PROFILES"
+MEMCACHE_PROFILE_ARMED_KEY = "PROFILE_ARMED"
+MEMCACHE_PROFILE_TTL = 24 * 60 * 60
+
+_local = threading.local()
+_lock = threading.Lock()
+_pending = {}
+_lastFlush = [time.time()]
+_armed = {'names': frozenset(), 'polled': 0}
+
+
+class RequestStats(object):
+    """RequestStats -- the RPCs made by one request so far"""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.rpcs = collections.Counter()
+        self.rpcMs = collections.Counter()
+        self.started = {}
+
+
+def _preCall(service, call, request, response, rpc):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.started[id(rpc)] = time.time()
+
+
+def _postCall(service, call, request, response, rpc, error):
+    stats = getattr(_local, 'stats', None)
+    if stats is None:
+        return
+    name = '%s.%s' % (service, call)
+    stats.rpcs[name] += 1
+    started = stats.started.pop(id(rpc), None)
+    if started is not None:
+        stats.rpcMs[name] += (time.time() - started) * 1000
+
+
+apiproxy_stub_map.apiproxy.GetPreCallHooks().Append('instrumentation', _preCall)
+apiproxy_stub_map.apiproxy.GetPostCallHooks().Append('instrumentation', _postCall)
+
+
+def _casUpdate(key, update, ttl=0):
+    """Apply update to the memcache value at key with compare-and-set.
+
+    update(value) is passed None if key is missing and returns the new
+    value, or None to leave it alone. Returns True if a value was stored.
+    """
+    client = memcache.Client()
+    for _ in range(MEMCACHE_CAS_RETRIES):
+        value = client.gets(key)
+        new = update(value)
+        if new is None:
+            return False
+        if value is None:
+            if client.add(key, new, time=ttl):
+                return True
+        elif client.cas(key, new, time=ttl):
+            return True
+    return False
+
+
+def _requestName(environ):
+    """Return the endpoint method (e.g. ConferenceApi.getConference) or path."""
+    path = environ.get('PATH_INFO', '')
+    if path.startswith(ENDPOINTS_PATH):
+        return path[len(ENDPOINTS_PATH):]
+    return path
+
+
+def _newTotals():
+    return {'requests': 0, 'slow': 0, 'totalMs': 0.0, 'maxMs': 0.0,
+            'rpcs': {}, 'rpcMs': {}}
+
+
+def _mergeTotals(into, totals):
+    into['requests'] += totals['requests']
+    into['slow'] += totals['slow']
+    into['totalMs'] += totals['totalMs']
+    into['maxMs'] = max(into['maxMs'], totals['maxMs'])
+    for field in ('rpcs', 'rpcMs'):
+        for rpc, value in totals[field].items():
+            into[field][rpc] = into[field].get(rpc, 0) + value
+
+
+def _record(stats):
+    """Log stats if slow, add them to the totals and flush when due."""
+    elapsed = (time.time() - stats.start) * 1000
+    slow = elapsed >= SLOW_REQUEST_MS
+    if slow:
+        logging.warning('slow request: %s', json.dumps({
+            'endpoint': stats.name,
+            'ms': round(elapsed, 1),
+            'rpcs': dict(stats.rpcs),
+            'rpcMs': dict((rpc, round(ms, 1)) for rpc, ms in stats.rpcMs.items()),
+        }, sort_keys=True))
+
+    with _lock:
+        totals = _pending.setdefault(stats.name, _newTotals())
+        _mergeTotals(totals, {'requests': 1, 'slow': int(slow),
+                              'totalMs': elapsed, 'maxMs': elapsed,
+                              'rpcs': stats.rpcs, 'rpcMs': stats.rpcMs})
+        if time.time() - _lastFlush[0] < STATS_FLUSH:
+            return
+        _lastFlush[0] = time.time()
+        pending = dict(_pending)
+        _pending.clear()
+    _flush(pending)
+
+
+def _flush(pending):
+    """Merge this instance's pending totals into the current window."""
+    def merge(window):
+        window = window or {}
+        for name, totals in pending.items():
+            _mergeTotals(window.setdefault(name, _newTotals()), totals)
+        return window
+    key = MEMCACHE_STATS_PREFIX + str(int(time.time() / STATS_WINDOW))
+    if not _casUpdate(key, merge, ttl=STATS_WINDOW * STATS_WINDOWS):
+        logging.warning('Dropped RPC stats for %d endpoints', len(pending))
+
+
+def armProfiling(name, count):
+    """Profile the next count requests to endpoint (or path) name."""
+    def arm(armed):
+        armed = armed or {}
+        armed[name] = count
+        return armed
+    _casUpdate(MEMCACHE_PROFILE_ARMED_KEY, arm, ttl=MEMCACHE_PROFILE_TTL)
+
+
+def _claimArmed(name):
+    """Take one of the armed profiles of name; False if none are left.
+
+    Armed names are polled at most every PROFILE_POLL seconds, so other
+    requests only pay for memcache when their endpoint is armed.
+    """
+    now = time.time()
+    if now - _armed['polled'] >= PROFILE_POLL:
+        _armed['polled'] = now
+        _armed['names'] = frozenset(memcache.get(MEMCACHE_PROFILE_ARMED_KEY) or ())
+    if name not in _armed['names']:
+        return False
+
+    def claim(armed):
+        if not armed or not armed.get(name):
+            return None
+        armed[name] -= 1
+        if not armed[name]:
+            del armed[name]
+        return armed
+    return _casUpdate(MEMCACHE_PROFILE_ARMED_KEY, claim, ttl=MEMCACHE_PROFILE_TTL)
+
+
+def _shouldProfile(name, environ):
+    if environ.get('HTTP_X_PROFILE') or \
+            'profile' in urlparse.parse_qs(environ.get('QUERY_STRING', ''),
+                                        keep_blank_values=True):
+        return users.is_current_user_admin()
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return True
+    return _claimArmed(name)
+
+
+def _storeProfile(name, profiler, elapsed):
+    """Log the top of profiler's cumulative listing & keep it in memcache."""
+    out = StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(
+        PROFILE_TOP_N)
+    logging.info('profile of %s (%.1fms):\n%s', name, elapsed, out.getvalue())
+
+    entry = {'endpoint': name, 'time': time.time(), 'ms': round(elapsed, 1),
+             'profile': out.getvalue()}
+    _casUpdate(MEMCACHE_PROFILES_KEY,
+               lambda profiles: ([entry] + (profiles or []))[:MAX_STORED_PROFILES],
+               ttl=MEMCACHE_PROFILE_TTL)
+
+
+def getProfiles():
+    """Return the armed endpoints and the most recent stored profiles."""
+    cached = memcache.get_multi([MEMCACHE_PROFILE_ARMED_KEY, MEMCACHE_PROFILES_KEY])
+    return (cached.get(MEMCACHE_PROFILE_ARMED_KEY) or {},
+            cached.get(MEMCACHE_PROFILES_KEY) or [])
+
+
+def instrument(app):
+    """Return WSGI app wrapped with per-request RPC accounting and
+    on-demand profiling.
+    """
+    def instrumented(environ, start_response):
+        name = _requestName(environ)
+        profiler = cProfile.Profile() if _shouldProfile(name, environ) else None
+        _local.stats = stats = RequestStats(name)
+        try:
+            if profiler:
+                return profiler.runcall(app, environ, start_response)
+            return app(environ, start_response)
+        finally:
+            # the stats flush below must not account for itself
+            _local.stats = None
+            _record(stats)
+            if profiler:
+                _storeProfile(name, profiler, (time.time() - stats.start) * 1000)
+    return instrumented
+
+
+def getStats(windows=STATS_WINDOWS):
+    """Return per-endpoint totals over the last windows stats windows,
+    busiest (by total time) first.
+    """
+    current = int(time.time() / STATS_WINDOW)
+    cached = memcache.get_multi([str(w) for w in range(current - windows + 1,
+                                                       current + 1)],
+                                key_prefix=MEMCACHE_STATS_PREFIX)
+    merged = {}
+    for window in cached.values():
+        for name, totals in window.items():
+            _mergeTotals(merged.setdefault(name, _newTotals()), totals)
+
+    stats = []
+    for name, totals in merged.items():
+        requests = float(totals['requests'])
+        stats.append({
+            'endpoint': name,
+            'requests': totals['requests'],
+            'slow': totals['slow'],
+            'meanMs': round(totals['totalMs'] / requests, 1),
+            'maxMs': round(totals['maxMs'], 1),
+            'totalMs': round(totals['totalMs'], 1),
+            'rpcsPerRequest': dict((rpc, round(n / requests, 2))
+                                   for rpc, n in totals['rpcs'].items()),
+            'rpcMsPerRequest': dict((rpc, round(ms / requests, 1))
+                                    for rpc, ms in totals['rpcMs'].items()),
+        })
+    stats.sort(key=lambda s: s['totalMs'], reverse=True)
+    return stats
@@ -12,17 +12,302 @@ created by wesc on 2014 may 24
 
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
+import cgi
+import json
+import time
+
 import webapp2
 from google.appengine.api import app_identity
 from google.appengine.api import mail
+from google.appengine.api import users
+from google.appengine.ext import blobstore
+from google.appengine.ext.webapp import blobstore_handlers
 from conference import ConferenceApi
 from conference import MEMCACHE_FEATURED_SPEAKER_KEY
 from google.appengine.ext import ndb
 from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
 
+from models import Conference
+from models import ConferenceSpeaker
+from models import ImportJob
+from models import MapperJob
+from models import Profile
 from models import Session
+from cache import invalidateConferenceForms
+from seats import applySeatsChange
+from seats import syncSeatsAvailable
+from importer import processImportChunk
+from importer import startImport
+from textsearch import indexConferences
+from textsearch import indexSessions
+from organizers import scheduleOrganizerNameUpdate
+from organizers import updateOrganizerNamePage
+from recommendations import processRecommendationChunk
+from recommendations import startRecommendations
+from registrations import migrateProfile
+from speakers import repairConference
+from speakers import updateSpeakers
+from stats import addCounts
+from stats import countConferences
+from stats import rebuildConferenceStats
+from stats import finishRebuild
+from stats import startRebuild
+from instrumentation import STATS_WINDOW
+from instrumentation import armProfiling
+from instrumentation import getProfiles
+from instrumentation import getStats
+from instrumentation import instrument
+from utils import getUserId
 import logging
 
+IMPORT_FORM = """<html><body>
+<h3>Bulk import</h3>%s
+<form action="%s" method="POST" enctype="multipart/form-data">
+  <select name="kind"><option>Conference</option><option>Session</option></select>
+  <input type="file" name="file" accept=".csv,.jsonl">
+  <input type="submit" value="Import">
+</form>
+</body></html>"""
+
+MAPPER_BATCH = 100
+MAPPER_DELAY = 1
+MAPPER_PAGE = """<html><body>
+<h3>Mappers</h3>
+<table>
+<tr><th>mapper</th><th>kind</th><th>batches</th><th>processed</th><th>written</th><th>status</th></tr>
+%s
+</table>
+<form method="POST">
+  <select name="mapper">%s</select>
+  batch size <input name="batchSize" size="4">
+  delay (s) <input name="delay" size="3">
+  <input type="submit" name="action" value="start">
+  <input type="submit" name="action" value="pause">
+  <input type="submit" name="action" value="restart">
+</form>
+</body></html>"""
+
+
+class Mapper(object):
+    """Mapper -- a transform applied to every entity of one kind
+
+    map(entity) returns the entity, or list of entities, to write back
+    with put_multi, or None if there is nothing to write. A transactional
+    mapper re-reads, maps and writes each entity group of a batch in one
+    transaction, so it never overwrites a concurrent update; otherwise the
+    batch is written in one put_multi (keys_only mappers are passed keys).
+    finish(results), if given, is called with each batch's entities, or
+    its keys for keys_only & transactional mappers, after the writes.
+    count(results) returns a dict of counts that is summed, exactly once
+    per batch, into MapperJob.counters; start(job) is called in the
+    transaction that starts a new run, done(job) in the one that
+    completes it.
+    """
+
+    def __init__(self, model, map=None, finish=None, count=None, start=None,
+                 done=None, keys_only=False, transactional=False,
+                 batchSize=MAPPER_BATCH):
+        self.model = model
+        self.map = map
+        self.finish = finish
+        self.count = count
+        self.start = start
+        self.done = done
+        self.keys_only = keys_only or transactional
+        self.transactional = transactional
+        self.batchSize = batchSize
+
+
+def _lowercaseSessionType(session):
+    """Lowercase typeOfSession, as _createSessionObject does for new rows."""
+    if session.typeOfSession and session.typeOfSession != session.typeOfSession.lower():
+        session.typeOfSession = session.typeOfSession.lower()
+        return session
+
+
+def _rewriteSession(session):
+    """Re-put a Session, storing its computed properties."""
+    return session
+
+
+def _setConferenceMonth(conf):
+    """Derive month from startDate, as _createConferenceObject does."""
+    month = conf.startDate.month if conf.startDate else 0
+    if conf.month != month:
+        conf.month = month
+        return conf
+
+
+def _setOrganizerDisplayName(conf):
+    """Copy the organizer's displayName onto a Conference."""
+    prof = conf.key.parent().get()
+    if prof and conf.organizerDisplayName != prof.displayName:
+        conf.organizerDisplayName = prof.displayName
+        return conf
+
+
+def _migrateRegistrations(prof):
+    """Move a Profile's registration list into Registrations."""
+    if prof.conferenceKeysToAttend:
+        migrateProfile(prof.key)
+
+
+def _invalidateConferences(conf_keys):
+    invalidateConferenceForms(c_key.urlsafe() for c_key in conf_keys)
+
+
+def _reindexSessions(s_keys):
+    indexSessions([session for session in ndb.get_multi(s_keys) if session])
+
+
+def _rebuildStatistics(job):
+    # run in the completing job's transaction, so the rebuild is queued once
+    startMapper('rebuild_statistics', restart=True)
+
+
+def _repairSpeakers(job):
+    # rekey the ConferenceSpeakers once every Session has its speakerKey
+    startMapper('repair_speakers', restart=True)
+
+
+MAPPERS = {
+    # the session search documents and type counts hold typeOfSession too
+    'lowercase_session_types': Mapper(Session, map=_lowercaseSessionType,
+                                      finish=_reindexSessions,
+                                      done=_rebuildStatistics,
+                                      transactional=True),
+    'session_hour_buckets': Mapper(Session, map=_rewriteSession,
+                                   transactional=True),
+    'conference_months': Mapper(Conference, map=_setConferenceMonth,
+                                finish=_invalidateConferences, transactional=True),
+    'organizer_names': Mapper(Conference, map=_setOrganizerDisplayName,
+                              finish=_invalidateConferences, transactional=True),
+    'migrate_registrations': Mapper(Profile, map=_migrateRegistrations),
+    # one-off migration: store speakerKey on Sessions written before it existed
+    'backfill_speakers': Mapper(Session, map=_rewriteSession,
+                                done=_repairSpeakers, transactional=True),
+    'repair_speakers': Mapper(Conference, map=repairConference,
+                              keys_only=True, batchSize=20),
+    'reindex_conferences': Mapper(Conference, finish=indexConferences, batchSize=200),
+    'reindex_sessions': Mapper(Session, finish=indexSessions, batchSize=200),
+    'rebuild_statistics': Mapper(Conference, map=rebuildConferenceStats,
+                                 count=countConferences,
+                                 start=startRebuild, done=finishRebuild,
+                                 transactional=True, batchSize=50),
+    'compute_recommendations': Mapper(Conference, map=startRecommendations,
+                                      keys_only=True),
+}
+
+
+def _mapped(mapper, result):
+    """Return the list of entities mapper.map wants written for result."""
+    out = mapper.map(result) if mapper.map else None
+    if out is None:
+        return []
+    return out if isinstance(out, list) else [out]
+
+
+def _mapGroup(mapper, keys):
+    """Re-read, map & write keys of one entity group; return the number written."""
+    writes = [w for entity in ndb.get_multi(keys) if entity
+              for w in _mapped(mapper, entity)]
+    ndb.put_multi(writes)
+    return len(writes)
+
+
+def _queueMapperBatch(job, transactional=False):
+    taskqueue.add(params={'mapper': job.key.id(), 'batch': job.batch},
+                  url='/tasks/run_mapper', countdown=job.delay,
+                  transactional=transactional)
+
+
+@ndb.transactional
+def startMapper(name, batchSize=None, delay=None, restart=False):
+    """Start or resume (or with restart, start over) the mapper name.
+
+    A job that is already running has its current batch queued again,
+    which the batch number check makes harmless. Returns the MapperJob.
+    """
+    if name not in MAPPERS:
+        raise ValueError("mapper must be one of %s" % ', '.join(sorted(MAPPERS)))
+    job = MapperJob.get_by_id(name)
+    if job is None or restart:
+        # a restart keeps counting batches, so tasks of the old run are ignored
+        job = MapperJob(id=name, batch=job.batch + 1 if job else 0)
+        if MAPPERS[name].start:
+            MAPPERS[name].start(job)
+    elif job.done:
+        return job
+    job.batchSize = batchSize or job.batchSize or MAPPERS[name].batchSize
+    job.delay = delay if delay is not None else \
+        job.delay if job.delay is not None else MAPPER_DELAY
+    job.paused = False
+    job.put()
+    _queueMapperBatch(job, transactional=True)
+    return job
+
+
+@ndb.transactional
+def pauseMapper(name):
+    """Stop the mapper name after its current batch; startMapper resumes it."""
+    job = MapperJob.get_by_id(name)
+    if job and not job.done:
+        job.paused = True
+        job.put()
+
+
+@ndb.transactional(xg=True)
+def _checkpointMapper(job_key, batch, cursor, processed, written, counts):
+    job = job_key.get()
+    if job.batch != batch:
+        return
+    job.batch += 1
+    job.cursor = cursor
+    job.processed += processed
+    job.written += written
+    job.counters = addCounts(job.counters, counts)
+    job.done = cursor is None
+    job.put()
+    if job.done:
+        if MAPPERS[job_key.id()].done:
+            MAPPERS[job_key.id()].done(job)
+    elif not job.paused:
+        _queueMapperBatch(job, transactional=True)
+
+
+def runMapperBatch(name, batch):
+    """Map one batch of a MapperJob and checkpoint its progress."""
+    job = MapperJob.get_by_id(name)
+    # a retried task for a batch that has already been checkpointed
+    if not job or job.done or job.paused or job.batch != batch:
+        return
+    # a task queued before its mapper was removed from MAPPERS
+    if name not in MAPPERS:
+        logging.warning('Dropped batch %d of unknown mapper %s', batch, name)
+        return
+    mapper = MAPPERS[name]
+    results, next_cursor, more = mapper.model.query().fetch_page(
+        job.batchSize, keys_only=mapper.keys_only,
+        start_cursor=Cursor(urlsafe=job.cursor) if job.cursor else None)
+
+    if mapper.transactional:
+        groups = {}
+        for key in results:
+            groups.setdefault(key.root(), []).append(key)
+        written = sum(ndb.transaction(lambda: _mapGroup(mapper, keys), xg=True)
+                      for keys in groups.values())
+    else:
+        writes = [w for result in results for w in _mapped(mapper, result)]
+        ndb.put_multi(writes)
+        written = len(writes)
+    if mapper.finish:
+        mapper.finish(results)
+    counts = mapper.count(results) if mapper.count else {}
+    _checkpointMapper(job.key, batch, next_cursor.urlsafe() if more and next_cursor else None,
+                      len(results), written, counts)
+
 
 class SetAnnouncementHandler(webapp2.RequestHandler):
     def get(self):
@@ -30,6 +315,29 @@ class SetAnnouncementHandler(webapp2.RequestHandler):
         return ConferenceApi._cacheAnnouncement() 
 
 
+class RebuildStatisticsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Recount the statistics aggregates from scratch."""
+        startMapper('rebuild_statistics', restart=True)
+
+
+class RepairSpeakersHandler(webapp2.RequestHandler):
+    def get(self):
+        """Recompute the speaker aggregates from every conference's sessions."""
+        startMapper('repair_speakers', restart=True)
+
+
+class ComputeRecommendationsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Recompute every conference's session recommendations."""
+        startMapper('compute_recommendations', restart=True)
+
+    def post(self):
+        """Count the next chunk of one conference's wishlists."""
+        processRecommendationChunk(self.request.get('websafeConferenceKey'),
+                                   int(self.request.get('chunk')))
+
+
 class SendConfirmationEmailHandler(webapp2.RequestHandler):
     def post(self):
         """Send email confirming Conference creation."""
@@ -45,32 +353,200 @@ class SendConfirmationEmailHandler(webapp2.RequestHandler):
 
 class SetFeaturedSpeakerHandler(webapp2.RequestHandler):
     def post(self):
-        """Set Memcache for featured speaker and email about others sessions of that speaker"""
+        """Set Memcache for featured speaker(s) and email about others sessions of each"""
 
-        # If there is more than one session by this speaker at this conference,
+        # If there is more than one session by a speaker at this conference,
         # add a new Memcache entry that features the speaker and session names.
-        sessions = Session.query(Session.speaker == self.request.get('featured_speaker'))
-        announcement = '%s %s %s %s' % (
-                'Featured Speaker ', self.request.get('featured_speaker'),
-                ' has more than one session Please check out sessions:',
-                ', '.join(session.name for session in sessions))
-
-        # Save to memcache under the featured speaker key
-        memcache.set(MEMCACHE_FEATURED_SPEAKER_KEY, announcement)
-        
-        email_body = 'Additional Info:\r\n\r\n%s %s' % (self.request.get(
-                'featured_speaker'), announcement)
-        
+        # A bulk session import can feature several speakers in one task.
+        conf_key = ndb.Key(urlsafe=self.request.get('websafeConferenceKey'))
+        names = self.request.get_all('featured_speaker')
+        speakers = ndb.get_multi([ConferenceSpeaker.keyForName(conf_key, name)
+                                  for name in names])
+
+        for name, speaker in zip(names, speakers):
+            # the row is gone if a repair found no sessions by the speaker
+            if speaker is None:
+                continue
+            announcement = '%s %s %s %s' % (
+                    'Featured Speaker ', name,
+                    ' has more than one session Please check out sessions:',
+                    ', '.join(speaker.sessionNames))
+
+            # Save to memcache under the featured speaker key
+            memcache.set(MEMCACHE_FEATURED_SPEAKER_KEY, announcement)
+
+            email_body = 'Additional Info:\r\n\r\n%s %s' % (name, announcement)
+
+            mail.send_mail(
+                'noreply@%s.appspotmail.com' % (
+                    app_identity.get_application_id()),     # from
+                self.request.get('email'),                  # to
+                'New featured speaker!',            # subj
+                email_body
+            )
+
+class SyncSeatsAvailableHandler(webapp2.RequestHandler):
+    def post(self):
+        """Copy a conference's sharded seat total onto the Conference."""
+        syncSeatsAvailable(ndb.Key(urlsafe=self.request.get('websafeConferenceKey')))
+
+class ChangeSeatsAvailableHandler(webapp2.RequestHandler):
+    def post(self):
+        """Apply an updated seatsAvailable to a conference's shards, then
+        copy the new total onto the Conference."""
+        c_key = ndb.Key(urlsafe=self.request.get('websafeConferenceKey'))
+        applySeatsChange(c_key, int(self.request.get('delta')),
+                         int(self.request.get('reset')))
+        syncSeatsAvailable(c_key)
+
+class ImportFormHandler(webapp2.RequestHandler):
+    def get(self):
+        """Show the bulk import upload form and the status of a job."""
+        status = ''
+        job = self.request.get('job') and ImportJob.get_by_id(int(self.request.get('job')))
+        if job:
+            status = '<p>Job %d (%s): %d imported, %d failed%s</p>' % (
+                job.key.id(), cgi.escape(job.fileName or ''), job.imported,
+                job.failed, ', done' if job.done else ', running')
+        self.response.write(IMPORT_FORM % (
+            status, blobstore.create_upload_url('/admin/import/upload')))
+
+class ImportUploadHandler(blobstore_handlers.BlobstoreUploadHandler):
+    def post(self):
+        """Start a chunked import of the uploaded CSV/JSONL file."""
+        uploads = self.get_uploads('file')
+        if not uploads:
+            return self.redirect('/admin/import')
+        user = users.get_current_user()
+        try:
+            job = startImport(uploads[0], self.request.get('kind'),
+                              getUserId(user), user.email())
+        except ValueError as e:
+            logging.warning('Rejected import upload: %s', e)
+            uploads[0].delete()
+            return self.redirect('/admin/import')
+        self.redirect('/admin/import?job=%d' % job.key.id())
+
+class ImportChunkHandler(webapp2.RequestHandler):
+    def post(self):
+        """Import the next chunk of a bulk import job."""
+        processImportChunk(int(self.request.get('job')), int(self.request.get('chunk')))
+
+class SendImportSummaryHandler(webapp2.RequestHandler):
+    def post(self):
+        """Send one email summarising a finished bulk import."""
+        job = ImportJob.get_by_id(int(self.request.get('job')))
+        body = 'Your import of %s (%s) has finished.\r\n\r\n' \
+               'Imported: %d\r\nFailed: %d\r\n' % (
+                   job.fileName, job.kind, job.imported, job.failed)
+        if job.errors:
+            body += '\r\nErrors:\r\n%s' % '\r\n'.join(job.errors)
         mail.send_mail(
             'noreply@%s.appspotmail.com' % (
                 app_identity.get_application_id()),     # from
-            self.request.get('email'),                  # to
-            'New featured speaker!',            # subj
-            email_body
+            job.email,                                  # to
+            'Your import has finished',                 # subj
+            body
         )
 
-app = webapp2.WSGIApplication([
+class UpdateSpeakersHandler(webapp2.RequestHandler):
+    def post(self):
+        """Recompute Speaker aggregates after sessions were written."""
+        updateSpeakers(self.request.get_all('speaker'),
+                       ndb.Key(urlsafe=self.request.get('websafeConferenceKey')))
+
+class UpdateOrganizerNameHandler(webapp2.RequestHandler):
+    def post(self):
+        """Copy a changed displayName onto one batch of the organizer's
+        conferences, then queue the next batch."""
+        p_key = ndb.Key(urlsafe=self.request.get('profile'))
+        cursor = updateOrganizerNamePage(p_key, self.request.get('cursor') or None)
+        if cursor:
+            scheduleOrganizerNameUpdate(p_key, cursor)
+
+class MapperHandler(webapp2.RequestHandler):
+    def post(self):
+        """Map the next batch of a mapper job."""
+        runMapperBatch(self.request.get('mapper'), int(self.request.get('batch')))
+
+class MappersHandler(webapp2.RequestHandler):
+    def get(self):
+        """Show every mapper and the progress of its job."""
+        names = sorted(MAPPERS)
+        rows = []
+        for name, job in zip(names, ndb.get_multi([ndb.Key(MapperJob, n) for n in names])):
+            if job is None:
+                status, counts = 'not started', (0, 0, 0)
+            else:
+                status = 'done' if job.done else 'paused' if job.paused else 'running'
+                status += ' (%s)' % job.updated.strftime('%Y-%m-%d %H:%M:%S')
+                counts = (job.batch, job.processed, job.written)
+            rows.append('<tr><td>%s</td><td>%s</td><td>%d</td><td>%d</td><td>%d</td>'
+                        '<td>%s</td></tr>' % ((name, MAPPERS[name].model._get_kind())
+                                              + counts + (status,)))
+        self.response.write(MAPPER_PAGE % ('\n'.join(rows), ''.join(
+            '<option>%s</option>' % name for name in names)))
+
+    def post(self):
+        """Start, pause or restart a mapper, e.g. mapper=conference_months&action=start."""
+        name = self.request.get('mapper')
+        try:
+            if self.request.get('action') == 'pause':
+                pauseMapper(name)
+            else:
+                startMapper(name, int(self.request.get('batchSize') or 0) or None,
+                            int(self.request.get('delay')) if self.request.get('delay') else None,
+                            restart=self.request.get('action') == 'restart')
+        except ValueError as e:
+            logging.warning('Rejected mapper request: %s', e)
+        self.redirect('/admin/mappers')
+
+class RpcStatsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Show per-endpoint latency & RPC totals (default: last hour)."""
+        minutes = int(self.request.get('minutes') or 60)
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps(
+            getStats(max(minutes * 60 // STATS_WINDOW, 1)), indent=2))
+
+class ProfileHandler(webapp2.RequestHandler):
+    def get(self):
+        """Show the armed endpoints and the most recent profiles."""
+        armed, profiles = getProfiles()
+        self.response.headers['Content-Type'] = 'text/plain'
+        self.response.write('Armed: %s\n' % json.dumps(armed, sort_keys=True))
+        for profile in profiles:
+            self.response.write('\n%s %.1fms (%s)\n%s' % (
+                profile['endpoint'], profile['ms'],
+                time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(profile['time'])),
+                profile['profile']))
+
+    def post(self):
+        """Profile the next calls of an endpoint, e.g.
+        endpoint=ConferenceApi.queryConferences&count=3.
+        """
+        armProfiling(self.request.get('endpoint'),
+                     int(self.request.get('count') or 1))
+        self.redirect('/admin/profile')
+
+app = instrument(webapp2.WSGIApplication([
     ('/crons/set_announcement', SetAnnouncementHandler),
+    ('/crons/rebuild_statistics', RebuildStatisticsHandler),
+    ('/crons/repair_speakers', RepairSpeakersHandler),
+    ('/crons/compute_recommendations', ComputeRecommendationsHandler),
+    ('/tasks/compute_recommendations', ComputeRecommendationsHandler),
     ('/tasks/send_confirmation_email', SendConfirmationEmailHandler),
     ('/tasks/set_memcache_notif_and_send_featured_speaker_email', SetFeaturedSpeakerHandler),
-], debug=True)
\ No newline at end of file
+    ('/tasks/sync_seats_available', SyncSeatsAvailableHandler),
+    ('/tasks/change_seats_available', ChangeSeatsAvailableHandler),
+    ('/admin/import', ImportFormHandler),
+    ('/admin/import/upload', ImportUploadHandler),
+    ('/tasks/import_chunk', ImportChunkHandler),
+    ('/tasks/send_import_summary', SendImportSummaryHandler),
+    ('/admin/rpc_stats', RpcStatsHandler),
+    ('/tasks/update_speakers', UpdateSpeakersHandler),
+    ('/tasks/update_organizer_name', UpdateOrganizerNameHandler),
+    ('/admin/mappers', MappersHandler),
+    ('/tasks/run_mapper', MapperHandler),
+    ('/admin/profile', ProfileHandler),
+], debug=True))
\ No newline at end of file
@@ -26,8 +26,15 @@ class Profile(ndb.Model):
     displayName = ndb.StringProperty()
     mainEmail = ndb.StringProperty()
     teeShirtSize = ndb.StringProperty(default='NOT_SPECIFIED')
+    # legacy, emptied as registrations move to Registration entities
     conferenceKeysToAttend = ndb.StringProperty(repeated=True)
 
+class Registration(ndb.Model):
+    """Registration -- a Profile's seat at a Conference (child of the
+    Profile, keyed by the Conference's websafe key)"""
+    conferenceKey = ndb.KeyProperty(kind='Conference', required=True)
+    created = ndb.DateTimeProperty(auto_now_add=True)
+
 class ProfileMiniForm(messages.Message):
     """ProfileMiniForm -- update Profile form message"""
     displayName = messages.StringField(1)
@@ -40,6 +47,11 @@ class ProfileForm(messages.Message):
     teeShirtSize = messages.EnumField('TeeShirtSize', 3)
     conferenceKeysToAttend = messages.StringField(4, repeated=True)
 
+class ProfileForms(messages.Message):
+    """ProfileForms -- multiple Profile outbound form message"""
+    items = messages.MessageField(ProfileForm, 1, repeated=True)
+    nextCursor = messages.StringField(2)
+
 class BooleanMessage(messages.Message):
     """BooleanMessage-- outbound Boolean value message"""
     data = messages.BooleanField(1)
@@ -56,6 +68,14 @@ class Conference(ndb.Model):
     endDate         = ndb.DateProperty()
     maxAttendees    = ndb.IntegerProperty()
     seatsAvailable  = ndb.IntegerProperty()
+    seatShards      = ndb.IntegerProperty(default=0) # 0 until seats are sharded
+    seatsReset      = ndb.IntegerProperty(default=0, indexed=False) # last seat change
+    organizerDisplayName = ndb.StringProperty(indexed=False) # copy of the Profile's
+
+class SeatShard(ndb.Model):
+    """SeatShard -- one slice of a Conference's available seats"""
+    seatsAvailable  = ndb.IntegerProperty(default=0, indexed=False)
+    reset           = ndb.IntegerProperty(default=0, indexed=False) # Conference.seatsReset applied
 
 class ConferenceForm(messages.Message):
     """ConferenceForm -- Conference outbound form message"""
@@ -75,6 +95,7 @@ class ConferenceForm(messages.Message):
 class ConferenceForms(messages.Message):
     """ConferenceForms -- multiple Conference outbound form message"""
     items = messages.MessageField(ConferenceForm, 1, repeated=True)
+    nextCursor = messages.StringField(2)
 
 class TeeShirtSize(messages.Enum):
     """TeeShirtSize -- t-shirt size enumeration value"""
@@ -103,11 +124,41 @@ class ConferenceQueryForm(messages.Message):
 class ConferenceQueryForms(messages.Message):
     """ConferenceQueryForms -- multiple ConferenceQueryForm inbound form message"""
     filters = messages.MessageField(ConferenceQueryForm, 1, repeated=True)
+    pageSize = messages.IntegerField(2, variant=messages.Variant.INT32)
+    cursor = messages.StringField(3)
+    fields = messages.StringField(4, repeated=True)
 
 class StringMessage(messages.Message):
     """StringMessage-- outbound (single) string message"""
     data = messages.StringField(1, required=True)
 
+class Speaker(ndb.Model):
+    """Speaker -- a speaker across all Conferences, keyed by normalized
+    name; the aggregates sum each Conference's contribution"""
+    name            = ndb.StringProperty(required=True)
+    sessionCount    = ndb.IntegerProperty(default=0)
+    totalMinutes    = ndb.IntegerProperty(default=0)
+    websafeConferenceKeys = ndb.StringProperty(repeated=True, indexed=False)
+    conferences     = ndb.JsonProperty(default={}) # wsck -> [sessionCount, totalMinutes]
+
+    @staticmethod
+    def keyForName(name):
+        """Return the Speaker key of a free-form speaker name."""
+        return ndb.Key(Speaker, ' '.join(name.lower().split()))
+
+class SpeakerForm(messages.Message):
+    """SpeakerForm -- Speaker outbound form message"""
+    name            = messages.StringField(1)
+    websafeSpeakerKey = messages.StringField(2)
+    sessionCount    = messages.IntegerField(3, variant=messages.Variant.INT32)
+    totalMinutes    = messages.IntegerField(4, variant=messages.Variant.INT32)
+    websafeConferenceKeys = messages.StringField(5, repeated=True)
+
+class SpeakerForms(messages.Message):
+    """SpeakerForms -- multiple Speaker outbound form message"""
+    items = messages.MessageField(SpeakerForm, 1, repeated=True)
+    nextCursor = messages.StringField(2)
+
 class Session(ndb.Model):
     """Session -- session object"""
     name            = ndb.StringProperty(required=True) # has to be unique
@@ -118,6 +169,31 @@ class Session(ndb.Model):
     date            = ndb.DateProperty(required=True)
     websafeConferenceKey = ndb.StringProperty(required=True)
     startTime       = ndb.TimeProperty(required=True) # Given in 24 hour format
+    # hour buckets, so startTime < h:00 / >= h:00 become equality filters
+    # that can be combined with an inequality on another property. The two
+    # hold 25 values between them, each written to the built-in ascending
+    # and descending indexes and to the composite indexes on the bucket,
+    # so a Session costs about 100 extra index rows. Sessions written before
+    # the buckets existed get them from the session_hour_buckets mapper.
+    startsBeforeHour = ndb.ComputedProperty(lambda self: range(
+        self.startTime.hour + 1, 25), repeated=True)
+    startsFromHour  = ndb.ComputedProperty(lambda self: range(
+        0, self.startTime.hour + 1), repeated=True)
+    speakerKey      = ndb.ComputedProperty(lambda self: Speaker.keyForName(self.speaker))
+
+class ConferenceSpeaker(ndb.Model):
+    """ConferenceSpeaker -- a speaker's sessions within one Conference
+    (child of the Conference, keyed by normalized speaker name)"""
+    speaker         = ndb.StringProperty(required=True)
+    sessionCount    = ndb.IntegerProperty(default=0)
+    sessionNames    = ndb.StringProperty(repeated=True, indexed=False)
+    totalMinutes    = ndb.IntegerProperty(default=0, indexed=False)
+    speakerKey      = ndb.ComputedProperty(lambda self: Speaker.keyForName(self.speaker))
+
+    @staticmethod
+    def keyForName(conf_key, name):
+        """Return the ConferenceSpeaker key of a speaker name in conf_key."""
+        return ndb.Key(ConferenceSpeaker, Speaker.keyForName(name).id(), parent=conf_key)
 
 class SessionForm(messages.Message):
     """SessionForm -- Session outbound form message"""
@@ -131,9 +207,23 @@ class SessionForm(messages.Message):
     startTime         = messages.StringField(8)
     websafeConferenceKey = messages.StringField(9)
 
+class SessionQueryForm(messages.Message):
+    """SessionQueryForm -- Session query inbound form message"""
+    field = messages.StringField(1)
+    operator = messages.StringField(2)
+    value = messages.StringField(3)
+
+class SessionQueryForms(messages.Message):
+    """SessionQueryForms -- multiple SessionQueryForm inbound form message"""
+    filters = messages.MessageField(SessionQueryForm, 1, repeated=True)
+    pageSize = messages.IntegerField(2, variant=messages.Variant.INT32)
+    cursor = messages.StringField(3)
+    fields = messages.StringField(4, repeated=True)
+
 class SessionForms(messages.Message):
     """SessionForms -- multiple Sessions outbound form message"""
     items = messages.MessageField(SessionForm, 1, repeated=True)
+    nextCursor = messages.StringField(2)
 
 class UserWishList(ndb.Model):
     """UserWishList object"""
@@ -148,7 +238,109 @@ class UserWishListForm(messages.Message):
     conferenceWsk = messages.StringField(2)
     sessionKey = messages.StringField(3)
     dateAddedToWishList = messages.StringField(4)
+    session = messages.MessageField(SessionForm, 5)
+    conferenceName = messages.StringField(6)
 
 class UserWishListForms(messages.Message):
     """UserWishListForms -- multiple UserWishList outbound form message"""
-    items = messages.MessageField(UserWishListForm, 1, repeated=True)
\ No newline at end of file
+    items = messages.MessageField(UserWishListForm, 1, repeated=True)
+
+class RecommendedSessionForm(messages.Message):
+    """RecommendedSessionForm -- session wishlisted together with another"""
+    sessionKey = messages.StringField(1)
+    wishlistedTogether = messages.IntegerField(2, variant=messages.Variant.INT32)
+    session = messages.MessageField(SessionForm, 3)
+
+class RecommendedSessionForms(messages.Message):
+    """RecommendedSessionForms -- multiple RecommendedSessionForm outbound form message"""
+    items = messages.MessageField(RecommendedSessionForm, 1, repeated=True)
+
+class ImportJob(ndb.Model):
+    """ImportJob -- progress checkpoint of a bulk Conference/Session import"""
+    kind            = ndb.StringProperty(required=True, choices=['Conference', 'Session'])
+    fileFormat      = ndb.StringProperty(required=True, choices=['csv', 'jsonl'])
+    blobKey         = ndb.BlobKeyProperty(required=True)
+    fileName        = ndb.StringProperty(indexed=False)
+    userId          = ndb.StringProperty(required=True)
+    email           = ndb.StringProperty(indexed=False)
+    header          = ndb.StringProperty(repeated=True, indexed=False) # csv column names
+    offset          = ndb.IntegerProperty(default=0, indexed=False) # next unread byte
+    chunk           = ndb.IntegerProperty(default=0, indexed=False) # next chunk number
+    imported        = ndb.IntegerProperty(default=0, indexed=False)
+    failed          = ndb.IntegerProperty(default=0, indexed=False)
+    errors          = ndb.StringProperty(repeated=True, indexed=False)
+    done            = ndb.BooleanProperty(default=False)
+    created         = ndb.DateTimeProperty(auto_now_add=True)
+
+class MapperJob(ndb.Model):
+    """MapperJob -- progress checkpoint of a main.py mapper run (id: mapper name)"""
+    cursor          = ndb.StringProperty(indexed=False) # urlsafe query cursor of the next batch
+    batch           = ndb.IntegerProperty(default=0, indexed=False) # next batch number
+    batchSize       = ndb.IntegerProperty(indexed=False)
+    delay           = ndb.IntegerProperty(indexed=False) # seconds between batches
+    processed       = ndb.IntegerProperty(default=0, indexed=False)
+    written         = ndb.IntegerProperty(default=0, indexed=False)
+    counters        = ndb.JsonProperty(default={}) # summed Mapper.count results
+    paused          = ndb.BooleanProperty(default=False, indexed=False)
+    done            = ndb.BooleanProperty(default=False, indexed=False)
+    started         = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
+    updated         = ndb.DateTimeProperty(auto_now=True, indexed=False)
+
+class StatsShard(ndb.Model):
+    """StatsShard -- one slice of the site-wide statistics counters"""
+    counts          = ndb.JsonProperty(default={}) # e.g. {'conferences': 3, 'city:London': 1}
+
+class ConferenceStats(ndb.Model):
+    """ConferenceStats -- session statistics of its parent Conference"""
+    sessions        = ndb.IntegerProperty(default=0, indexed=False)
+    sessionMinutes  = ndb.IntegerProperty(default=0, indexed=False)
+    sessionTypes    = ndb.JsonProperty(default={}) # typeOfSession -> count
+
+class StatCountForm(messages.Message):
+    """StatCountForm -- one named count of a statistics breakdown"""
+    name            = messages.StringField(1)
+    count           = messages.IntegerField(2, variant=messages.Variant.INT32)
+
+class StatisticsForm(messages.Message):
+    """StatisticsForm -- site-wide statistics outbound form message"""
+    conferences     = messages.IntegerField(1, variant=messages.Variant.INT32)
+    sessions        = messages.IntegerField(2, variant=messages.Variant.INT32)
+    seats           = messages.IntegerField(3, variant=messages.Variant.INT32)
+    registrations   = messages.IntegerField(4, variant=messages.Variant.INT32)
+    fillRate        = messages.FloatField(5)
+    conferencesByCity = messages.MessageField(StatCountForm, 6, repeated=True)
+    conferencesByMonth = messages.MessageField(StatCountForm, 7, repeated=True)
+    sessionsByType  = messages.MessageField(StatCountForm, 8, repeated=True)
+
+class ConferenceStatisticsForm(messages.Message):
+    """ConferenceStatisticsForm -- one Conference's statistics outbound form message"""
+    websafeConferenceKey = messages.StringField(1)
+    sessions        = messages.IntegerField(2, variant=messages.Variant.INT32)
+    sessionMinutes  = messages.IntegerField(3, variant=messages.Variant.INT32)
+    sessionsByType  = messages.MessageField(StatCountForm, 4, repeated=True)
+    maxAttendees    = messages.IntegerField(5, variant=messages.Variant.INT32)
+    seatsAvailable  = messages.IntegerField(6, variant=messages.Variant.INT32)
+    fillRate        = messages.FloatField(7)
+
+class RecommendationJob(ndb.Model):
+    """RecommendationJob -- progress checkpoint of a conference's wishlist
+    co-occurrence count (id: websafe Conference key)"""
+    cursor          = ndb.StringProperty(indexed=False) # urlsafe query cursor of the next chunk
+    chunk           = ndb.IntegerProperty(default=0, indexed=False) # next chunk number
+    users           = ndb.IntegerProperty(default=0, indexed=False) # wishlists counted
+    lastUser        = ndb.StringProperty(indexed=False) # user whose entries may continue
+    lastSessions    = ndb.KeyProperty(kind='Session', repeated=True, indexed=False)
+    sessionKeys     = ndb.KeyProperty(kind='Session', repeated=True, indexed=False)
+    counts          = ndb.BlobProperty(compressed=True) # array('I') (a, b, n), indexes into sessionKeys
+    done            = ndb.BooleanProperty(default=False, indexed=False)
+    error           = ndb.StringProperty(indexed=False) # why the job was abandoned
+    started         = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
+
+class SessionRecommendations(ndb.Model):
+    """SessionRecommendations -- top sessions wishlisted together with each
+    session of its parent Conference, packed by recommendations.py"""
+    sessionKeys     = ndb.KeyProperty(kind='Session', repeated=True, indexed=False)
+    neighbors       = ndb.BlobProperty()
+    topK            = ndb.IntegerProperty(indexed=False)
+    users           = ndb.IntegerProperty(indexed=False)
+    updated         = ndb.DateTimeProperty(auto_now=True, indexed=False)
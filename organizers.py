@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+"""organizers.py
+
+Udacity conference server-side Python App Engine organizer display names
+
+Each Conference stores its organizer's displayName so conference lists
+need no Profile reads. When a Profile's displayName changes, a task
+chain copies the new name onto the organizer's conferences in batches.
+Every batch re-reads the Profile and its conferences in one transaction
+(they share the Profile's entity group) and drops their cached forms only
+once it has committed, so repeated or overlapping chains all settle on
+the latest name and no reader can cache a form with the old one.
+
+"""
+
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+from cache import invalidateConferenceForms
+from models import Conference
+
+ORGANIZER_BATCH = 100
+
+
+def scheduleOrganizerNameUpdate(p_key, cursor=None, transactional=False):
+    """Enqueue the copy of p_key's displayName onto its conferences."""
+    params = {'profile': p_key.urlsafe()}
+    if cursor:
+        params['cursor'] = cursor
+    taskqueue.add(params=params, url='/tasks/update_organizer_name',
+                  transactional=transactional)
+
+
+@ndb.transactional
+def updateOrganizerNamePage(p_key, cursor=None):
+    """Update one batch of p_key's conferences; return the next cursor or None."""
+    # Conferences are children of their organizer's Profile, so the
+    # profile and the whole batch share one entity group
+    prof = p_key.get()
+    confs, next_cursor, more = Conference.query(ancestor=p_key).fetch_page(
+        ORGANIZER_BATCH, start_cursor=Cursor(urlsafe=cursor) if cursor else None)
+    changed = [conf for conf in confs
+               if conf.organizerDisplayName != prof.displayName]
+    for conf in changed:
+        conf.organizerDisplayName = prof.displayName
+    ndb.put_multi(changed)
+    wscks = [conf.key.urlsafe() for conf in changed]
+    ndb.get_context().call_on_commit(lambda: invalidateConferenceForms(wscks))
+    return next_cursor.urlsafe() if more and next_cursor else None
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+"""recommendations.py
+
+Udacity conference server-side Python App Engine session recommendations
+from wishlist co-occurrence
+
+"People who wishlisted this also wishlisted" is precomputed per
+conference by a chain of tasks that scans the conference's UserWishList
+entries in key order, so each user's entries arrive together (a user
+split across two chunks is carried over in the checkpoint). Every pair
+of sessions in a user's wishlist counts once. Between chunks all the
+counts are checkpointed, untrimmed, as array('I') (a, b, n) triples of
+indexes into the job's sessionKeys, so the final counts are exact; a
+conference whose checkpoint would outgrow MAX_CHECKPOINT_BYTES is
+abandoned with an error, keeping its previous recommendations. When the
+scan is done the top TOP_K sessions of each session are packed into one
+SessionRecommendations entity per conference:
+
+    sessionKeys the conference's Session keys that have neighbours
+    neighbors   array('I') of len(sessionKeys) rows of TOP_K
+                (1 + index into sessionKeys, count) pairs, 0-padded
+
+so serving a session's recommendations is one get and a slice.
+
+"""
+
+import array
+import heapq
+import logging
+
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+from models import RecommendationJob
+from models import SessionRecommendations
+from models import UserWishList
+
+TOP_K = 10
+RECOMMENDATION_CHUNK = 500
+# bounds the work of one wishlist
+MAX_WISHLIST_SESSIONS = 50
+# leaves room within the 1MB entity limit for the job's other properties
+MAX_CHECKPOINT_BYTES = 900000
+
+
+def recommendationsKey(conf_key):
+    """Return the key of the SessionRecommendations of conf_key."""
+    return ndb.Key(SessionRecommendations, 1, parent=conf_key)
+
+
+def _queueChunk(job, transactional=False):
+    taskqueue.add(params={'websafeConferenceKey': job.key.id(), 'chunk': job.chunk},
+                  url='/tasks/compute_recommendations', transactional=transactional)
+
+
+@ndb.transactional
+def startRecommendations(conf_key):
+    """Start (over) computing the recommendations of the Conference at conf_key."""
+    job = RecommendationJob.get_by_id(conf_key.urlsafe())
+    # the chunk count carries on, so tasks of a previous run are ignored
+    job = RecommendationJob(id=conf_key.urlsafe(), chunk=job.chunk + 1 if job else 0)
+    job.put()
+    _queueChunk(job, transactional=True)
+
+
+def _countWishlist(counts, sessions):
+    """Count every pair of sessions once; return 1 if it was a wishlist."""
+    sessions = list(sessions)[:MAX_WISHLIST_SESSIONS]
+    for a in sessions:
+        row = counts.setdefault(a, {})
+        for b in sessions:
+            if a != b:
+                row[b] = row.get(b, 0) + 1
+    return 1 if sessions else 0
+
+
+def _topNeighbors(row, n):
+    """Return the n (session, count) pairs of row with the highest counts."""
+    return heapq.nlargest(n, row.items(), key=lambda item: item[1])
+
+
+def _packCounts(counts):
+    """Return counts as array('I') (a, b, n) triples."""
+    packed = array.array('I')
+    for a, row in counts.items():
+        for b, n in row.items():
+            packed.extend((a, b, n))
+    return packed.tostring()
+
+
+def _unpackCounts(blob):
+    """Return the counts packed by _packCounts."""
+    packed = array.array('I')
+    packed.fromstring(blob or '')
+    counts = {}
+    for i in range(0, len(packed), 3):
+        counts.setdefault(packed[i], {})[packed[i + 1]] = packed[i + 2]
+    return counts
+
+
+def _pack(counts, s_keys):
+    """Return (sessionKeys, neighbors) of counts, which index s_keys; see
+    the module docstring."""
+    rows = [i for i, row in counts.items() if row]
+    index = dict((i, j + 1) for j, i in enumerate(rows))
+    packed = array.array('I')
+    for i in rows:
+        row = []
+        for other, n in _topNeighbors(counts[i], TOP_K):
+            row.extend((index[other], n))
+        packed.extend(row + [0] * (2 * TOP_K - len(row)))
+    return [s_keys[i] for i in rows], packed.tostring()
+
+
+@ndb.transactional(xg=True)
+def _checkpoint(job_key, chunk, cursor, s_keys, counts, users, lastUser,
+                lastSessions, done, error=None):
+    job = job_key.get()
+    if job.chunk != chunk:
+        return
+    job.chunk += 1
+    job.cursor = cursor
+    job.users = users
+    job.lastUser = lastUser
+    job.lastSessions = list(lastSessions)
+    job.done = done or error is not None
+    job.error = error
+    if job.done:
+        job.sessionKeys = []
+        job.counts = None
+    else:
+        job.sessionKeys = s_keys
+        job.counts = counts
+        _queueChunk(job, transactional=True)
+    if done and error is None:
+        sessionKeys, neighbors = _pack(_unpackCounts(counts), s_keys)
+        SessionRecommendations(key=recommendationsKey(ndb.Key(urlsafe=job_key.id())),
+            sessionKeys=sessionKeys, neighbors=neighbors, topK=TOP_K,
+            users=users).put()
+    job.put()
+
+
+def processRecommendationChunk(wsck, chunk):
+    """Count the wishlists of one chunk of a conference's UserWishLists."""
+    job = RecommendationJob.get_by_id(wsck)
+    # a retried task for a chunk that has already been checkpointed
+    if not job or job.done or job.chunk != chunk:
+        return
+
+    entries, next_cursor, more = UserWishList.query(
+        UserWishList.conferenceWsk == wsck).fetch_page(RECOMMENDATION_CHUNK,
+        start_cursor=Cursor(urlsafe=job.cursor) if job.cursor else None)
+    # sessions are counted by their index in s_keys
+    s_keys = list(job.sessionKeys)
+    index = dict((s_key, i) for i, s_key in enumerate(s_keys))
+    def indexOf(s_key):
+        if s_key not in index:
+            index[s_key] = len(s_keys)
+            s_keys.append(s_key)
+        return index[s_key]
+
+    counts = _unpackCounts(job.counts)
+    users = job.users
+    user, sessions = job.lastUser, set(job.lastSessions)
+    for entry in entries:
+        if entry.userID != user:
+            users += _countWishlist(counts, [indexOf(s_key) for s_key in sessions])
+            user, sessions = entry.userID, set()
+        sessions.add(ndb.Key(urlsafe=entry.sessionKey))
+    done = not (more and next_cursor)
+    if done:
+        users += _countWishlist(counts, [indexOf(s_key) for s_key in sessions])
+        user, sessions = None, set()
+
+    packed = _packCounts(counts)
+    size = len(packed) + sum(len(s_key.urlsafe()) for s_key in s_keys + list(sessions))
+    error = None
+    # the last chunk's counts are packed into recommendations, not checkpointed
+    if not done and size > MAX_CHECKPOINT_BYTES:
+        error = 'co-occurrence counts of %d bytes exceed %d' % (size, MAX_CHECKPOINT_BYTES)
+        logging.error('Abandoned recommendations of %s: %s', wsck, error)
+    _checkpoint(job.key, chunk, None if done else next_cursor.urlsafe(),
+                s_keys, packed, users, user, sessions, done, error)
+
+
+def recommendedSessions(recs, s_key):
+    """Return the (session key, count) recommendations of s_key in recs."""
+    if recs is None or s_key not in recs.sessionKeys:
+        return []
+    i = recs.sessionKeys.index(s_key)
+    row = array.array('I')
+    width = 2 * recs.topK * row.itemsize
+    row.fromstring(recs.neighbors[i * width:(i + 1) * width])
+    return [(recs.sessionKeys[row[j] - 1], row[j + 1])
+            for j in range(0, len(row), 2) if row[j]]
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+"""registrations.py
+
+Udacity conference server-side Python App Engine conference registrations
+
+A registration is a Registration entity, child of the attendee's Profile
+and keyed by the Conference's websafe key, so "am I registered" is one
+get, "my conferences" is an ancestor query and "who is attending" is a
+query on Registration.conferenceKey. Registrations used to be a list on
+the Profile; migrateProfile() moves such a list into entities, lazily
+when its user shows up and in bulk from the migrate_registrations
+mapper of main.py.
+
+"""
+
+from google.appengine.ext import ndb
+
+from models import Registration
+
+
+def registrationKey(p_key, conf_key):
+    """Return the key of the Registration of p_key for conf_key."""
+    return ndb.Key(Registration, conf_key.urlsafe(), parent=p_key)
+
+
+@ndb.transactional
+def migrateProfile(p_key):
+    """Move a Profile's conferenceKeysToAttend into Registrations; return it."""
+    prof = p_key.get()
+    if not prof or not prof.conferenceKeysToAttend:
+        return prof
+    conf_keys = set(ndb.Key(urlsafe=wsck) for wsck in prof.conferenceKeysToAttend)
+    prof.conferenceKeysToAttend = []
+    ndb.put_multi([Registration(key=registrationKey(p_key, c_key), conferenceKey=c_key)
+                   for c_key in conf_keys] + [prof])
+    return prof
+
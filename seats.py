@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+"""seats.py
+
+Udacity conference server-side Python App Engine sharded seat counters
+
+A Conference's available seats are split across NUM_SEAT_SHARDS root
+SeatShard entities, so concurrent registrations land in different entity
+groups instead of all rewriting the Conference. A registration only
+succeeds by taking a seat from a shard that still has one, which keeps
+the "no seats available" guarantee. The total is cached in memcache and
+copied back onto Conference.seatsAvailable by a deduplicated task.
+
+A new seatsAvailable for a sharded conference becomes a change of the
+shard total, read before the conference's transaction, that a task
+enqueued in that transaction adds to the shards in a transaction of
+their own. Registrations made meanwhile are kept, and the conference's
+transaction stays within its own entity group. Each change is numbered by
+Conference.seatsReset and the shards record the last number applied, so
+a retried or out-of-order task is ignored, and a sync only copies a shard
+total that includes the conference's latest change.
+
+"""
+
+import random
+import time
+
+from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from models import SeatShard
+
+# keep NUM_SEAT_SHARDS + 1 within the 25 entity group limit of XG transactions
+NUM_SEAT_SHARDS = 20
+MEMCACHE_SEATS_PREFIX = "SEATS_AVAILABLE:"
+MEMCACHE_SEATS_TTL = 300
+SEATS_SYNC_INTERVAL = 10
+
+
+def seatShardKeys(conf_key):
+    """Return the SeatShard keys of the Conference with key conf_key."""
+    wsck = conf_key.urlsafe()
+    return [ndb.Key(SeatShard, '%s-%d' % (wsck, i))
+            for i in range(NUM_SEAT_SHARDS)]
+
+
+def _shares(seats):
+    """Return seats split into NUM_SEAT_SHARDS shares as evenly as possible."""
+    share, extra = divmod(max(seats or 0, 0), NUM_SEAT_SHARDS)
+    return [share + (1 if i < extra else 0) for i in range(NUM_SEAT_SHARDS)]
+
+
+def _splitSeats(conf_key, seats):
+    """Return SeatShards sharing seats as evenly as possible."""
+    return [SeatShard(key=s_key, seatsAvailable=share)
+            for s_key, share in zip(seatShardKeys(conf_key), _shares(seats))]
+
+
+@ndb.transactional(xg=True)
+def _createSeatShards(conf_key):
+    conf = conf_key.get()
+    if not conf.seatShards:
+        conf.seatShards = NUM_SEAT_SHARDS
+        ndb.put_multi(_splitSeats(conf_key, conf.seatsAvailable) + [conf])
+    return conf
+
+
+def ensureSeatShards(conf):
+    """Return conf, splitting its seatsAvailable into shards if not yet done."""
+    if conf.seatShards:
+        return conf
+    return _createSeatShards(conf.key)
+
+
+@ndb.non_transactional
+def shardedSeats(conf_key):
+    """Return the seats left in conf_key's shards, or None if it has none."""
+    shards = [shard for shard in ndb.get_multi(seatShardKeys(conf_key)) if shard]
+    if not shards:
+        return None
+    return sum(shard.seatsAvailable for shard in shards)
+
+
+def scheduleSeatsChange(conf, delta):
+    """Number a change of delta seats to conf's shards and enqueue it;
+    call inside the transaction that puts conf."""
+    conf.seatsReset += 1
+    taskqueue.add(params={'websafeConferenceKey': conf.key.urlsafe(),
+                          'delta': delta, 'reset': conf.seatsReset},
+                  url='/tasks/change_seats_available', transactional=True)
+
+
+@ndb.transactional(xg=True)
+def applySeatsChange(conf_key, delta, reset):
+    """Add delta seats to conf_key's shards, unless they already hold
+    change reset or a later one. Seats are removed only from shards that
+    have some, so the total never drops below zero."""
+    shards = [shard or SeatShard(key=s_key) for s_key, shard in
+              zip(seatShardKeys(conf_key), ndb.get_multi(seatShardKeys(conf_key)))]
+    if any(shard.reset >= reset for shard in shards):
+        return
+    if delta >= 0:
+        for shard, share in zip(shards, _shares(delta)):
+            shard.seatsAvailable += share
+    else:
+        remove = -delta
+        for shard in shards:
+            taken = min(remove, max(shard.seatsAvailable, 0))
+            shard.seatsAvailable -= taken
+            remove -= taken
+    for shard in shards:
+        shard.reset = reset
+    ndb.put_multi(shards)
+    ndb.get_context().call_on_commit(lambda: invalidateCachedSeats([conf_key]))
+
+
+def openSeatShardKeys(conf):
+    """Return the keys of conf's shards that have seats left, shuffled."""
+    shards = ndb.get_multi(seatShardKeys(conf.key))
+    s_keys = [shard.key for shard in shards if shard and shard.seatsAvailable > 0]
+    random.shuffle(s_keys)
+    return s_keys
+
+
+def randomSeatShardKey(conf):
+    """Return the key of one of conf's shards, chosen at random."""
+    return random.choice(seatShardKeys(conf.key))
+
+
+@ndb.tasklet
+def getSeatsAvailableAsync(conf_keys, defaults):
+    """Return a Future for the seats available of each key in conf_keys.
+
+    Totals come from memcache, summing the shards on a miss; conferences
+    without shards report the matching entry of defaults (None defaults
+    are not cached).
+    """
+    ctx = ndb.get_context()
+    wscks = [c_key.urlsafe() for c_key in conf_keys]
+    # the context batches these into one memcache get_multi
+    cached = yield [ctx.memcache_get(MEMCACHE_SEATS_PREFIX + wsck)
+                    for wsck in wscks]
+    totals = dict((wsck, total) for wsck, total in zip(wscks, cached)
+                  if total is not None)
+
+    missing = [(c_key, wsck, default) for c_key, wsck, default
+               in zip(conf_keys, wscks, defaults) if wsck not in totals]
+    if missing:
+        s_keys = []
+        for c_key, wsck, default in missing:
+            s_keys.extend(seatShardKeys(c_key))
+        shards = yield ndb.get_multi_async(s_keys)
+        fetched = {}
+        for i, (c_key, wsck, default) in enumerate(missing):
+            conf_shards = [shard for shard in
+                           shards[i * NUM_SEAT_SHARDS:(i + 1) * NUM_SEAT_SHARDS] if shard]
+            if conf_shards:
+                fetched[wsck] = sum(shard.seatsAvailable for shard in conf_shards)
+            else:
+                fetched[wsck] = default
+        memcache.set_multi(dict((wsck, total) for wsck, total in fetched.items()
+                                if total is not None),
+                           key_prefix=MEMCACHE_SEATS_PREFIX, time=MEMCACHE_SEATS_TTL)
+        totals.update(fetched)
+
+    raise ndb.Return([totals[wsck] for wsck in wscks])
+
+
+@ndb.non_transactional
+def getSeatsAvailable(conf_keys, defaults):
+    """Return the seats available for each Conference key in conf_keys."""
+    return getSeatsAvailableAsync(conf_keys, defaults).get_result()
+
+
+def adjustCachedSeats(conf_key, delta):
+    """Apply delta to the cached seat total of conf_key, if cached.
+
+    Returns the new total, or None if it was not cached.
+    """
+    if delta < 0:
+        return memcache.decr(MEMCACHE_SEATS_PREFIX + conf_key.urlsafe(), -delta)
+    return memcache.incr(MEMCACHE_SEATS_PREFIX + conf_key.urlsafe(), delta)
+
+
+def invalidateCachedSeats(conf_keys):
+    """Drop the cached seat totals of conf_keys."""
+    memcache.delete_multi([c_key.urlsafe() for c_key in conf_keys],
+                          key_prefix=MEMCACHE_SEATS_PREFIX)
+
+
+def scheduleSeatsSync(conf_key):
+    """Enqueue at most one seatsAvailable sync per conference per interval."""
+    wsck = conf_key.urlsafe()
+    try:
+        taskqueue.add(params={'websafeConferenceKey': wsck},
+            url='/tasks/sync_seats_available',
+            name='seats-%s-%d' % (wsck, int(time.time() / SEATS_SYNC_INTERVAL)),
+            countdown=SEATS_SYNC_INTERVAL)
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
+
+
+@ndb.transactional
+def _setSeatsAvailable(conf_key, seats, reset):
+    conf = conf_key.get()
+    # shards read before the conference's latest change are stale
+    if not conf or conf.seatsReset > reset:
+        return False
+    if conf.seatsAvailable != seats:
+        conf.seatsAvailable = seats
+        conf.put()
+    return True
+
+
+def syncSeatsAvailable(conf_key):
+    """Copy the shard total onto Conference.seatsAvailable and memcache."""
+    shards = [shard for shard in ndb.get_multi(seatShardKeys(conf_key)) if shard]
+    if not shards:
+        return
+    seats = sum(shard.seatsAvailable for shard in shards)
+    if _setSeatsAvailable(conf_key, seats, max(shard.reset for shard in shards)):
+        memcache.set(MEMCACHE_SEATS_PREFIX + conf_key.urlsafe(), seats,
+                     time=MEMCACHE_SEATS_TTL)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""serializers.py
+
+Udacity conference server-side Python App Engine entity-to-message
+serializers
+
+Each Serializer works out once, at import time, which message fields
+come from which entity attributes and how to convert them, so copying
+an entity is a walk over a short list of (field, getter) pairs with no
+per-field reflection.
+
+"""
+
+from operator import attrgetter
+
+from models import Conference
+from models import ConferenceForm
+from models import Profile
+from models import ProfileForm
+from models import Session
+from models import SessionForm
+from models import Speaker
+from models import SpeakerForm
+from models import TeeShirtSize
+from models import UserWishList
+from models import UserWishListForm
+
+_TEE_SHIRT_SIZES = dict((name, TeeShirtSize.lookup_by_name(name))
+                        for name in TeeShirtSize.names())
+
+
+def toString(name):
+    """Return a getter converting attribute name to str (e.g. dates)."""
+    getter = attrgetter(name)
+    return lambda entity: str(getter(entity))
+
+
+def toTeeShirtSize(name):
+    """Return a getter mapping attribute name to a TeeShirtSize enum."""
+    getter = attrgetter(name)
+    return lambda entity: _TEE_SHIRT_SIZES[getter(entity)]
+
+
+def toUrlsafeKey(entity):
+    """Return the websafe key of entity."""
+    return entity.key.urlsafe()
+
+
+class Serializer(object):
+    """Serializer -- precompiled entity to ProtoRPC message copier"""
+
+    def __init__(self, model, message, converters=None, keyField=None):
+        converters = converters or {}
+        ops = []
+        for field in message.all_fields():
+            if field.name == keyField:
+                ops.append((field.name, toUrlsafeKey))
+            elif field.name in converters:
+                ops.append((field.name, converters[field.name]))
+            elif field.name in model._properties:
+                ops.append((field.name, attrgetter(field.name)))
+        self.message = message
+        self.ops = tuple(ops)
+
+    def serialize(self, entity, fields=None):
+        """Return a message for entity, copying only fields if given."""
+        msg = self.message()
+        for name, getter in self.ops:
+            if fields is None or name in fields:
+                setattr(msg, name, getter(entity))
+        return msg
+
+
+CONFERENCE_SERIALIZER = Serializer(Conference, ConferenceForm,
+    converters={'startDate': toString('startDate'),
+                'endDate': toString('endDate')},
+    keyField='websafeKey')
+
+PROFILE_SERIALIZER = Serializer(Profile, ProfileForm,
+    converters={'teeShirtSize': toTeeShirtSize('teeShirtSize')})
+
+SESSION_SERIALIZER = Serializer(Session, SessionForm,
+    converters={'date': toString('date'),
+                'startTime': toString('startTime')},
+    keyField='sessionUrlSafeKey')
+
+SPEAKER_SERIALIZER = Serializer(Speaker, SpeakerForm,
+    keyField='websafeSpeakerKey')
+
+USERWISHLIST_SERIALIZER = Serializer(UserWishList, UserWishListForm,
+    converters={'dateAddedToWishList': toString('dateAddedToWishList')})
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""speakers.py
+
+Udacity conference server-side Python App Engine Speaker aggregates
+
+Each Session and ConferenceSpeaker references its Speaker by normalized
+name (Speaker.keyForName). Writing sessions updates the per-conference
+ConferenceSpeaker rows in the conference's transaction and enqueues,
+with the commit, a task that copies the conference's contribution --
+session count and minutes, read with a strongly consistent ancestor
+query -- into the affected Speakers. Each Speaker keeps its contribution
+per conference and sums them, in a transaction, so a retried task is
+harmless and concurrent tasks for different conferences cannot overwrite
+each other. The repair_speakers mapper of main.py recomputes the rows of
+every conference from its Sessions on a daily cron; it never writes a
+Session, and rewrites a conference's rows REPAIR_BATCH at a time so large
+conferences stay under the datastore's per-transaction entity limit.
+
+"""
+
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from models import ConferenceSpeaker
+from models import Session
+from models import Speaker
+
+REPAIR_BATCH = 200
+
+def scheduleSpeakerUpdate(conf_key, speaker_keys, transactional=True):
+    """Enqueue a recompute of speaker_keys after a write to conf_key."""
+    taskqueue.add(params={'websafeConferenceKey': conf_key.urlsafe(),
+                          'speaker': [s_key.id() for s_key in speaker_keys]},
+                  url='/tasks/update_speakers', transactional=transactional)
+
+
+@ndb.transactional(xg=True)
+def _updateSpeaker(s_key, conf_key):
+    """Store conf_key's contribution in the Speaker at s_key and re-sum it."""
+    rows = ConferenceSpeaker.query(ConferenceSpeaker.speakerKey == s_key,
+                                   ancestor=conf_key).fetch()
+    speaker = s_key.get()
+    if speaker is None:
+        if not rows:
+            return
+        speaker = Speaker(key=s_key, name=rows[0].speaker)
+    conferences = dict(speaker.conferences)
+    if rows:
+        conferences[conf_key.urlsafe()] = [sum(row.sessionCount for row in rows),
+                                           sum(row.totalMinutes for row in rows)]
+    else:
+        conferences.pop(conf_key.urlsafe(), None)
+    if not conferences:
+        speaker.key.delete()
+        return
+    if conferences == speaker.conferences:
+        # the daily repair re-sends every speaker; most are unchanged
+        return
+    speaker.conferences = conferences
+    speaker.sessionCount = sum(n for n, minutes in conferences.values())
+    speaker.totalMinutes = sum(minutes for n, minutes in conferences.values())
+    speaker.websafeConferenceKeys = sorted(conferences)
+    speaker.put()
+
+
+def updateSpeakers(speaker_ids, conf_key):
+    """Update the aggregates of the Speakers with ids speaker_ids after a
+    write to conf_key."""
+    for s_id in speaker_ids:
+        _updateSpeaker(ndb.Key(Speaker, s_id), conf_key)
+
+
+def _conferenceSpeakers(sessions, conf_key):
+    """Return the ConferenceSpeakers of a conference's sessions, by key."""
+    rows = {}
+    for session in sessions:
+        cs_key = ConferenceSpeaker.keyForName(conf_key, session.speaker)
+        row = rows.get(cs_key)
+        if row is None:
+            row = rows[cs_key] = ConferenceSpeaker(key=cs_key, speaker=session.speaker)
+        row.sessionCount += 1
+        row.sessionNames.append(session.name)
+        row.totalMinutes += session.duration
+    return rows
+
+
+@ndb.transactional
+def _repairConferenceSpeakers(conf_key, cs_keys):
+    """Rewrite the ConferenceSpeakers at cs_keys from conf_key's Sessions,
+    and queue the update of their Speakers."""
+    rows = _conferenceSpeakers(Session.query(ancestor=conf_key).fetch(), conf_key)
+    stored = ndb.get_multi(cs_keys)
+    puts, deletes, speaker_keys = [], [], set()
+    for cs_key, old in zip(cs_keys, stored):
+        row = rows.get(cs_key)
+        if old:
+            speaker_keys.add(old.speakerKey)
+        if row is None:
+            if old:
+                deletes.append(cs_key)
+            continue
+        speaker_keys.add(row.speakerKey)
+        if old is None or (old.sessionCount, old.totalMinutes, sorted(old.sessionNames)) != \
+                (row.sessionCount, row.totalMinutes, sorted(row.sessionNames)):
+            puts.append(row)
+    ndb.put_multi(puts)
+    ndb.delete_multi(deletes)
+    if speaker_keys:
+        scheduleSpeakerUpdate(conf_key, speaker_keys)
+
+
+def repairConference(conf_key):
+    """Recompute a conference's ConferenceSpeakers, including their total
+    minutes, from its Sessions and queue the update of their Speakers.
+
+    The Sessions are only read. Rows of speakers who no longer have
+    sessions here, or that are keyed by a name that is not normalized,
+    are deleted.
+    """
+    sessions = Session.query(ancestor=conf_key).fetch()
+    cs_keys = set(_conferenceSpeakers(sessions, conf_key))
+    cs_keys.update(ConferenceSpeaker.query(ancestor=conf_key).fetch(keys_only=True))
+    cs_keys = list(cs_keys)
+    for i in range(0, len(cs_keys), REPAIR_BATCH):
+        _repairConferenceSpeakers(conf_key, cs_keys[i:i + REPAIR_BATCH])
@@ -408,6 +408,33 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
         }
     };
 
+    /**
+     * Invokes the list API method with request and follows nextCursor until every
+     * page has been read, then calls done with the last response, its items
+     * replaced by those of all pages (or with the first failed response).
+     *
+     * @param method the gapi.client.conference list method
+     * @param request the request of the first page
+     * @param done the callback
+     * @param items the items of the pages read so far
+     */
+    var fetchAllPages = function (method, request, done, items) {
+        method(request).execute(function (resp) {
+            if (resp.error) {
+                done(resp);
+                return;
+            }
+            items = (items || []).concat(resp.items || []);
+            if (resp.nextCursor) {
+                fetchAllPages(method, angular.extend({}, request, {cursor: resp.nextCursor}),
+                    done, items);
+            } else {
+                resp.items = items;
+                done(resp);
+            }
+        });
+    };
+
     /**
      * Query the conferences depending on the tab currently selected.
      *
@@ -441,8 +468,8 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
             }
         }
         $scope.loading = true;
-        gapi.client.conference.queryConferences(sendFilters).
-            execute(function (resp) {
+        fetchAllPages(gapi.client.conference.queryConferences, sendFilters,
+            function (resp) {
                 $scope.$apply(function () {
                     $scope.loading = false;
                     if (resp.error) {
@@ -458,9 +485,9 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
                         $scope.alertStatus = 'success';
                         $log.info($scope.messages);
 
-                        $scope.conferences = [];
-                        angular.forEach(resp.items, function (conference) {
-                            $scope.conferences.push(conference);
+                        // pages come in the query plan's order; list them by name
+                        $scope.conferences = resp.items.sort(function (a, b) {
+                            return a.name < b.name ? -1 : a.name > b.name ? 1 : 0;
                         });
                     }
                     $scope.submitted = true;
@@ -473,8 +500,8 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.getConferencesCreated = function () {
         $scope.loading = true;
-        gapi.client.conference.getConferencesCreated().
-            execute(function (resp) {
+        fetchAllPages(gapi.client.conference.getConferencesCreated, {},
+            function (resp) {
                 $scope.$apply(function () {
                     $scope.loading = false;
                     if (resp.error) {
@@ -511,8 +538,8 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.getConferencesAttend = function () {
         $scope.loading = true;
-        gapi.client.conference.getConferencesToAttend().
-            execute(function (resp) {
+        fetchAllPages(gapi.client.conference.getConferencesToAttend, {},
+            function (resp) {
                 $scope.$apply(function () {
                     if (resp.error) {
                         // The request has failed.
@@ -527,7 +554,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
                         }
                     } else {
                         // The request has succeeded.
-                        $scope.conferences = resp.result.items;
+                        $scope.conferences = resp.items;
                         $scope.loading = false;
                         $scope.messages = 'Query succeeded : Conferences you will attend (or you have attended)';
                         $scope.alertStatus = 'success';
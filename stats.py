@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+"""stats.py
+
+Udacity conference server-side Python App Engine statistics aggregates
+
+Site-wide counts -- conferences, seats, registrations and sessions, by
+city, month and session type -- are split across NUM_STATS_SHARDS root
+StatsShard entities. Each conference, session and registration write
+adds its counts to a shard chosen at random once it has committed, so
+writers rarely contend, and reading the totals is one get_multi cached
+in memcache. A Conference's session counts are kept in a ConferenceStats
+child, updated in the transaction that writes the sessions.
+
+Counts added after a commit can be lost (a failed update is logged,
+not raised), so the rebuild_statistics mapper of main.py recounts
+everything from the entities on a cron. Its counters start at minus the
+shard totals, so when it completes they hold the recount less those
+totals, and adding them to the shards keeps the counts added while the
+rebuild ran (an entity written during the rebuild in a part of the scan
+still to come is counted twice until the next rebuild).
+
+"""
+
+import logging
+import random
+
+from google.appengine.api import datastore_errors
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import ConferenceStats
+from models import Registration
+from models import Session
+from models import StatsShard
+
+# keep NUM_STATS_SHARDS + 1 within the 25 entity group limit of XG transactions
+NUM_STATS_SHARDS = 10
+MEMCACHE_STATISTICS_KEY = "STATISTICS"
+MEMCACHE_STATISTICS_TTL = 60
+UNSPECIFIED_TYPE = 'unspecified'
+
+
+def statsShardKeys():
+    """Return the keys of all StatsShards."""
+    return [ndb.Key(StatsShard, i + 1) for i in range(NUM_STATS_SHARDS)]
+
+
+def addCounts(counts, more):
+    """Return a new dict of counts plus more, without the zero counts."""
+    total = dict(counts)
+    for name, n in more.items():
+        total[name] = total.get(name, 0) + n
+        if not total[name]:
+            del total[name]
+    return total
+
+
+def conferenceCounts(conf, sign=1):
+    """Return the counts a Conference adds (or with sign=-1, removes)."""
+    counts = {'conferences': 1, 'seats': conf.maxAttendees or 0}
+    if conf.city:
+        counts['city:' + conf.city] = 1
+    if conf.month:
+        counts['month:%d' % conf.month] = 1
+    return dict((name, n * sign) for name, n in counts.items())
+
+
+def _typeCounts(sessions):
+    counts = {}
+    for session in sessions:
+        name = session.typeOfSession or UNSPECIFIED_TYPE
+        counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def sessionCounts(sessions):
+    """Return the counts a batch of new Sessions adds."""
+    counts = dict(('type:' + name, n) for name, n in _typeCounts(sessions).items())
+    counts['sessions'] = len(sessions)
+    return counts
+
+
+@ndb.transactional_tasklet
+def _addToShard(s_key, counts):
+    shard = yield s_key.get_async()
+    shard = shard or StatsShard(key=s_key)
+    shard.counts = addCounts(shard.counts, counts)
+    yield shard.put_async()
+
+
+@ndb.tasklet
+def adjustStatsAsync(counts):
+    """Add counts to a random StatsShard; call outside of transactions.
+
+    A failure is logged rather than raised: the write being counted has
+    already committed, and the next rebuild corrects the totals.
+    """
+    if not counts:
+        return
+    try:
+        yield _addToShard(random.choice(statsShardKeys()), counts)
+    except datastore_errors.Error as e:
+        logging.warning('Dropped statistics update %s: %s', counts, e)
+
+
+def adjustStats(counts):
+    """Add counts to a random StatsShard."""
+    adjustStatsAsync(counts).get_result()
+
+
+def addStats(counts):
+    """Add counts to a random StatsShard in the caller's XG transaction,
+    so they count exactly once if it commits."""
+    if counts:
+        _addToShard(random.choice(statsShardKeys()), counts).get_result()
+
+
+def _shardTotals():
+    counts = {}
+    for shard in ndb.get_multi(statsShardKeys()):
+        if shard:
+            counts = addCounts(counts, shard.counts)
+    return counts
+
+
+def getStatistics():
+    """Return the site-wide counts, summed over the shards."""
+    counts = memcache.get(MEMCACHE_STATISTICS_KEY)
+    if counts is None:
+        counts = _shardTotals()
+        memcache.set(MEMCACHE_STATISTICS_KEY, counts, time=MEMCACHE_STATISTICS_TTL)
+    return counts
+
+
+def conferenceStatsKey(conf_key):
+    """Return the key of the ConferenceStats of the Conference at conf_key."""
+    return ndb.Key(ConferenceStats, 1, parent=conf_key)
+
+
+def addSessionStats(stats, conf_key, sessions):
+    """Return stats, or new ConferenceStats of conf_key, counting sessions too."""
+    stats = stats or ConferenceStats(key=conferenceStatsKey(conf_key))
+    stats.sessions += len(sessions)
+    stats.sessionMinutes += sum(session.duration or 0 for session in sessions)
+    stats.sessionTypes = addCounts(stats.sessionTypes, _typeCounts(sessions))
+    return stats
+
+
+def rebuildConferenceStats(conf):
+    """Return conf's ConferenceStats recounted from its Sessions; run in
+    conf's transaction so no concurrently added session is missed."""
+    return addSessionStats(None, conf.key, Session.query(ancestor=conf.key).fetch())
+
+
+def countConferences(conf_keys):
+    """Return the site-wide counts of the Conferences at conf_keys, read
+    from the conferences, their ConferenceStats and Registrations."""
+    registrations = [Registration.query(Registration.conferenceKey == c_key).count_async()
+                     for c_key in conf_keys]
+    confs = ndb.get_multi(conf_keys)
+    stats = ndb.get_multi([conferenceStatsKey(c_key) for c_key in conf_keys])
+    counts = {}
+    for conf, conf_stats, registered in zip(confs, stats, registrations):
+        if conf is None:
+            continue
+        counts = addCounts(counts, conferenceCounts(conf))
+        counts = addCounts(counts, {'registrations': registered.get_result()})
+        if conf_stats:
+            counts = addCounts(counts, dict(('type:' + name, n) for name, n
+                                            in conf_stats.sessionTypes.items()))
+            counts = addCounts(counts, {'sessions': conf_stats.sessions})
+    return counts
+
+
+@ndb.non_transactional
+def startRebuild(job):
+    """Start the rebuild job's counters at minus the current shard totals."""
+    job.counters = dict((name, -n) for name, n in _shardTotals().items())
+
+
+def finishRebuild(job):
+    """Add the rebuild job's counters to the shards, merged into the
+    first one; call in an XG transaction."""
+    s_keys = statsShardKeys()
+    counts = addCounts(_shardTotals(), job.counters)
+    ndb.put_multi([StatsShard(key=s_keys[0], counts=counts)] +
+                  [StatsShard(key=s_key) for s_key in s_keys[1:]])
+    ndb.get_context().call_on_commit(lambda: memcache.delete(MEMCACHE_STATISTICS_KEY))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""test_query_planner.py -- tests of the queryConferences planner
+
+Runs the planner, the residual filters and the bounded scan of
+_fetchFilteredPage against the App Engine testbed datastore stub.
+
+usage: APPENGINE_SDK=/path/to/google_appengine python -m unittest discover tests
+
+"""
+
+import os
+import sys
+import unittest
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.environ.get('APPENGINE_SDK', '/usr/local/google_appengine'))
+import dev_appserver
+dev_appserver.fix_sys_path()
+sys.path.insert(0, ROOT)
+os.environ.setdefault('APPLICATION_ID', 'dev~confcenter-1156')
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+from conference import ConferenceApi
+from conference import MAX_SCAN
+from models import Conference
+from models import ConferenceQueryForm
+from models import ConferenceQueryForms
+
+
+def queryForms(*filters, **kwargs):
+    """Return ConferenceQueryForms of (field, operator, value) filters."""
+    return ConferenceQueryForms(
+        filters=[ConferenceQueryForm(field=field, operator=op, value=value)
+                 for field, op, value in filters], **kwargs)
+
+
+class QueryPlannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_datastore_v3_stub(
+            consistency_policy=datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+                probability=1))
+        self.testbed.init_memcache_stub()
+        ndb.get_context().set_cache_policy(False)
+        self.api = ConferenceApi()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def putConferences(self, *confs):
+        ndb.put_multi([Conference(**conf) for conf in confs])
+
+    def names(self, request):
+        """Return the names on one page of request, and the next cursor."""
+        query, residual = self.api._getQuery(request)
+        confs, cursor = self.api._fetchFilteredPage(
+            query, residual, request.pageSize, request.cursor)
+        return [conf.name for conf in confs], cursor
+
+    def allNames(self, request):
+        """Return the names on every page of request, following the cursors."""
+        names = []
+        while True:
+            page, request.cursor = self.names(request)
+            names.extend(page)
+            if not request.cursor:
+                return names
+
+    def testEqualitiesDriveTheQuery(self):
+        query, residual = self.api._getQuery(queryForms(
+            ('CITY', 'EQ', 'London'), ('MONTH', 'GT', '6')))
+        self.assertEqual([(f['field'], f['operator']) for f in residual],
+                         [('month', '>')])
+
+    def testFirstRangeFieldDrivesTheQuery(self):
+        query, residual = self.api._getQuery(queryForms(
+            ('MAX_ATTENDEES', 'GT', '10'), ('MONTH', 'LT', '6'),
+            ('MAX_ATTENDEES', 'LTEQ', '100'), ('CITY', 'NE', 'Paris')))
+        self.assertEqual(sorted((f['field'], f['operator']) for f in residual),
+                         [('city', '!='), ('month', '<')])
+
+    def testMissingPropertyNeverMatches(self):
+        self.putConferences(
+            {'name': 'a', 'city': 'London'},
+            {'name': 'b', 'city': None},
+            {'name': 'c', 'city': 'Paris'})
+        self.assertEqual(self.allNames(queryForms(('CITY', 'NE', 'Paris'))), ['a'])
+
+    def testRepeatedPropertyMatchesAnyValue(self):
+        conf = Conference(name='a', topics=['Web', 'Cloud'])
+        filtr = {'field': 'topics', 'operator': '!=', 'value': 'Web'}
+        self.assertTrue(ConferenceApi._matchesFilters(conf, [filtr]))
+        filtr = {'field': 'topics', 'operator': '=', 'value': 'Data'}
+        self.assertFalse(ConferenceApi._matchesFilters(conf, [filtr]))
+
+    def testDateBoundsAreInclusive(self):
+        self.putConferences(
+            {'name': 'before', 'startDate': date(2016, 2, 29), 'endDate': date(2016, 3, 2)},
+            {'name': 'first', 'startDate': date(2016, 3, 1), 'endDate': date(2016, 3, 3)},
+            {'name': 'last', 'startDate': date(2016, 3, 30), 'endDate': date(2016, 3, 31)},
+            {'name': 'open', 'startDate': date(2016, 3, 10), 'endDate': None},
+            {'name': 'after', 'startDate': date(2016, 3, 31), 'endDate': date(2016, 4, 1)})
+        names = self.allNames(queryForms(
+            ('START_DATE', 'GTEQ', '2016-03-01'), ('END_DATE', 'LTEQ', '2016-03-31')))
+        self.assertEqual(sorted(names), ['first', 'last'])
+
+    def testScanStopsAtMaxScanWithACursor(self):
+        self.putConferences(*[{'name': 'a%04d' % i, 'city': 'Paris'}
+                              for i in range(MAX_SCAN + 100)])
+        self.putConferences(*[{'name': 'z%d' % i, 'city': 'London'} for i in range(3)])
+        request = queryForms(('CITY', 'NE', 'Paris'))
+
+        names, cursor = self.names(request)
+        self.assertEqual(names, [])
+        self.assertTrue(cursor)
+
+        request.cursor = cursor
+        names, cursor = self.names(request)
+        self.assertEqual(names, ['z0', 'z1', 'z2'])
+        self.assertIsNone(cursor)
+
+    def testCursorContinuesShortPages(self):
+        self.putConferences(*[{'name': 'c%02d' % i, 'month': i % 12 + 1}
+                              for i in range(30)])
+        request = queryForms(('MONTH', 'NE', '1'), pageSize=4)
+        names = []
+        while True:
+            page, request.cursor = self.names(request)
+            self.assertLessEqual(len(page), 4)
+            names.extend(page)
+            if not request.cursor:
+                break
+        self.assertEqual(names, ['c%02d' % i for i in range(30) if i % 12])
+
+    def testBadCursorIsRejected(self):
+        import endpoints
+        with self.assertRaises(endpoints.BadRequestException):
+            self.names(queryForms(('CITY', 'NE', 'Paris'), cursor='not-a-cursor'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""test_recommendations.py -- tests of the wishlist co-occurrence counts
+
+Runs the chunked count of recommendations.py against the App Engine
+testbed datastore and task queue stubs.
+
+usage: APPENGINE_SDK=/path/to/google_appengine python -m unittest discover tests
+
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.environ.get('APPENGINE_SDK', '/usr/local/google_appengine'))
+import dev_appserver
+dev_appserver.fix_sys_path()
+sys.path.insert(0, ROOT)
+os.environ.setdefault('APPLICATION_ID', 'dev~confcenter-1156')
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+import recommendations
+from models import Conference
+from models import RecommendationJob
+from models import UserWishList
+from recommendations import TOP_K
+from recommendations import processRecommendationChunk
+from recommendations import recommendationsKey
+from recommendations import recommendedSessions
+from recommendations import startRecommendations
+
+
+class RecommendationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_datastore_v3_stub(
+            consistency_policy=datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+                probability=1))
+        self.testbed.init_memcache_stub()
+        self.testbed.init_taskqueue_stub(root_path=ROOT)
+        ndb.get_context().set_cache_policy(False)
+        self.chunk = recommendations.RECOMMENDATION_CHUNK
+        recommendations.RECOMMENDATION_CHUNK = 20
+        self.conf_key = Conference(name='a').put()
+        self.users = 0
+
+    def tearDown(self):
+        recommendations.RECOMMENDATION_CHUNK = self.chunk
+        self.testbed.deactivate()
+
+    def session(self, i):
+        return ndb.Key('Session', i, parent=self.conf_key)
+
+    def wishlist(self, *sessions):
+        """Store the wishlist of a new user."""
+        user = 'user%03d' % self.users
+        self.users += 1
+        ndb.put_multi([UserWishList(parent=ndb.Key('Profile', user), userID=user,
+                                    conferenceWsk=self.conf_key.urlsafe(),
+                                    sessionKey=self.session(i).urlsafe())
+                       for i in sessions])
+
+    def compute(self):
+        """Run every chunk of the conference's count."""
+        startRecommendations(self.conf_key)
+        wsck = self.conf_key.urlsafe()
+        job = RecommendationJob.get_by_id(wsck)
+        while not job.done:
+            processRecommendationChunk(wsck, job.chunk)
+            job = RecommendationJob.get_by_id(wsck)
+        return job
+
+    def testCountsAreExactAcrossChunks(self):
+        # 120 candidates of session 0 are checkpointed after the first
+        # chunks; the last ten are wishlisted with it again later on
+        for i in range(1, 121):
+            self.wishlist(0, i)
+        for i in range(111, 121):
+            self.wishlist(0, i)
+        job = self.compute()
+        self.assertIsNone(job.error)
+        recs = recommendationsKey(self.conf_key).get()
+        self.assertEqual(recs.users, 130)
+        self.assertEqual(TOP_K, 10)
+        self.assertEqual(set(recommendedSessions(recs, self.session(0))),
+                         set((self.session(i), 2) for i in range(111, 121)))
+
+
+if __name__ == '__main__':
+    unittest.main()
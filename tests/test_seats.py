@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""test_seats.py -- tests of the sharded seat counters
+
+Runs seat changes from updateConference and the seatsAvailable sync of
+seats.py against the App Engine testbed datastore and memcache stubs.
+
+usage: APPENGINE_SDK=/path/to/google_appengine python -m unittest discover tests
+
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.environ.get('APPENGINE_SDK', '/usr/local/google_appengine'))
+import dev_appserver
+dev_appserver.fix_sys_path()
+sys.path.insert(0, ROOT)
+os.environ.setdefault('APPLICATION_ID', 'dev~confcenter-1156')
+
+from google.appengine.api import memcache
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+from models import Conference
+from seats import MEMCACHE_SEATS_PREFIX
+from seats import applySeatsChange
+from seats import ensureSeatShards
+from seats import seatShardKeys
+from seats import shardedSeats
+from seats import syncSeatsAvailable
+
+
+class SeatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_datastore_v3_stub(
+            consistency_policy=datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+                probability=1))
+        self.testbed.init_memcache_stub()
+        ndb.get_context().set_cache_policy(False)
+        conf = Conference(name='a', maxAttendees=40, seatsAvailable=40)
+        conf.put()
+        self.conf = ensureSeatShards(conf)
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def register(self, n):
+        """Take n seats from the shards, as registrations do."""
+        shards = [shard for shard in ndb.get_multi(seatShardKeys(self.conf.key))
+                  if shard.seatsAvailable > 0][:n]
+        for shard in shards:
+            shard.seatsAvailable -= 1
+        ndb.put_multi(shards)
+
+    def change(self, seats):
+        """Record a change to seats on the Conference, as updateConference
+        does; return (delta, change number) for applySeatsChange."""
+        delta = seats - shardedSeats(self.conf.key)
+        conf = self.conf.key.get()
+        conf.seatsAvailable = seats
+        conf.seatsReset += 1
+        conf.put()
+        return delta, conf.seatsReset
+
+    def testChangeKeepsRegistrationsMadeMeanwhile(self):
+        delta, reset = self.change(50)
+        self.register(3)
+        applySeatsChange(self.conf.key, delta, reset)
+        self.assertEqual(shardedSeats(self.conf.key), 47)
+
+    def testRetriedChangeIsAppliedOnce(self):
+        delta, reset = self.change(50)
+        applySeatsChange(self.conf.key, delta, reset)
+        applySeatsChange(self.conf.key, delta, reset)
+        self.assertEqual(shardedSeats(self.conf.key), 50)
+
+    def testOutOfOrderChangeIsIgnored(self):
+        first = self.change(50)
+        second = self.change(30)
+        applySeatsChange(self.conf.key, *second)
+        applySeatsChange(self.conf.key, *first)
+        self.assertEqual(shardedSeats(self.conf.key), 30)
+
+    def testRemovedSeatsStopAtZero(self):
+        delta, reset = self.change(5)
+        self.register(38)
+        applySeatsChange(self.conf.key, delta, reset)
+        self.assertEqual(shardedSeats(self.conf.key), 0)
+        self.assertTrue(all(shard.seatsAvailable >= 0 for shard in
+                            ndb.get_multi(seatShardKeys(self.conf.key))))
+
+    def testSyncSkipsShardsBeforeTheLatestChange(self):
+        self.register(2)
+        self.change(50)
+        syncSeatsAvailable(self.conf.key)
+        self.assertEqual(self.conf.key.get().seatsAvailable, 50)
+        self.assertIsNone(memcache.get(MEMCACHE_SEATS_PREFIX + self.conf.key.urlsafe()))
+
+    def testSyncCopiesTheChangedTotal(self):
+        delta, reset = self.change(50)
+        self.register(2)
+        applySeatsChange(self.conf.key, delta, reset)
+        syncSeatsAvailable(self.conf.key)
+        self.assertEqual(self.conf.key.get().seatsAvailable, 48)
+        self.assertEqual(memcache.get(MEMCACHE_SEATS_PREFIX + self.conf.key.urlsafe()), 48)
+
+
+if __name__ == '__main__':
+    unittest.main()
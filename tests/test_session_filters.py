@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""test_session_filters.py -- tests of the querySessions filter checks
+
+Checks that _formatSessionFilters accepts only the filter mixes that
+index.yaml has an index for.
+
+usage: APPENGINE_SDK=/path/to/google_appengine python -m unittest discover tests
+
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.environ.get('APPENGINE_SDK', '/usr/local/google_appengine'))
+import dev_appserver
+dev_appserver.fix_sys_path()
+sys.path.insert(0, ROOT)
+os.environ.setdefault('APPLICATION_ID', 'dev~confcenter-1156')
+
+import endpoints
+
+from conference import ConferenceApi
+from models import SessionQueryForm
+
+
+def sessionFilters(*filters):
+    """Return SessionQueryForms of (field, operator, value) filters."""
+    return [SessionQueryForm(field=field, operator=op, value=value)
+            for field, op, value in filters]
+
+
+class SessionFiltersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = ConferenceApi()
+
+    def format(self, *filters):
+        return self.api._formatSessionFilters(sessionFilters(*filters))
+
+    def assertRejected(self, *filters):
+        with self.assertRaises(endpoints.BadRequestException):
+            self.format(*filters)
+
+    def testIndexedMixesAreAccepted(self):
+        self.assertEqual(self.format(('SPEAKER', 'EQ', 'Ann Lee'),
+                                     ('DURATION', 'LT', '60'))[0], 'duration')
+        self.assertEqual(self.format(('TYPE', 'EQ', 'talk'),
+                                     ('DATE', 'GT', '2016-03-01'))[0], 'date')
+        inequality, filters = self.format(('TYPE', 'NE', 'workshop'),
+                                          ('START_TIME', 'LT', '19:00'))
+        self.assertEqual(inequality, 'typeOfSession')
+        self.assertIn(('startsBeforeHour', '=', 19),
+                      [(f['field'], f['operator'], f['value']) for f in filters])
+
+    def testEqualitiesOrOneInequalityAloneAreAccepted(self):
+        self.assertIsNone(self.format(('SPEAKER', 'EQ', 'Ann Lee'),
+                                      ('TYPE', 'EQ', 'talk'))[0])
+        self.assertEqual(self.format(('DURATION', 'GT', '30'),
+                                     ('DURATION', 'LTEQ', '90'))[0], 'duration')
+
+    def testUnindexedMixesAreRejected(self):
+        self.assertRejected(('SPEAKER', 'EQ', 'Ann Lee'), ('DATE', 'LT', '2016-03-01'))
+        self.assertRejected(('DURATION', 'LT', '60'), ('START_TIME', 'LT', '10:00'))
+        self.assertRejected(('TYPE', 'EQ', 'talk'), ('START_TIME', 'LT', '10:00'))
+        self.assertRejected(('SPEAKER', 'EQ', 'Ann Lee'), ('TYPE', 'EQ', 'talk'),
+                            ('DURATION', 'LT', '60'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""test_speakers.py -- tests of the Speaker aggregates
+
+Runs the daily repair and the Speaker updates of speakers.py against the
+App Engine testbed datastore and task queue stubs.
+
+usage: APPENGINE_SDK=/path/to/google_appengine python -m unittest discover tests
+
+"""
+
+import datetime
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.environ.get('APPENGINE_SDK', '/usr/local/google_appengine'))
+import dev_appserver
+dev_appserver.fix_sys_path()
+sys.path.insert(0, ROOT)
+os.environ.setdefault('APPLICATION_ID', 'dev~confcenter-1156')
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+from models import Conference
+from models import ConferenceSpeaker
+from models import Session
+from models import Speaker
+from speakers import repairConference
+from speakers import updateSpeakers
+
+
+class SpeakersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        self.testbed.init_datastore_v3_stub(
+            consistency_policy=datastore_stub_util.PseudoRandomHRConsistencyPolicy(
+                probability=1))
+        self.testbed.init_memcache_stub()
+        self.testbed.init_taskqueue_stub(root_path=ROOT)
+        ndb.get_context().set_cache_policy(False)
+        self.conf_key = Conference(name='a').put()
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def addSession(self, name, speaker, duration=60):
+        return Session(parent=self.conf_key, name=name, speaker=speaker,
+                       duration=duration, date=datetime.date(2016, 3, 1),
+                       startTime=datetime.time(10, 0),
+                       websafeConferenceKey=self.conf_key.urlsafe()).put()
+
+    def rows(self):
+        return dict((row.key.id(), row) for row in
+                    ConferenceSpeaker.query(ancestor=self.conf_key).fetch())
+
+    def testSpellingsOfANameShareARow(self):
+        self.addSession('s1', 'Ann Lee', 30)
+        self.addSession('s2', 'ann  lee', 60)
+        repairConference(self.conf_key)
+        rows = self.rows()
+        self.assertEqual(rows.keys(), ['ann lee'])
+        self.assertEqual(rows['ann lee'].sessionCount, 2)
+        self.assertEqual(rows['ann lee'].totalMinutes, 90)
+
+    def testRepairRekeysAndDropsStaleRows(self):
+        self.addSession('s1', 'Ann Lee')
+        ConferenceSpeaker(key=ndb.Key(ConferenceSpeaker, 'Ann Lee', parent=self.conf_key),
+                          speaker='Ann Lee', sessionCount=1).put()
+        ConferenceSpeaker(key=ConferenceSpeaker.keyForName(self.conf_key, 'Bo'),
+                          speaker='Bo', sessionCount=1).put()
+        repairConference(self.conf_key)
+        self.assertEqual(self.rows().keys(), ['ann lee'])
+
+    def testSpeakerSumsItsConferences(self):
+        other_key = Conference(name='b').put()
+        self.addSession('s1', 'Ann Lee', 30)
+        Session(parent=other_key, name='s2', speaker='Ann Lee', duration=60,
+                date=datetime.date(2016, 3, 1), startTime=datetime.time(10, 0),
+                websafeConferenceKey=other_key.urlsafe()).put()
+        repairConference(self.conf_key)
+        repairConference(other_key)
+        updateSpeakers(['ann lee'], self.conf_key)
+        updateSpeakers(['ann lee'], other_key)
+        speaker = Speaker.keyForName('Ann Lee').get()
+        self.assertEqual((speaker.sessionCount, speaker.totalMinutes), (2, 90))
+
+    def testSpeakerWithoutSessionsIsDeleted(self):
+        Speaker(key=Speaker.keyForName('Bo'), name='Bo',
+                conferences={self.conf_key.urlsafe(): [1, 60]}).put()
+        updateSpeakers(['bo'], self.conf_key)
+        self.assertIsNone(Speaker.keyForName('Bo').get())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""textsearch.py
+
+Udacity conference server-side Python App Engine full-text search of
+Conferences and Sessions
+
+Every Conference and Session is mirrored, on each write, as a document
+in a Search API index whose doc_id is the entity's websafe key. Keyword
+search is a single ranked lookup returning ids only; the entities are
+then read with one get_multi. The reindex mappers of main.py rebuild the
+documents of entities written before the indexes existed.
+
+"""
+
+import logging
+
+from google.appengine.api import search
+from google.appengine.ext import ndb
+
+CONFERENCE_INDEX = 'conferences'
+SESSION_INDEX = 'sessions'
+INDEX_BATCH = search.MAXIMUM_DOCUMENTS_PER_PUT_REQUEST
+
+_SORT_BY_SCORE = search.SortOptions(
+    expressions=[search.SortExpression(expression='_score',
+        direction=search.SortExpression.DESCENDING, default_value=0.0)],
+    match_scorer=search.MatchScorer())
+
+
+def _conferenceDocument(conf):
+    fields = [
+        search.TextField(name='name', value=conf.name),
+        search.TextField(name='description', value=conf.description or ''),
+        search.TextField(name='topics', value=' '.join(conf.topics)),
+        search.AtomField(name='city', value=conf.city or ''),
+    ]
+    if conf.startDate:
+        fields.append(search.DateField(name='startDate', value=conf.startDate))
+    return search.Document(doc_id=conf.key.urlsafe(), fields=fields)
+
+
+def _sessionDocument(session):
+    return search.Document(doc_id=session.key.urlsafe(), fields=[
+        search.TextField(name='name', value=session.name),
+        search.TextField(name='highlights', value=session.highlights or ''),
+        search.TextField(name='speaker', value=session.speaker),
+        search.AtomField(name='typeOfSession', value=session.typeOfSession or ''),
+        search.AtomField(name='conference', value=session.websafeConferenceKey),
+    ])
+
+
+def _putDocuments(index_name, documents):
+    """Index documents, logging (not raising) failures.
+
+    The datastore stays the source of truth; a document that failed to
+    index is picked up again by its next write or by a reindex.
+    """
+    index = search.Index(name=index_name)
+    rpcs = [index.put_async(documents[i:i + INDEX_BATCH])
+            for i in range(0, len(documents), INDEX_BATCH)]
+    for rpc in rpcs:
+        try:
+            rpc.get_result()
+        except search.Error as e:
+            logging.warning('Failed to index documents in %s: %s', index_name, e)
+
+
+def indexConferences(confs):
+    """Add or replace the search documents of confs."""
+    _putDocuments(CONFERENCE_INDEX, [_conferenceDocument(conf) for conf in confs])
+
+
+def indexSessions(sessions):
+    """Add or replace the search documents of sessions."""
+    _putDocuments(SESSION_INDEX, [_sessionDocument(session) for session in sessions])
+
+
+def _searchKeys(index_name, query_string, limit, cursor):
+    """Return (keys, nextCursor) of the best limit matches of query_string.
+
+    Raises ValueError for a malformed query or cursor.
+    """
+    try:
+        query = search.Query(query_string=query_string,
+            options=search.QueryOptions(limit=limit, ids_only=True,
+                cursor=search.Cursor(web_safe_string=cursor or None),
+                sort_options=_SORT_BY_SCORE))
+        results = search.Index(name=index_name).search(query)
+    except (search.QueryError, search.InvalidRequest) as e:
+        raise ValueError(str(e))
+    keys = [ndb.Key(urlsafe=doc.doc_id) for doc in results.results]
+    return keys, results.cursor.web_safe_string if results.cursor else None
+
+
+def searchConferenceKeys(query_string, limit, cursor=None):
+    """Return (keys, nextCursor) of the Conferences best matching query_string."""
+    return _searchKeys(CONFERENCE_INDEX, query_string, limit, cursor)
+
+
+def searchSessionKeys(query_string, limit, cursor=None, websafeConferenceKey=None):
+    """Return (keys, nextCursor) of the Sessions best matching query_string,
+    optionally only those of one conference.
+    """
+    if websafeConferenceKey:
+        query_string = '(%s) AND conference:"%s"' % (query_string, websafeConferenceKey)
+    return _searchKeys(SESSION_INDEX, query_string, limit, cursor)
+